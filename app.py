@@ -1,13 +1,14 @@
 # app.py
 import os
 import json
-import sqlite3
 import shortuuid
-import threading
 import logging
-from flask import Flask, render_template, request, redirect, url_for, jsonify
+from flask import Flask, Response, render_template, request, redirect, url_for, jsonify
 from dotenv import load_dotenv
 
+from tools import db, events
+from tools.job_queue import JobQueue, QueueFull
+
 load_dotenv()
 
 # ---------------------------------------------------------------------------
@@ -25,7 +26,20 @@ logging.basicConfig(
 log = logging.getLogger('pipeline')
 
 app = Flask(__name__)
-DB_FILE = os.getenv('DB_FILE', 'youtube.db')
+DB_FILE = db.DB_FILE
+
+# Workout renders: encode segments in parallel and stitch with ffmpeg
+# (set WORKOUT_SEGMENTED=0 to fall back to a single MoviePy export).
+WORKOUT_SEGMENTED = os.getenv('WORKOUT_SEGMENTED', '1') == '1'
+
+# Background jobs: persistent queue in the same DB, one worker pool per lane.
+#   render — CPU/RAM-heavy MoviePy work (auto_produce, build_workout)
+#   io     — API-bound steps (scripts, prompts, voiceovers)
+# Each lane is (workers, admission limit on queued + running jobs).
+jobs = JobQueue(DB_FILE, lanes={
+    'render': (int(os.getenv('RENDER_WORKERS', '1')), int(os.getenv('RENDER_QUEUE_LIMIT', '10'))),
+    'io':     (int(os.getenv('IO_WORKERS', '4')),     int(os.getenv('IO_QUEUE_LIMIT', '50'))),
+})
 
 # Pipeline statuses in order
 STATUSES = [
@@ -40,41 +54,142 @@ STATUSES = [
 ]
 
 
-def get_db():
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-
 def migrate_db():
-    """Add new columns to Videos table without dropping existing data."""
-    conn = get_db()
+    """Add new columns and indexes to Videos table without dropping existing data."""
     new_columns = [
+        ('Source_URL',       'TEXT'),
+        ('Transcript',       'TEXT'),
+        ('Visual_Prompts',   'TEXT'),
+        ('Niche',            'TEXT'),
+        ('Channel',          'TEXT'),
+        ('Video_Type',       'TEXT'),
+        ('Workout_Plan',     'TEXT'),
         ('scene_data',       'TEXT'),
         ('auto_prod_status', 'TEXT'),
+        ('Preview_File_URL', 'TEXT'),
+        ('Short_File_URL',   'TEXT'),
+        ('Animation_Backend', 'TEXT'),
     ]
     for col, col_type in new_columns:
         try:
-            conn.execute(f"ALTER TABLE Videos ADD COLUMN {col} {col_type}")
-            conn.commit()
+            db.execute(f"ALTER TABLE Videos ADD COLUMN {col} {col_type}")
         except Exception:
             pass  # column already exists
-    conn.close()
+
+    # record_id is UNIQUE in setup_database.py, so SQLite already indexes it.
+    indexes = [
+        ('idx_videos_status',       'Status'),
+        ('idx_videos_niche_status', 'Niche, Status'),
+    ]
+    for name, cols in indexes:
+        db.execute(f"CREATE INDEX IF NOT EXISTS {name} ON Videos ({cols})")
 
 
 migrate_db()
 
 
+# Auto-produce progress text per auto_prod_status — the one map used by the
+# server-rendered card and by index.html's live-update handler. Scenes run
+# through the asset steps concurrently, so each status is a rollup milestone
+# (every scene has finished that step, see automated_asset_generator.PHASES)
+# while the later steps are already under way.
+AP_PHASE_LABELS = {
+    'pending':      '⚙️ Generating images, voiceover & clips for every scene...',
+    'images_done':  '🎨 All images ready — voiceover, animation & lip sync in progress...',
+    'audio_done':   '🎙 Images & voiceover ready — animation & lip sync in progress...',
+    'clips_done':   '🎬 All scenes animated — lip sync in progress...',
+    'lipsync_done': '👄 All scenes lip-synced — assembling preview...',
+    'assembling':   '🎞 Rendering video...',
+}
+# The audio_done milestone names the record's backend (Videos.Animation_Backend).
+AP_ANIMATION_LABELS = {
+    'kling':     '🎙 Images & voiceover ready — animation (Kling) & lip sync in progress...',
+    'ken_burns': '🎙 Images & voiceover ready — animation (Ken Burns, local) & lip sync in progress...',
+}
+
+
+def ap_phase_label(auto_prod_status: str, backend: str = None) -> str:
+    if auto_prod_status == 'audio_done' and backend in AP_ANIMATION_LABELS:
+        return AP_ANIMATION_LABELS[backend]
+    return AP_PHASE_LABELS.get(auto_prod_status, 'Starting...')
+
+
+app.jinja_env.globals.update(AP_PHASE_LABELS=AP_PHASE_LABELS, AP_ANIMATION_LABELS=AP_ANIMATION_LABELS,
+                             ap_phase_label=ap_phase_label)
+
+# Columns that change how a dashboard card renders.
+CARD_FIELDS = {'Status', 'auto_prod_status', 'Audio_File_URL', 'Video_File_URL', 'Preview_File_URL',
+               'Short_File_URL'}
+
+
+def _update_video(record_id: str, **fields):
+    """UPDATE one Videos row and push the change to open dashboards."""
+    cols = ", ".join(f"{col} = ?" for col in fields)
+    db.execute(f"UPDATE Videos SET {cols} WHERE record_id = ?", (*fields.values(), record_id))
+
+    changed = {}
+    if 'Status' in fields:
+        changed['status'] = fields['Status']
+    if 'auto_prod_status' in fields:
+        changed['auto_prod_status'] = fields['auto_prod_status']
+    if CARD_FIELDS & (fields.keys() - {'Status', 'auto_prod_status'}):
+        changed['refresh'] = True
+    if changed:
+        events.publish(record_id, **changed)
+
+
+@app.before_request
+def _start_job_workers():
+    # Started lazily so only the serving process (not the reloader parent) runs jobs.
+    jobs.start()
+
+
 # ---------------------------------------------------------------------------
 # Dashboard
 # ---------------------------------------------------------------------------
 
+# Only what the cards render — Script / Transcript / Visual_Prompts / scene_data
+# blobs are loaded on demand through /view/<record_id>/<field>.
+DASHBOARD_COLUMNS = (
+    "id, record_id, Idea, Status, Niche, Source_URL, Video_Type, "
+    "Audio_File_URL, Video_File_URL, Preview_File_URL, Short_File_URL, auto_prod_status, Animation_Backend"
+)
+DASHBOARD_PAGE_SIZE = int(os.getenv('DASHBOARD_PAGE_SIZE', '50'))
+
+
 @app.route('/')
 def index():
-    conn = get_db()
-    videos = conn.execute("SELECT * FROM Videos ORDER BY id DESC").fetchall()
-    conn.close()
-    return render_template('index.html', videos=videos)
+    # Keyset pagination: ?before=<id> shows the page of rows older than that id.
+    before = request.args.get('before', type=int)
+    if before:
+        rows = db.query_all(
+            f"SELECT {DASHBOARD_COLUMNS} FROM Videos WHERE id < ? ORDER BY id DESC LIMIT ?",
+            (before, DASHBOARD_PAGE_SIZE + 1)
+        )
+    else:
+        rows = db.query_all(
+            f"SELECT {DASHBOARD_COLUMNS} FROM Videos ORDER BY id DESC LIMIT ?",
+            (DASHBOARD_PAGE_SIZE + 1,)
+        )
+    videos = rows[:DASHBOARD_PAGE_SIZE]
+    next_before = videos[-1]['id'] if len(rows) > DASHBOARD_PAGE_SIZE else None
+    return render_template('index.html', videos=videos, before=before, next_before=next_before)
+
+
+@app.route('/card/<record_id>')
+def card(record_id):
+    """One dashboard card, re-rendered when its status changes (see /api/events)."""
+    v = db.query_one(f"SELECT {DASHBOARD_COLUMNS} FROM Videos WHERE record_id = ?", (record_id,))
+    if not v:
+        return "", 404
+    return render_template('_card.html', v=v)
+
+
+@app.route('/api/events')
+def api_events():
+    """Server-Sent Events: status / phase / render % for every record, as they happen."""
+    return Response(events.BUS.stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 
 # ---------------------------------------------------------------------------
@@ -89,15 +204,12 @@ def add_idea():
     channel = niche  # channel matches niche for now
 
     if idea:
-        conn = get_db()
         record_id = shortuuid.uuid()
-        conn.execute(
+        db.execute(
             """INSERT INTO Videos (record_id, Idea, Status, Source_URL, Niche, Channel)
                VALUES (?, ?, ?, ?, ?, ?)""",
             (record_id, idea, '1_Idea_Review', source_url, niche, channel)
         )
-        conn.commit()
-        conn.close()
     return redirect(url_for('index'))
 
 
@@ -107,34 +219,43 @@ def add_idea():
 
 @app.route('/update_status/<record_id>/<new_status>')
 def update_status(record_id, new_status):
-    conn = get_db()
-    conn.execute(
-        "UPDATE Videos SET Status = ? WHERE record_id = ?",
-        (new_status, record_id)
-    )
-    conn.commit()
-    conn.close()
+    _update_video(record_id, Status=new_status)
     return redirect(url_for('index'))
 
 
+# ---------------------------------------------------------------------------
+# Job hooks — a task's Failed_* status is written only once the queue gives
+# up on it, and a retry only runs while the card is still where it left it.
+# ---------------------------------------------------------------------------
+
+def _mark_failed(prefix: str, **extra):
+    """on_failure hook: show the final error on the card as `<prefix>: <error>`."""
+    def hook(record_id, *args, error):
+        _update_video(record_id, Status=f'{prefix}: {str(error)[:80]}', **extra)
+    return hook
+
+
+def _status_is(status: str):
+    """still_wanted hook: retry only while the card's Status is still `status`."""
+    def check(record_id, *args):
+        row = db.query_one("SELECT Status FROM Videos WHERE record_id = ?", (record_id,))
+        return row is not None and row['Status'] == status
+    return check
+
+
 # ---------------------------------------------------------------------------
 # Step 1: Generate script from source URL (runs in background)
 # ---------------------------------------------------------------------------
 
+@jobs.task(lane='io', on_failure=_mark_failed('Failed_Script'), still_wanted=_status_is('2_Script_Pending'))
 def _run_generate_script(record_id: str, source_url: str, niche: str):
-    """Background thread: fetch transcript → rewrite script → update DB."""
+    """Background job: fetch transcript → rewrite script → update DB."""
     log.info(f"[{record_id[:8]}] START generate_script | niche={niche} url={source_url}")
     try:
         from tools.fetch_transcript import fetch_transcript
         from tools.rewrite_script import rewrite_script
 
-        conn = get_db()
-        conn.execute(
-            "UPDATE Videos SET Status = ? WHERE record_id = ?",
-            ('2_Script_Pending', record_id)
-        )
-        conn.commit()
-        conn.close()
+        _update_video(record_id, Status='2_Script_Pending')
 
         log.info(f"[{record_id[:8]}] Fetching transcript...")
         transcript = fetch_transcript(source_url)
@@ -142,43 +263,25 @@ def _run_generate_script(record_id: str, source_url: str, niche: str):
         script = rewrite_script(transcript, niche)
         log.info(f"[{record_id[:8]}] Script done ({len(script)} chars). Saving to DB.")
 
-        conn = get_db()
-        conn.execute(
-            "UPDATE Videos SET Transcript = ?, Script = ?, Status = ? WHERE record_id = ?",
-            (transcript, script, '3_Script_Review', record_id)
-        )
-        conn.commit()
-        conn.close()
+        _update_video(record_id, Transcript=transcript, Script=script, Status='3_Script_Review')
         log.info(f"[{record_id[:8]}] DONE generate_script → 3_Script_Review")
 
     except Exception as e:
         log.exception(f"[{record_id[:8]}] FAILED generate_script: {e}")
-        conn = get_db()
-        conn.execute(
-            "UPDATE Videos SET Status = ? WHERE record_id = ?",
-            (f'Failed_Script: {str(e)[:80]}', record_id)
-        )
-        conn.commit()
-        conn.close()
+        raise
 
 
 @app.route('/generate_script/<record_id>')
 def generate_script(record_id):
-    conn = get_db()
-    video = conn.execute(
-        "SELECT * FROM Videos WHERE record_id = ?", (record_id,)
-    ).fetchone()
-    conn.close()
+    video = db.query_one("SELECT Source_URL, Niche FROM Videos WHERE record_id = ?", (record_id,))
 
     if not video or not video['Source_URL']:
         return jsonify({'error': 'No source URL found for this video'}), 400
 
-    thread = threading.Thread(
-        target=_run_generate_script,
-        args=(record_id, video['Source_URL'], video['Niche'] or 'finance')
-    )
-    thread.daemon = True
-    thread.start()
+    try:
+        jobs.enqueue('_run_generate_script', record_id, video['Source_URL'], video['Niche'] or 'finance', record_id=record_id)
+    except QueueFull as e:
+        return jsonify({'error': str(e)}), 429
 
     return redirect(url_for('index'))
 
@@ -187,61 +290,38 @@ def generate_script(record_id):
 # Step 2: Generate visual prompts from approved script (runs in background)
 # ---------------------------------------------------------------------------
 
+@jobs.task(lane='io', on_failure=_mark_failed('Failed_Prompts'), still_wanted=_status_is('4_Prompts_Pending'))
 def _run_generate_prompts(record_id: str, script: str, niche: str):
-    """Background thread: script → production packet → update DB."""
+    """Background job: script → production packet → update DB."""
     log.info(f"[{record_id[:8]}] START generate_prompts | niche={niche}")
     try:
         from tools.generate_visual_prompts import generate_visual_prompts
 
-        conn = get_db()
-        conn.execute(
-            "UPDATE Videos SET Status = ? WHERE record_id = ?",
-            ('4_Prompts_Pending', record_id)
-        )
-        conn.commit()
-        conn.close()
+        _update_video(record_id, Status='4_Prompts_Pending')
 
         log.info(f"[{record_id[:8]}] Calling generate_visual_prompts...")
         prompts = generate_visual_prompts(script, niche)
         log.info(f"[{record_id[:8]}] Prompts done ({len(prompts)} chars). Saving.")
 
-        conn = get_db()
-        conn.execute(
-            "UPDATE Videos SET Visual_Prompts = ?, Status = ? WHERE record_id = ?",
-            (prompts, '5_Prompts_Review', record_id)
-        )
-        conn.commit()
-        conn.close()
+        _update_video(record_id, Visual_Prompts=prompts, Status='5_Prompts_Review')
         log.info(f"[{record_id[:8]}] DONE generate_prompts → 5_Prompts_Review")
 
     except Exception as e:
         log.exception(f"[{record_id[:8]}] FAILED generate_prompts: {e}")
-        conn = get_db()
-        conn.execute(
-            "UPDATE Videos SET Status = ? WHERE record_id = ?",
-            (f'Failed_Prompts: {str(e)[:80]}', record_id)
-        )
-        conn.commit()
-        conn.close()
+        raise
 
 
 @app.route('/generate_prompts/<record_id>')
 def generate_prompts(record_id):
-    conn = get_db()
-    video = conn.execute(
-        "SELECT * FROM Videos WHERE record_id = ?", (record_id,)
-    ).fetchone()
-    conn.close()
+    video = db.query_one("SELECT Script, Niche FROM Videos WHERE record_id = ?", (record_id,))
 
     if not video or not video['Script']:
         return jsonify({'error': 'No approved script found'}), 400
 
-    thread = threading.Thread(
-        target=_run_generate_prompts,
-        args=(record_id, video['Script'], video['Niche'] or 'finance')
-    )
-    thread.daemon = True
-    thread.start()
+    try:
+        jobs.enqueue('_run_generate_prompts', record_id, video['Script'], video['Niche'] or 'finance', record_id=record_id)
+    except QueueFull as e:
+        return jsonify({'error': str(e)}), 429
 
     return redirect(url_for('index'))
 
@@ -256,11 +336,8 @@ def view_field(record_id, field):
     if field not in allowed:
         return "Not allowed", 403
 
-    conn = get_db()
-    video = conn.execute(
-        "SELECT * FROM Videos WHERE record_id = ?", (record_id,)
-    ).fetchone()
-    conn.close()
+    # `field` is checked against the allow-list above, so it is safe to interpolate.
+    video = db.query_one(f"SELECT {field} FROM Videos WHERE record_id = ?", (record_id,))
 
     content = video[field] if video else ''
     return render_template('view.html', title=field.replace('_', ' '), content=content, record_id=record_id, field=field)
@@ -279,52 +356,40 @@ VOICE_OPTIONS = {
 }
 
 
-def _run_generate_voiceover(record_id: str, script: str, voice: str):
-    """Background thread: generate voiceover MP3 from script."""
-    try:
-        from tools.generate_voiceover import generate_voiceover
+def _voiceover_wanted(record_id, script, voice, status=None):
+    # The card stays on its step while the voiceover renders; a retry is moot once it moves.
+    return status is None or _status_is(status)(record_id)
 
-        os.makedirs('.tmp/audio', exist_ok=True)
-        output_path = f".tmp/audio/{record_id}.mp3"
 
-        generate_voiceover(script, output_path, voice)
+@jobs.task(lane='io', on_failure=_mark_failed('Failed_Audio'), still_wanted=_voiceover_wanted)
+def _run_generate_voiceover(record_id: str, script: str, voice: str, status: str = None):
+    """
+    Background job: generate voiceover MP3 from script. `status` is the
+    card's step when queued; a retry is dropped if the card has left it.
+    """
+    from tools.generate_voiceover import generate_voiceover
 
-        conn = get_db()
-        conn.execute(
-            "UPDATE Videos SET Audio_File_URL = ? WHERE record_id = ?",
-            (output_path, record_id)
-        )
-        conn.commit()
-        conn.close()
+    os.makedirs('.tmp/audio', exist_ok=True)
+    output_path = f".tmp/audio/{record_id}.mp3"
 
-    except Exception as e:
-        conn = get_db()
-        conn.execute(
-            "UPDATE Videos SET Status = ? WHERE record_id = ?",
-            (f'Failed_Audio: {str(e)[:80]}', record_id)
-        )
-        conn.commit()
-        conn.close()
+    generate_voiceover(script, output_path, voice)
+
+    _update_video(record_id, Audio_File_URL=output_path)
 
 
 @app.route('/generate_voiceover/<record_id>', methods=['POST'])
 def generate_voiceover_route(record_id):
     voice = request.form.get('voice', 'en-US-GuyNeural')
-    conn = get_db()
-    video = conn.execute(
-        "SELECT * FROM Videos WHERE record_id = ?", (record_id,)
-    ).fetchone()
-    conn.close()
+    video = db.query_one("SELECT Script, Status FROM Videos WHERE record_id = ?", (record_id,))
 
     if not video or not video['Script']:
         return jsonify({'error': 'No script found'}), 400
 
-    thread = threading.Thread(
-        target=_run_generate_voiceover,
-        args=(record_id, video['Script'], voice)
-    )
-    thread.daemon = True
-    thread.start()
+    try:
+        jobs.enqueue('_run_generate_voiceover', record_id, video['Script'], voice, video['Status'],
+                     record_id=record_id)
+    except QueueFull as e:
+        return jsonify({'error': str(e)}), 429
 
     return redirect(url_for('index'))
 
@@ -332,11 +397,7 @@ def generate_voiceover_route(record_id):
 @app.route('/download_audio/<record_id>')
 def download_audio(record_id):
     from flask import send_file
-    conn = get_db()
-    video = conn.execute(
-        "SELECT * FROM Videos WHERE record_id = ?", (record_id,)
-    ).fetchone()
-    conn.close()
+    video = db.query_one("SELECT Idea, Audio_File_URL FROM Videos WHERE record_id = ?", (record_id,))
 
     if not video or not video['Audio_File_URL']:
         return "No audio file found", 404
@@ -352,102 +413,106 @@ def download_audio(record_id):
 # Auto-produce: DALL-E 3 images + fal.ai Kling clips + sync assembly
 # ---------------------------------------------------------------------------
 
-def _run_auto_produce(record_id: str, script: str):
+@jobs.task(lane='render', max_attempts=2,
+           on_failure=_mark_failed('Failed_AutoProd', auto_prod_status='failed'),
+           still_wanted=_status_is('4_Prompts_Pending'))
+def _run_auto_produce(record_id: str, script: str, backend: str = None):
     """
-    Background thread: full zero-manual Finance video pipeline.
-
-    Phases tracked in auto_prod_status:
-      pending       → generating DALL-E 3 images
-      images_done   → generating ElevenLabs audio
-      audio_done    → generating Kling animated clips (i2v)
-      clips_done    → applying Kling lipsync
-      lipsync_done  → assembling final video
-      assembling    → rendering MP4
-      done          → complete (→ 7_Final_Review)
+    Background job: full zero-manual Finance video pipeline, up to a
+    low-resolution preview. The final render is queued by /approve.
+
+    A second attempt (e.g. after a restart) is cheap: finished assets are
+    skipped and in-flight fal.ai requests are reattached, not resubmitted.
+
+    `backend` animates the scenes: 'kling' (fal.ai i2v) or 'ken_burns'
+    (local, offline); None uses ANIMATION_BACKEND.
+
+    Milestones tracked in auto_prod_status (scenes advance concurrently; a
+    milestone means every scene has finished that step):
+      pending       → images, audio and clips under way
+      images_done   → all DALL-E 3 images ready
+      audio_done    → all ElevenLabs audio ready too (animation: Kling i2v or local Ken Burns)
+      clips_done    → all clips animated; lipsync finishing
+      lipsync_done  → all scenes lip-synced; assembling preview
+      assembling    → rendering MP4 (preview, then final after approval)
+      done          → preview / final ready (→ 7_Final_Review)
       failed        → error (see Status column for detail)
     """
-    try:
-        from tools.automated_asset_generator import generate_assets
-        from tools.sync_assembler import assemble_finance_video
-        import json
+    from tools.automated_asset_generator import generate_assets, ANIMATION_BACKEND
+    from tools.sync_assembler import assemble_finance_video
+    import json
 
-        # Kick off — status already set by the route
-        scenes = generate_assets(record_id, script)
+    # Kick off — status already set by the route (reset here for a retried attempt)
+    _update_video(record_id, Status='4_Prompts_Pending', auto_prod_status='pending')
+    scenes = generate_assets(record_id, script, backend or ANIMATION_BACKEND)
 
-        # Assemble
-        conn = get_db()
-        conn.execute(
-            "UPDATE Videos SET auto_prod_status = ? WHERE record_id = ?",
-            ('assembling', record_id)
-        )
-        conn.commit()
-        conn.close()
+    # Assemble
+    _update_video(record_id, auto_prod_status='assembling')
 
-        os.makedirs('.tmp', exist_ok=True)
-        output_path = f".tmp/finance_{record_id}.mp4"
-        assemble_finance_video(
-            scenes,
-            output_path,
-            tmp_dir=f".tmp/finance_assembly_{record_id}",
-        )
+    os.makedirs('.tmp', exist_ok=True)
+    preview_path = f".tmp/finance_{record_id}_preview.mp4"
+    assemble_finance_video(
+        scenes,
+        preview_path,
+        tmp_dir=f".tmp/finance_assembly_{record_id}",
+        profile='preview',
+    )
 
-        conn = get_db()
-        conn.execute(
-            "UPDATE Videos SET Video_File_URL = ?, Status = ?, auto_prod_status = ? WHERE record_id = ?",
-            (output_path, '7_Final_Review', 'done', record_id)
-        )
-        conn.commit()
-        conn.close()
+    _write_poster(record_id, preview_path)
+    _update_video(record_id, Preview_File_URL=preview_path, Status='7_Final_Review', auto_prod_status='done')
 
-    except Exception as e:
-        conn = get_db()
-        conn.execute(
-            "UPDATE Videos SET Status = ?, auto_prod_status = ? WHERE record_id = ?",
-            (f'Failed_AutoProd: {str(e)[:80]}', 'failed', record_id)
-        )
-        conn.commit()
-        conn.close()
-        raise
+
+@jobs.task(lane='render', max_attempts=1,
+           on_failure=_mark_failed('Failed_AutoProd', auto_prod_status='failed'))
+def _run_assemble_final(record_id: str):
+    """Background job: full-quality Finance export of an approved preview."""
+    from tools.sync_assembler import assemble_finance_video
+
+    _update_video(record_id, Status='4_Prompts_Pending', auto_prod_status='assembling')
+
+    row = db.query_one("SELECT scene_data FROM Videos WHERE record_id = ?", (record_id,))
+    output_path = f".tmp/finance_{record_id}.mp4"
+    assemble_finance_video(
+        json.loads(row['scene_data']),
+        output_path,
+        tmp_dir=f".tmp/finance_assembly_{record_id}",
+    )
+
+    _update_video(record_id, Video_File_URL=output_path, Status='7_Final_Review', auto_prod_status='done')
 
 
 @app.route('/auto_produce/<record_id>')
 def auto_produce(record_id):
-    conn = get_db()
-    video = conn.execute(
-        "SELECT * FROM Videos WHERE record_id = ?", (record_id,)
-    ).fetchone()
-    conn.close()
+    from tools.automated_asset_generator import ANIMATION_BACKENDS, ANIMATION_BACKEND
+
+    video = db.query_one("SELECT Script, Animation_Backend FROM Videos WHERE record_id = ?", (record_id,))
 
     if not video or not video['Script']:
         return jsonify({'error': 'No approved script found'}), 400
 
-    # Set initial status immediately so the dashboard reacts
-    conn = get_db()
-    conn.execute(
-        "UPDATE Videos SET Status = ?, auto_prod_status = ? WHERE record_id = ?",
-        ('4_Prompts_Pending', 'pending', record_id)
-    )
-    conn.commit()
-    conn.close()
+    # ?backend= picks the animation engine; otherwise the record's last choice.
+    backend = request.args.get('backend') or video['Animation_Backend'] or ANIMATION_BACKEND
+    if backend not in ANIMATION_BACKENDS:
+        return jsonify({'error': f'Unknown animation backend: {backend}'}), 400
 
-    thread = threading.Thread(
-        target=_run_auto_produce,
-        args=(record_id, video['Script'])
-    )
-    thread.daemon = True
-    thread.start()
+    try:
+        jobs.enqueue('_run_auto_produce', record_id, video['Script'], backend, record_id=record_id)
+    except QueueFull as e:
+        return jsonify({'error': str(e)}), 429
+
+    # Status only moves once the job exists, so the dashboard reacts without
+    # a refused enqueue stranding the card in 'pending'.
+    _update_video(record_id, Status='4_Prompts_Pending', auto_prod_status='pending', Animation_Backend=backend)
 
     return redirect(url_for('index'))
 
 
 @app.route('/api/auto_prod_status/<record_id>')
 def api_auto_prod_status(record_id):
-    conn = get_db()
-    row = conn.execute(
+    row = db.query_one(
         "SELECT Status, auto_prod_status FROM Videos WHERE record_id = ?",
         (record_id,)
-    ).fetchone()
-    conn.close()
+    )
     if not row:
         return jsonify({'status': 'unknown', 'auto_prod_status': None})
     return jsonify({
@@ -470,7 +535,10 @@ def add_workout():
     section_rest = int(request.form.get('section_rest', 60))
     rounds = int(request.form.get('rounds', 1))
     round_rest = int(request.form.get('round_rest', 30))
-    is_short = request.form.get('is_short') == '1'
+    # landscape | short | both — "both" renders the long video and a Short in one build
+    output_format = request.form.get('format') or ('short' if request.form.get('is_short') == '1' else 'landscape')
+    formats = ['landscape', 'short'] if output_format == 'both' else [output_format]
+    is_short = formats == ['short']
 
     if not title:
         return redirect(url_for('index'))
@@ -494,71 +562,67 @@ def add_workout():
         "section_rest": section_rest,
         "rounds": rounds,
         "round_rest": round_rest,
-        "is_short": is_short
+        "is_short": is_short,
+        "formats": formats
     }
 
-    conn = get_db()
     record_id = shortuuid.uuid()
-    conn.execute(
+    db.execute(
         """INSERT INTO Videos (record_id, Idea, Status, Niche, Channel, Video_Type, Workout_Plan)
            VALUES (?, ?, ?, ?, ?, ?, ?)""",
         (record_id, title, '1_Idea_Review', 'fitness', 'fitness', 'workout', json.dumps(plan))
     )
-    conn.commit()
-    conn.close()
     return redirect(url_for('index'))
 
 
-def _run_build_workout(record_id: str, plan: dict):
-    """Background thread: assemble workout video → update DB."""
+@jobs.task(lane='render', max_attempts=2,
+           on_failure=_mark_failed('Failed_Build'), still_wanted=_status_is('4_Prompts_Pending'))
+def _run_build_workout(record_id: str, plan: dict, profile: str = 'preview'):
+    """
+    Background job: assemble workout video → update DB. Builds render the
+    preview first (main format only); the final export runs once the preview
+    is approved and renders every format of the plan in one build — the
+    first is Video_File_URL, a second Short is Short_File_URL.
+    """
     exercises = [e for s in plan.get('sections', []) for e in s.get('exercises', [])]
-    log.info(f"[{record_id[:8]}] START build_workout | {len(exercises)} exercises, is_short={plan.get('is_short')}")
+    formats = plan.get('formats') or (['short'] if plan.get('is_short') else ['landscape'])
+    if profile != 'final':
+        formats = formats[:1]
+    log.info(f"[{record_id[:8]}] START build_workout ({profile}) | {len(exercises)} exercises, "
+             f"formats={','.join(formats)}")
     try:
         import json
-        from tools.build_workout_video import build_workout_video
+        from tools.build_workout_video import build_workout_videos
 
         os.makedirs('.tmp', exist_ok=True)
-        output_path = f".tmp/workout_{record_id}.mp4"
-
-        conn = get_db()
-        conn.execute(
-            "UPDATE Videos SET Status = ? WHERE record_id = ?",
-            ('4_Prompts_Pending', record_id)
-        )
-        conn.commit()
-        conn.close()
-
-        log.info(f"[{record_id[:8]}] Calling build_workout_video → {output_path}")
-        build_workout_video(plan, output_path, record_id=record_id, is_short=plan.get('is_short', False))
-        log.info(f"[{record_id[:8]}] build_workout_video complete.")
-
-        conn = get_db()
-        conn.execute(
-            "UPDATE Videos SET Video_File_URL = ?, Status = ? WHERE record_id = ?",
-            (output_path, '7_Final_Review', record_id)
-        )
-        conn.commit()
-        conn.close()
-        log.info(f"[{record_id[:8]}] DONE build_workout → 7_Final_Review")
+        outputs = {}
+        for i, fmt in enumerate(formats):
+            suffix = (f"_{fmt}" if i else "") + ("" if profile == 'final' else f"_{profile}")
+            outputs[fmt] = f".tmp/workout_{record_id}{suffix}.mp4"
+
+        _update_video(record_id, Status='4_Prompts_Pending')
+
+        log.info(f"[{record_id[:8]}] Calling build_workout_videos → {', '.join(outputs.values())}")
+        build_workout_videos(plan, outputs, record_id=record_id, segmented=WORKOUT_SEGMENTED, profile=profile)
+        log.info(f"[{record_id[:8]}] build_workout_videos complete.")
+
+        main = outputs[formats[0]]
+        if profile == 'final':
+            extra = {'Short_File_URL': outputs['short']} if len(formats) > 1 and 'short' in outputs else {}
+            _update_video(record_id, Video_File_URL=main, Status='7_Final_Review', **extra)
+        else:
+            _write_poster(record_id, main)
+            _update_video(record_id, Preview_File_URL=main, Status='7_Final_Review')
+        log.info(f"[{record_id[:8]}] DONE build_workout ({profile}) → 7_Final_Review")
 
     except Exception as e:
         log.exception(f"[{record_id[:8]}] FAILED build_workout: {e}")
-        conn = get_db()
-        conn.execute(
-            "UPDATE Videos SET Status = ? WHERE record_id = ?",
-            (f'Failed_Build: {str(e)[:80]}', record_id)
-        )
-        conn.commit()
-        conn.close()
+        raise
 
 
 @app.route('/exercise_prompts/<record_id>')
 def exercise_prompts(record_id):
-    conn = get_db()
-    video = conn.execute(
-        "SELECT * FROM Videos WHERE record_id = ?", (record_id,)
-    ).fetchone()
-    conn.close()
+    video = db.query_one("SELECT Workout_Plan FROM Videos WHERE record_id = ?", (record_id,))
 
     if not video or not video['Workout_Plan']:
         return "No workout plan found", 400
@@ -577,30 +641,25 @@ def exercise_prompts(record_id):
 @app.route('/build_workout/<record_id>')
 def build_workout(record_id):
     import json
-    conn = get_db()
-    video = conn.execute(
-        "SELECT * FROM Videos WHERE record_id = ?", (record_id,)
-    ).fetchone()
-    conn.close()
+    video = db.query_one("SELECT Workout_Plan FROM Videos WHERE record_id = ?", (record_id,))
 
     if not video or not video['Workout_Plan']:
         return jsonify({'error': 'No workout plan found'}), 400
 
     plan = json.loads(video['Workout_Plan'])
-    thread = threading.Thread(target=_run_build_workout, args=(record_id, plan))
-    thread.daemon = True
-    thread.start()
+    try:
+        jobs.enqueue('_run_build_workout', record_id, plan, record_id=record_id)
+    except QueueFull as e:
+        return jsonify({'error': str(e)}), 429
 
     return redirect(url_for('index'))
 
 
 @app.route('/api/status/<record_id>')
 def api_status(record_id):
-    conn = get_db()
-    row = conn.execute(
+    row = db.query_one(
         "SELECT Status FROM Videos WHERE record_id = ?", (record_id,)
-    ).fetchone()
-    conn.close()
+    )
     return jsonify({"status": row["Status"] if row else "unknown"})
 
 
@@ -622,14 +681,145 @@ def render_progress(record_id):
     return jsonify({"pct": 0})
 
 
+@app.route('/api/jobs')
+def api_jobs():
+    from tools.fal_jobs import FAL_JOBS
+    return jsonify({'lanes': jobs.stats(), 'recent': jobs.recent(), 'fal': FAL_JOBS.stats()})
+
+
+@app.route('/webhooks/fal', methods=['POST'])
+def fal_webhook():
+    """fal.ai completion callback (FAL_WEBHOOK_URL) — wakes the waiting poller."""
+    from tools.fal_jobs import FAL_JOBS
+    payload = request.get_json(silent=True) or {}
+    request_id = payload.get('request_id')
+    if not request_id:
+        return jsonify({'error': 'request_id missing'}), 400
+    log.info(f"[fal] webhook {request_id} ({payload.get('status')})")
+    return jsonify({'woken': FAL_JOBS.wake(request_id)})
+
+
+# ---------------------------------------------------------------------------
+# Review: low-resolution preview, thumbnails, approval → final render
+# ---------------------------------------------------------------------------
+
+@app.route('/preview/<record_id>')
+def preview_video(record_id):
+    from flask import send_file
+    video = db.query_one("SELECT Preview_File_URL FROM Videos WHERE record_id = ?", (record_id,))
+
+    if not video or not video['Preview_File_URL'] or not os.path.exists(video['Preview_File_URL']):
+        return "No preview found", 404
+
+    return send_file(video['Preview_File_URL'], mimetype='video/mp4', conditional=True)
+
+
+POSTER_AT = 8.0   # seconds into the preview for the review card's poster
+
+
+def _poster_path(preview_path: str) -> str:
+    return os.path.splitext(preview_path)[0] + '.jpg'
+
+
+def _write_poster(record_id: str, preview_path: str):
+    """
+    Grab the review card's poster from the finished preview, once, in the
+    render job — so a dashboard of review cards serves static JPEGs
+    instead of rendering a frame per card per page load.
+    """
+    from tools.ffmpeg_utils import run_ffmpeg, probe_duration
+
+    try:
+        t = min(POSTER_AT, probe_duration(preview_path) / 2)
+        run_ffmpeg(["-ss", f"{t:.2f}", "-i", preview_path, "-frames:v", "1", "-q:v", "4",
+                    _poster_path(preview_path)])
+    except Exception as e:
+        log.warning(f"[{record_id[:8]}] poster for {preview_path} failed: {e}")
+
+
+@app.route('/poster/<record_id>')
+def preview_poster(record_id):
+    """The preview's poster JPEG, written when the preview build finished."""
+    from flask import send_file
+    video = db.query_one("SELECT Preview_File_URL FROM Videos WHERE record_id = ?", (record_id,))
+
+    if not video or not video['Preview_File_URL'] or not os.path.exists(_poster_path(video['Preview_File_URL'])):
+        return "No poster found", 404
+
+    return send_file(_poster_path(video['Preview_File_URL']), mimetype='image/jpeg', max_age=300)
+
+
+@app.route('/frame/<record_id>')
+def frame_thumbnail(record_id):
+    """JPEG of the video at ?t=<seconds>, rendered on its own (no full render needed)."""
+    import io
+    from flask import send_file
+    from PIL import Image
+
+    t = request.args.get('t', 0.0, type=float)
+    video = db.query_one(
+        "SELECT Video_Type, Workout_Plan, scene_data FROM Videos WHERE record_id = ?", (record_id,)
+    )
+    if not video:
+        return "Not found", 404
+
+    try:
+        if video['Video_Type'] == 'workout' and video['Workout_Plan']:
+            from tools.build_workout_video import render_frame
+            plan = json.loads(video['Workout_Plan'])
+            frame = render_frame(plan, t, is_short=plan.get('is_short', False))
+        elif video['scene_data']:
+            from tools.sync_assembler import render_frame
+            frame = render_frame(json.loads(video['scene_data']), t)
+        else:
+            return "Nothing to render yet", 404
+    except Exception as e:
+        log.warning(f"[{record_id[:8]}] /frame t={t} failed: {e}")
+        return f"Frame render failed: {e}", 500
+
+    buf = io.BytesIO()
+    Image.fromarray(frame).save(buf, format='JPEG', quality=80)
+    buf.seek(0)
+    return send_file(buf, mimetype='image/jpeg', max_age=300)
+
+
+@app.route('/approve/<record_id>')
+def approve_preview(record_id):
+    """Preview accepted — queue the full-quality render."""
+    video = db.query_one(
+        "SELECT Video_Type, Workout_Plan, scene_data FROM Videos WHERE record_id = ?", (record_id,)
+    )
+    if not video:
+        return jsonify({'error': 'Not found'}), 404
+
+    try:
+        if video['Video_Type'] == 'workout' and video['Workout_Plan']:
+            jobs.enqueue('_run_build_workout', record_id, json.loads(video['Workout_Plan']), 'final',
+                         record_id=record_id)
+        elif video['scene_data']:
+            jobs.enqueue('_run_assemble_final', record_id, record_id=record_id)
+            # Only once the job exists — a full render lane must leave the card at Final Review.
+            _update_video(record_id, Status='4_Prompts_Pending', auto_prod_status='assembling')
+        else:
+            return jsonify({'error': 'Nothing to render'}), 400
+    except QueueFull as e:
+        return jsonify({'error': str(e)}), 429
+
+    return redirect(url_for('index'))
+
+
 @app.route('/download/<record_id>')
 def download_video(record_id):
     from flask import send_file
-    conn = get_db()
-    video = conn.execute(
-        "SELECT * FROM Videos WHERE record_id = ?", (record_id,)
-    ).fetchone()
-    conn.close()
+    video = db.query_one("SELECT Idea, Video_File_URL, Short_File_URL FROM Videos WHERE record_id = ?",
+                         (record_id,))
+
+    # ?format=short → the Short rendered alongside the main video
+    if request.args.get('format') == 'short':
+        if not video or not video['Short_File_URL']:
+            return "No Short found", 404
+        return send_file(video['Short_File_URL'], as_attachment=True,
+                         download_name=f"{video['Idea']} (Short).mp4")
 
     if not video or not video['Video_File_URL']:
         return "No video file found", 404
@@ -10,7 +10,7 @@ from elevenlabs.client import ElevenLabs
 import ffmpeg  #
 from google.cloud import texttospeech
 import youtube_uploader
-import sqlite3
+from tools import db
 
 # --- 1. INITIAL SETUP & LOAD ENV ---
 # ---------------------------------
@@ -110,11 +110,8 @@ def process_step_1_scripting(record):
         script = completion.choices[0].message.content
 
         # --- NEW SQL UPDATE ---
-        conn = sqlite3.connect('youtube.db')
-        conn.execute("UPDATE Videos SET Script = ?, Status = '2_Script_Review' WHERE record_id = ?",
-                     (script, record_id))
-        conn.commit()
-        conn.close()
+        db.execute("UPDATE Videos SET Script = ?, Status = '2_Script_Review' WHERE record_id = ?",
+                   (script, record_id))
         # --- END OF UPDATE ---
 
         print(f"Script generated for {idea}. Moved to '2_Script_Review'.")
@@ -122,10 +119,7 @@ def process_step_1_scripting(record):
     except Exception as e:
         print(f"Error in scripting step: {e}")
         # --- NEW SQL UPDATE ---
-        conn = sqlite3.connect('youtube.db')
-        conn.execute("UPDATE Videos SET Status = 'Failed - Asset Gen' WHERE record_id = ?", (record_id,))
-        conn.commit()
-        conn.close()
+        db.execute("UPDATE Videos SET Status = 'Failed - Asset Gen' WHERE record_id = ?", (record_id,))
         # --- END OF UPDATE ---
 
 
@@ -200,22 +194,16 @@ def process_step_3_and_4_video_gen(record):
         print(f"Created final video file: {final_video_path}")
 
         # --- Step 5: Update Database (ONLY ON SUCCESS) ---
-        conn = sqlite3.connect('youtube.db')
-        conn.execute(
+        db.execute(
             "UPDATE Videos SET Audio_File_URL = ?, Video_File_URL = ?, Status = '5_Final_Review' WHERE record_id = ?",
             (local_audio_path, final_video_path, record_id)
         )
-        conn.commit()
-        conn.close()
         print(f"Real video generation complete. Moved to '5_Final_Review'.")
 
     except Exception as e:
         print(f"Error in video gen step: {e}")
         # --- (FIXED) Set status to FAILED ---
-        conn = sqlite3.connect('youtube.db')
-        conn.execute("UPDATE Videos SET Status = 'Failed - Asset Gen' WHERE record_id = ?", (record_id,))
-        conn.commit()
-        conn.close()
+        db.execute("UPDATE Videos SET Status = 'Failed - Asset Gen' WHERE record_id = ?", (record_id,))
 
     finally:
         # --- Step 6: Clean up temp files ---
@@ -263,21 +251,15 @@ def process_step_6_upload(record):
         # --- END OF FIX ---
 
         if youtube_id:
-            conn = sqlite3.connect('youtube.db')
-            conn.execute("UPDATE Videos SET YouTube_ID = ?, Status = '7_Uploaded' WHERE record_id = ?",
-                         (youtube_id, record_id))
-            conn.commit()
-            conn.close()
+            db.execute("UPDATE Videos SET YouTube_ID = ?, Status = '7_Uploaded' WHERE record_id = ?",
+                       (youtube_id, record_id))
             print(f"Uploaded to YouTube (ID: {youtube_id}). Moved to '7_Uploaded'.")
         else:
             raise Exception("YouTube upload returned None.")
 
     except Exception as e:
         print(f"Error in Step 6: {e}")
-        conn = sqlite3.connect('youtube.db')
-        conn.execute("UPDATE Videos SET Status = 'Failed - YouTube Upload' WHERE record_id = ?", (record_id,))
-        conn.commit()
-        conn.close()
+        db.execute("UPDATE Videos SET Status = 'Failed - YouTube Upload' WHERE record_id = ?", (record_id,))
 
 
 # --- 5. MAIN ORCHESTRATOR LOOP ---
@@ -287,32 +269,24 @@ def process_step_6_upload(record):
 def main_loop():
     print("\n--- Orchestrator starting main loop ---")
 
-    conn = sqlite3.connect('youtube.db')
-    cursor = conn.cursor()
-
     try:
         # Step 1: Scripting
-        cursor.execute("SELECT * FROM Videos WHERE Status = '1_Script_Pending'")
-        records_to_script = cursor.fetchall()
+        records_to_script = db.query_all("SELECT * FROM Videos WHERE Status = '1_Script_Pending'")
         for record in records_to_script:
             process_step_1_scripting(record)
 
         # Step 3 & 4: REAL video generation
-        cursor.execute("SELECT * FROM Videos WHERE Status = '3_Asset_Gen_Pending'")
-        records_to_gen = cursor.fetchall()
+        records_to_gen = db.query_all("SELECT * FROM Videos WHERE Status = '3_Asset_Gen_Pending'")
         for record in records_to_gen:
             process_step_3_and_4_video_gen(record)
 
         # Step 6: Upload to YouTube
-        cursor.execute("SELECT * FROM Videos WHERE Status = '6_Upload_Pending'")
-        records_to_upload = cursor.fetchall()
+        records_to_upload = db.query_all("SELECT * FROM Videos WHERE Status = '6_Upload_Pending'")
         for record in records_to_upload:
             process_step_6_upload(record)
 
     except Exception as e:
         print(f"An error occurred in the main loop: {e}")
-    finally:
-        conn.close()  # Close the database connection
 
     print("--- Loop complete. Waiting... ---")
 
@@ -0,0 +1,130 @@
+"""
+Clip resolver against a local Pexels stand-in: an http.server serving
+canned /videos/search JSON and a small mp4, with PEXELS_API_URL pointed
+at it.
+"""
+
+import json
+import time
+import threading
+import subprocess
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse
+
+import pytest
+from moviepy.config import FFMPEG_BINARY
+
+from tools import clip_resolver
+from tools.clip_resolver import ClipResolver, pick_rendition
+from tools.downloads import DownloadStore
+
+RENDITIONS = [(640, 360), (1280, 720), (1920, 1080), (3840, 2160), (1080, 1920)]
+
+
+def _files(base: str) -> list[dict]:
+    return [{"width": w, "height": h, "link": f"{base}/files/{w}x{h}.mp4"} for w, h in RENDITIONS]
+
+
+@pytest.fixture(scope="module")
+def mp4(tmp_path_factory) -> bytes:
+    path = tmp_path_factory.mktemp("mp4") / "clip.mp4"
+    subprocess.run([FFMPEG_BINARY, "-y", "-loglevel", "error", "-f", "lavfi",
+                    "-i", "testsrc=size=160x90:rate=25:duration=1", "-pix_fmt", "yuv420p", str(path)], check=True)
+    return path.read_bytes()
+
+
+@pytest.fixture
+def pexels(mp4, monkeypatch):
+    """Stand-in Pexels API; yields the list of request paths it served."""
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = urlparse(self.path).path
+            requests_seen.append(path)
+            if path == "/videos/search":
+                body = json.dumps({"videos": [{"id": 1, "video_files": _files(base)}]}).encode()
+                content_type = "application/json"
+            elif path.startswith("/files/"):
+                body, content_type = mp4, "video/mp4"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    base = f"http://127.0.0.1:{server.server_port}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("PEXELS_API_URL", base)
+    monkeypatch.setattr(clip_resolver, "PEXELS_API_URL", base)
+    try:
+        yield requests_seen
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def resolver(tmp_path):
+    store = DownloadStore(tmp_path / "store", max_bytes=64 * 1024 * 1024)
+    return ClipResolver("test-key", tmp_path / "clips", tmp_path / "search", store,
+                        search_ttl=3600, concurrency=4)
+
+
+def test_search_served_from_cache_within_ttl(pexels, resolver):
+    first = resolver.search("squats workout", "landscape")
+    second = resolver.search("squats workout", "landscape")
+    assert first == second
+    assert pexels.count("/videos/search") == 1
+
+
+def test_expired_search_refetches(pexels, resolver):
+    resolver.search("squats workout", "landscape")
+    for entry in resolver.search_dir.glob("*.json"):
+        cached = json.loads(entry.read_text())
+        cached["fetched_at"] = time.time() - 2 * resolver.search_ttl
+        entry.write_text(json.dumps(cached))
+
+    resolver.search("squats workout", "landscape")
+    assert pexels.count("/videos/search") == 2
+
+
+def test_pick_rendition_closest_covering():
+    files = _files("http://x")
+    assert pick_rendition(files, 1920, 1080)["width"] == 1920        # exact size wins over 4K
+    assert pick_rendition(files, 1000, 600)["width"] == 1280
+    assert pick_rendition(files, 1080, 1920)["height"] == 1920      # portrait target → portrait file
+    assert pick_rendition(files, 5000, 3000)["width"] == 3840       # nothing covers → largest
+
+
+def test_prefetch_lands_files_in_store(pexels, resolver):
+    results = resolver.prefetch(["Squats", "Lunges", "Squats"], 1280, 720)
+
+    assert set(results) == {"Squats", "Lunges"}
+    for path in results.values():
+        assert not isinstance(path, Exception), path
+        assert path.exists() and path.suffix == ".mp4"
+        assert resolver.store.root in path.parents
+    assert resolver.store.cached(f"{clip_resolver.PEXELS_API_URL}/files/1280x720.mp4") is not None
+    # Both exercises share the rendition: one body in the store, downloaded once.
+    assert pexels.count("/files/1280x720.mp4") == 1
+
+
+def test_prefetch_links_into_job_dir(pexels, resolver, tmp_path):
+    job = tmp_path / "job" / "clips"
+    results = resolver.prefetch(["Squats"], 1280, 720, dest_dir=job)
+
+    path = results["Squats"]
+    assert path.parent == job
+    stored = resolver.store.cached(f"{clip_resolver.PEXELS_API_URL}/files/1280x720.mp4")
+    assert path.name == stored.name and path.read_bytes() == stored.read_bytes()
+    # Evicting the store leaves the build's copy in place.
+    stored.unlink()
+    assert path.exists()
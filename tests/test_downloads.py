@@ -0,0 +1,152 @@
+"""
+Download store against a local origin: an http.server with ETag /
+Last-Modified validators, conditional GET (304), Range + If-Range, and a
+switch that drops the connection part-way through the body.
+"""
+
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+import requests
+
+from tools.downloads import DownloadStore
+
+LAST_MODIFIED = "Wed, 01 Jan 2025 00:00:00 GMT"
+
+
+class Origin:
+    """Mutable state of the stand-in server, plus a log of the requests it saw."""
+
+    def __init__(self):
+        self.body = bytes(range(256)) * 4096 * 3       # 3 MiB — several store CHUNKs
+        self.etag = '"v1"'
+        self.drop_after = None                          # bytes to send before hanging up
+        self.requests = []                              # (status, request headers)
+
+    def replace(self, body: bytes, etag: str):
+        self.body, self.etag = body, etag
+
+
+@pytest.fixture
+def origin():
+    state = Origin()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            body, headers = state.body, dict(self.headers)
+            if self.headers.get("If-None-Match") == state.etag:
+                return self._reply(304, b"", headers)
+
+            start, status = 0, 200
+            wanted = self.headers.get("Range", "")
+            if wanted.startswith("bytes=") and self.headers.get("If-Range") in (state.etag, LAST_MODIFIED):
+                start, status = int(wanted[6:].split("-")[0]), 206
+            self._reply(status, body[start:], headers, start=start)
+
+        def _reply(self, status, payload, headers, start=0):
+            state.requests.append((status, headers))
+            self.send_response(status)
+            self.send_header("ETag", state.etag)
+            self.send_header("Last-Modified", LAST_MODIFIED)
+            if status == 206:
+                self.send_header("Content-Range", f"bytes {start}-{len(state.body) - 1}/{len(state.body)}")
+            self.send_header("Content-Length", str(len(payload)))
+            if state.drop_after is not None and status != 304:
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.wfile.write(payload[:state.drop_after])
+                self.wfile.flush()
+                self.close_connection = True
+                return
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    state.url = f"http://127.0.0.1:{server.server_port}/media/track.mp3"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield state
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DownloadStore(tmp_path / "store", max_bytes=64 * 1024 * 1024, timeout=5)
+
+
+def test_known_url_served_from_index(origin, store):
+    first = store.fetch(origin.url)
+    second = store.fetch(origin.url)
+
+    assert first == second == store.cached(origin.url)
+    assert first.read_bytes() == origin.body
+    assert len(origin.requests) == 1
+
+
+def test_revalidation_304_keeps_object(origin, store):
+    first = store.fetch(origin.url)
+    again = store.fetch(origin.url, max_age=0)
+
+    assert again == first
+    status, headers = origin.requests[-1]
+    assert status == 304
+    assert headers["If-None-Match"] == '"v1"'
+    assert headers["If-Modified-Since"] == LAST_MODIFIED
+
+
+def test_revalidation_picks_up_changed_body(origin, store):
+    first = store.fetch(origin.url)
+    origin.replace(b"new master" * 1000, '"v2"')
+
+    second = store.fetch(origin.url, max_age=0)
+    assert second != first
+    assert second.read_bytes() == origin.body
+    assert store.cached(origin.url) == second
+
+
+def test_dropped_body_resumes_with_range(origin, store):
+    origin.drop_after = 2_500_000
+    with pytest.raises(requests.RequestException):
+        store.fetch(origin.url)
+    assert store.cached(origin.url) is None                 # nothing published from a short body
+
+    origin.drop_after = None
+    path = store.fetch(origin.url)
+
+    assert path.read_bytes() == origin.body
+    status, headers = origin.requests[-1]
+    assert status == 206
+    offset = int(headers["Range"][len("bytes="):-1])
+    assert 0 < offset <= 2_500_000
+    assert headers["If-Range"] == '"v1"'
+    assert not list(store.partial_dir.glob("*.part"))
+
+
+def test_resume_after_origin_change_starts_over(origin, store):
+    origin.drop_after = 2_500_000
+    with pytest.raises(requests.RequestException):
+        store.fetch(origin.url)
+
+    origin.drop_after = None
+    origin.replace(bytes(reversed(origin.body)), '"v2"')  # If-Range no longer matches → full 200
+    path = store.fetch(origin.url)
+
+    assert path.read_bytes() == origin.body
+    assert origin.requests[-1][0] == 200
+
+
+def test_fetch_links_into_dest(origin, store, tmp_path):
+    dest = store.fetch(origin.url, tmp_path / "job" / "music.mp3")
+
+    assert dest.parent == tmp_path / "job"
+    assert dest.read_bytes() == origin.body
+    store.cached(origin.url).unlink()                        # evicted from the store...
+    assert dest.exists()                                     # ...but the job's copy stays
@@ -0,0 +1,122 @@
+"""
+JobQueue on a throwaway SQLite file with short leases: dedupe, admission,
+retry backoff, lease expiry, and the on_failure / still_wanted hooks.
+Jobs are claimed and run by hand (no worker threads) so every step is
+deterministic.
+"""
+
+import time
+
+import pytest
+
+from tools import job_queue
+from tools.job_queue import JobQueue, QueueFull
+
+LEASE = 0.3
+
+
+@pytest.fixture
+def jobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_queue, "RETRY_BACKOFF", 0.2)
+    return JobQueue(str(tmp_path / "jobs.db"), lanes={"io": (1, 2)}, lease_seconds=LEASE)
+
+
+def _status(jobs, job_id):
+    return next(j for j in jobs.recent() if j["id"] == job_id)
+
+
+def test_enqueue_dedupes_per_record(jobs):
+    @jobs.task(lane="io")
+    def work(record_id):
+        pass
+
+    first = jobs.enqueue("work", "a", record_id="a")
+    assert jobs.enqueue("work", "a", record_id="a") == first
+    assert jobs.enqueue("work", "b", record_id="b") != first
+
+    jobs.run_one(jobs.claim("io", "w"))               # once finished, the record can queue again
+    assert jobs.enqueue("work", "a", record_id="a") != first
+
+
+def test_admission_limit(jobs):
+    @jobs.task(lane="io")
+    def work(record_id):
+        pass
+
+    jobs.enqueue("work", "a", record_id="a")
+    jobs.enqueue("work", "b", record_id="b")
+    with pytest.raises(QueueFull):
+        jobs.enqueue("work", "c", record_id="c")
+
+    jobs.run_one(jobs.claim("io", "w"))
+    jobs.enqueue("work", "c", record_id="c")
+
+
+def test_retry_backoff_then_failure_hook(jobs):
+    failures = []
+
+    @jobs.task(lane="io", max_attempts=2, on_failure=lambda rid, error: failures.append((rid, str(error))))
+    def flaky(record_id):
+        raise RuntimeError("upstream 503")
+
+    job_id = jobs.enqueue("flaky", "a", record_id="a")
+    jobs.run_one(jobs.claim("io", "w"))
+    row = _status(jobs, job_id)
+    assert row["status"] == "queued" and row["attempts"] == 1
+    assert failures == []                             # not given up yet — no terminal status
+    assert jobs.claim("io", "w") is None              # still backing off
+
+    time.sleep(0.25)
+    job = jobs.claim("io", "w")
+    assert job["attempts"] == 2
+    jobs.run_one(job)
+    assert _status(jobs, job_id)["status"] == "failed"
+    assert failures == [("a", "upstream 503")]
+
+
+def test_expired_lease_is_reclaimed(jobs):
+    @jobs.task(lane="io", max_attempts=2)
+    def work(record_id):
+        pass
+
+    job_id = jobs.enqueue("work", "a", record_id="a")
+    assert jobs.claim("io", "dead-worker")["id"] == job_id
+    assert jobs.claim("io", "w") is None              # leased
+
+    time.sleep(LEASE + 0.1)
+    job = jobs.claim("io", "w")
+    assert job["id"] == job_id and job["attempts"] == 2
+
+
+def test_expired_lease_without_attempts_left_fails(jobs):
+    failures = []
+
+    @jobs.task(lane="io", max_attempts=1, on_failure=lambda rid, error: failures.append(rid))
+    def work(record_id):
+        pass
+
+    job_id = jobs.enqueue("work", "a", record_id="a")
+    jobs.claim("io", "dead-worker")
+
+    time.sleep(LEASE + 0.1)
+    assert jobs.claim("io", "w") is None
+    assert _status(jobs, job_id)["status"] == "failed"
+    assert failures == ["a"]
+
+
+def test_retry_dropped_when_record_moved_on(jobs, monkeypatch):
+    monkeypatch.setattr(job_queue, "RETRY_BACKOFF", 0)
+    wanted, calls = {"a": True}, []
+
+    @jobs.task(lane="io", still_wanted=lambda rid: wanted[rid])
+    def flaky(record_id):
+        calls.append(record_id)
+        raise RuntimeError("boom")
+
+    job_id = jobs.enqueue("flaky", "a", record_id="a")
+    jobs.run_one(jobs.claim("io", "w"))
+    wanted["a"] = False                               # e.g. the user reset the card
+    jobs.run_one(jobs.claim("io", "w"))
+
+    assert calls == ["a"]
+    assert _status(jobs, job_id)["status"] == "cancelled"
@@ -0,0 +1,61 @@
+"""
+Shot planning around the 5 / 10 s clip boundaries: however the cuts move
+to find a pause, no shot may get more audio than its clip (+ SHOT_SLACK).
+"""
+
+import math
+import wave
+
+import numpy as np
+import pytest
+
+from tools.scene_planner import plan_shots, clip_lengths, SLACK, CLIP_SHORT
+
+RATE = 44100
+
+
+def _speech(path, duration: float, pauses=()) -> str:
+    """Tone with a 0.3 s pause every 1.8 s (plus any extra `pauses`, in seconds) as 16-bit WAV."""
+    t = np.arange(int(duration * RATE)) / RATE
+    voiced = (t % 1.8) < 1.5
+    for at in pauses:
+        voiced &= ~((t >= at) & (t < at + 0.3))
+    pcm = (0.5 * np.sin(2 * np.pi * 300 * t) * voiced * 32767).astype(np.int16)
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(RATE)
+        f.writeframes(pcm.tobytes())
+    return str(path)
+
+
+def _check(plan: dict):
+    shots, duration = plan["shots"], plan["audio_duration"]
+    assert shots[0]["start"] == 0.0 and shots[-1]["end"] == duration
+    for a, b in zip(shots, shots[1:]):
+        assert a["end"] == b["start"]
+    for shot in shots:
+        assert shot["end"] - shot["start"] <= shot["duration"] + SLACK + 1e-3, shot
+    assert sum(s["duration"] for s in shots) == CLIP_SHORT * max(1, math.ceil((duration - SLACK) / CLIP_SHORT))
+
+
+@pytest.mark.parametrize("duration", [4.9, 9.9, 14.9, 19.9, 24.9, 29.9, 34.9, 5.3, 10.3])
+def test_shots_cover_their_audio(tmp_path, duration):
+    _check(plan_shots(_speech(tmp_path / "a.wav", duration)))
+
+
+@pytest.mark.parametrize("duration", [14.9, 24.9, 29.9])
+def test_early_pause_does_not_overload_last_shot(tmp_path, duration):
+    # A pause just before each proportional cut pulls the quiet-point search early.
+    lengths = clip_lengths(duration)
+    scale = duration / sum(lengths)
+    cuts = np.cumsum(lengths[:-1]) * scale
+    _check(plan_shots(_speech(tmp_path / "a.wav", duration, pauses=[c - 0.7 for c in cuts])))
+
+
+def test_clip_lengths_at_boundaries():
+    assert clip_lengths(4.9) == [5]
+    assert clip_lengths(5 + SLACK) == [5]
+    assert clip_lengths(9.9) == [10]
+    assert clip_lengths(14.9) == [10, 5]
+    assert clip_lengths(24.9) == [10, 10, 5]
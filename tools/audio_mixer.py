@@ -0,0 +1,239 @@
+"""
+audio_mixer.py
+--------------
+Streaming NumPy audio mixer for voice cues over a looped music bed.
+
+The MoviePy audio path built a tree per video: every pad was a dense
+float32 AudioArrayClip of zeros, every segment a concatenate_audioclips
+([cue, pad]), and the final mix a CompositeAudioClip over a
+concatenate_audioclips([music] * loops) chain — each evaluated chunk by
+chunk through several layers of Python.
+
+A Mix is just a timeline: a duration, a list of placed sources and an
+optional music bed. Nothing is allocated until a block is rendered:
+
+  - silence is implicit (a block starts as zeros)
+  - sources are placed at exact sample offsets and clipped to their end
+  - the bed is decoded by one looping ffmpeg pipe, read sequentially
+  - ducking: the bed's gain dips by `duck` under every ducking source,
+    with linear `ramp`-second fades, computed per block in NumPy
+
+write() streams the rendered blocks as raw PCM into an ffmpeg encoder,
+so memory is O(block size) whatever the video length. Short sources
+(voice cues, a few seconds each) are decoded whole and shared between
+mixes through a small LRU.
+
+Usage:
+  mix = Mix(duration)
+  mix.add("cue.mp3", start=12.0, end=52.0)
+  mix.bed("music.mp3", volume=0.12, duck=0.5)
+  mix.write("audio.m4a")                  # AAC, ready to mux with -c:a copy
+  clip.with_audio(mix.to_audioclip())     # or as a MoviePy clip
+
+Config (.env):
+  AUDIO_BLOCK_SAMPLES  — samples rendered per block (default 65536)
+"""
+
+import os
+import subprocess
+import numpy as np
+from functools import lru_cache
+from pathlib import Path
+
+from moviepy import AudioClip
+from moviepy.config import FFMPEG_BINARY
+
+from tools.ffmpeg_utils import probe_duration
+
+FPS       = 44100
+CHANNELS  = 2
+BLOCK     = int(os.getenv("AUDIO_BLOCK_SAMPLES", "65536"))
+
+
+def _pcm_args(fps: int) -> list[str]:
+    return ["-f", "f32le", "-acodec", "pcm_f32le", "-ac", str(CHANNELS), "-ar", str(fps)]
+
+
+@lru_cache(maxsize=64)
+def _decode(path: str, mtime_ns: int, fps: int) -> np.ndarray:
+    """Whole file as a read-only (n, 2) float32 array."""
+    cmd = [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-i", path, "-vn",
+           *_pcm_args(fps), "pipe:1"]
+    proc = subprocess.run(cmd, capture_output=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg could not decode {path}: {proc.stderr.decode(errors='replace')[-2000:]}")
+    pcm = np.frombuffer(proc.stdout, dtype=np.float32)
+    return pcm[:len(pcm) - len(pcm) % CHANNELS].reshape(-1, CHANNELS)
+
+
+def decode(path, fps: int = FPS) -> np.ndarray:
+    path = Path(path)
+    return _decode(str(path.resolve()), path.stat().st_mtime_ns, fps)
+
+
+class _LoopStream:
+    """Endless PCM of a looped file, read sequentially; reopens (seeking) on a jump."""
+
+    def __init__(self, path, fps: int):
+        self.path = str(path)
+        self.fps = fps
+        self.length = max(1, int(probe_duration(path) * fps))
+        self.proc = None
+        self.pos = None
+
+    def _open(self, pos: int):
+        self.close()
+        cmd = [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error",
+               "-stream_loop", "-1", "-ss", f"{(pos % self.length) / self.fps:.6f}", "-i", self.path,
+               "-vn", *_pcm_args(self.fps), "pipe:1"]
+        self.proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self.pos = pos
+
+    def read(self, pos: int, n: int) -> np.ndarray:
+        if self.proc is None or pos != self.pos:
+            self._open(pos)
+        out = np.zeros((n, CHANNELS), dtype=np.float32)
+        view = memoryview(out.reshape(-1)).cast("B")
+        got = 0
+        while got < len(view):
+            read = self.proc.stdout.readinto(view[got:])
+            if not read:
+                break
+            got += read
+        self.pos = pos + n
+        return out
+
+    def close(self):
+        if self.proc is not None:
+            self.proc.stdout.close()
+            if self.proc.poll() is None:
+                self.proc.kill()
+            self.proc.wait()
+            self.proc = None
+
+
+class Mix:
+    def __init__(self, duration: float, fps: int = FPS):
+        self.duration = duration
+        self.fps = fps
+        self.n = int(round(duration * fps))
+        self.sources = []                  # (start, end, path or array, gain, ducks)
+        self._bed = None                   # (path, volume, duck, ramp)
+        self._stream = None
+
+    # --- Timeline ---
+
+    def add(self, source, start: float = 0.0, end: float = None, gain: float = 1.0,
+            duck: bool = True) -> "Mix":
+        """
+        Place `source` (audio file or (n, 2) float32 array) at `start` seconds,
+        cut at `end`. Ducking sources lower the bed while they play.
+        """
+        s = int(round(start * self.fps))
+        e = self.n if end is None else min(self.n, int(round(end * self.fps)))
+        if isinstance(source, np.ndarray):
+            length = len(source)
+        else:
+            source = str(source)
+            length = len(decode(source, self.fps))
+        e = min(e, s + length)
+        if e > s:
+            self.sources.append((s, e, source, gain, duck))
+        return self
+
+    def bed(self, path, volume: float, duck: float = 0.0, ramp: float = 0.25) -> "Mix":
+        """Loop `path` under the whole mix at `volume`, dipping by `duck` (0–1) under voice."""
+        self._bed = (str(path), volume, duck, max(1, int(ramp * self.fps)))
+        return self
+
+    # --- Rendering ---
+
+    def _duck_gain(self, start: int, n: int, duck: float, ramp: int) -> np.ndarray | float:
+        if not duck:
+            return 1.0
+        pos = np.arange(start, start + n, dtype=np.float64)    # float32 drifts past ~6 min
+        env = np.zeros(n)
+        for s, e, _, _, ducks in self.sources:
+            if not ducks or e + ramp <= start or s - ramp >= start + n:
+                continue
+            rise = np.clip((pos - (s - ramp)) / ramp, 0.0, 1.0)
+            fall = np.clip(((e + ramp) - pos) / ramp, 0.0, 1.0)
+            np.maximum(env, np.minimum(rise, fall), out=env)
+        return (1.0 - duck * env).astype(np.float32)[:, None]
+
+    def render(self, start: int, n: int) -> np.ndarray:
+        """Samples [start, start + n) as an (n, 2) float32 block (zeros outside the mix)."""
+        out = np.zeros((n, CHANNELS), dtype=np.float32)
+        lo, hi = max(start, 0), min(start + n, self.n)
+        if lo >= hi:
+            return out
+
+        if self._bed is not None:
+            path, volume, duck, ramp = self._bed
+            if self._stream is None:
+                self._stream = _LoopStream(path, self.fps)
+            music = self._stream.read(lo, hi - lo)
+            music *= volume * self._duck_gain(lo, hi - lo, duck, ramp)
+            out[lo - start:hi - start] = music
+
+        for s, e, source, gain, _ in self.sources:
+            a, b = max(s, lo), min(e, hi)
+            if a >= b:
+                continue
+            pcm = source if isinstance(source, np.ndarray) else decode(source, self.fps)
+            seg = pcm[a - s:b - s]
+            if gain == 1.0:
+                out[a - start:b - start] += seg
+            else:
+                out[a - start:b - start] += seg * gain
+        return out
+
+    def blocks(self, block: int = BLOCK):
+        for start in range(0, self.n, block):
+            yield self.render(start, min(block, self.n - start))
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+    # --- Output ---
+
+    def write(self, path, codec: str = "aac", bitrate: str = "192k") -> str:
+        """Encode the mix to `path`, streaming PCM blocks into ffmpeg."""
+        cmd = [FFMPEG_BINARY, "-y", "-hide_banner", "-loglevel", "error",
+               *_pcm_args(self.fps), "-i", "pipe:0", "-c:a", codec, "-b:a", bitrate, str(path)]
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            for block in self.blocks():
+                np.clip(block, -1.0, 1.0, out=block)
+                proc.stdin.write(block.tobytes())
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        finally:
+            self.close()
+        stderr = proc.stderr.read().decode(errors="replace")
+        proc.stderr.close()
+        if proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg audio encode failed: {stderr.strip()[-2000:]}")
+        return str(path)
+
+    def to_audioclip(self) -> AudioClip:
+        """MoviePy view of the mix, rendered on demand (sequential reads stream)."""
+        def frame_function(t):
+            if np.isscalar(t):
+                return self.render(int(round(t * self.fps)), 1)[0]
+            idx = np.rint(np.asarray(t) * self.fps).astype(np.int64)
+            lo = int(idx.min())
+            return self.render(lo, int(idx.max()) - lo + 1)[idx - lo]
+
+        clip = AudioClip(frame_function, duration=self.duration, fps=self.fps)
+        clip.nchannels = CHANNELS
+        clip.close = self.close
+        return clip
+
+
+def silence(duration: float, fps: int = FPS) -> AudioClip:
+    """Lazy silent track — no samples are stored."""
+    return Mix(duration, fps).to_audioclip()
@@ -5,31 +5,72 @@ Generates all assets for a Finance video — 4 phases:
 
   1. DALL-E 3       → scene PNG  (static/assets/<id>/scene_<n>.png)
   2. ElevenLabs     → scene MP3  (static/assets/<id>/audio_<n>.mp3)
-  3. Kling i2v      → animated MP4 clip from the still image
-                       (static/assets/<id>/clip_<n>.mp4)
-  4. Kling lipsync  → lip-synced MP4 from clip + audio
+  3. Kling i2v      → animated MP4 clip from the still image, 5 or 10 s as
+                       the scene's audio needs; long dialogue is split into
+                       sub-shots (static/assets/<id>/clip_<n>[_<k>].mp4)
+     or Ken Burns   → the same clip rendered locally on the CPU
+                       (tools.ken_burns), exactly as long as the shot's audio
+  4. Kling lipsync  → lip-synced MP4 from clip + audio, sub-shots joined
                        (static/assets/<id>/lipsync_<n>.mp4)
 
-Scene dicts saved to DB after every step so the dashboard always shows
-the latest state even if the process is interrupted.
+Every scene advances through the phases on its own (image and audio in
+parallel, the shot plan from the audio, then clip → lipsync per shot;
+see tools.scene_planner), with per-provider concurrency limits and
+rate-limit backoff. Scene dicts are saved to DB after every step so the
+dashboard always shows the latest state even if the process is interrupted.
+
+Assets pass between fal.ai stages by URL: DALL-E's image URL feeds Kling
+i2v, the i2v result URL feeds lipsync, and each shot's audio is uploaded
+once, as soon as it exists. Only the lipsync result is needed locally on
+the critical path; clip_<n>.mp4 is downloaded in the background for the
+archive. Downloads stream into the shared download store (tools.downloads)
+and are hard-linked into static/assets/<id>/.
+
+Kling and lipsync requests are tracked by tools.fal_jobs: the request id is
+stored per scene and stage as soon as fal accepts it, completion is awaited
+on one shared polling loop, and a rerun after a restart reattaches to the
+request instead of paying for a new one.
+
+The animation backend is chosen per record (Videos.Animation_Backend):
+"kling" for fal.ai i2v, "ken_burns" for the offline camera-move engine.
+Both write clip_<n>.mp4, so lipsync and assembly don't care which ran.
 
 Required .env keys:
   OPENAI_API_KEY       — DALL-E 3 (~$0.04/image)
   ELEVENLABS_API_KEY   — ElevenLabs TTS
   FAL_API_KEY          — fal.ai Kling i2v + lipsync
+
+Optional tuning:
+  OPENAI_CONCURRENCY / ELEVENLABS_CONCURRENCY / FAL_CONCURRENCY
+                       — max in-flight calls per provider (3 / 2 / 4);
+                         for fal only uploads + submits count — queue waits
+                         don't hold a slot
+  RATE_LIMIT_RETRIES   — retries on HTTP 429 (default 5)
+  RATE_LIMIT_BACKOFF   — first backoff delay in seconds (default 5)
+  ARCHIVE_WORKERS      — parallel background clip downloads (default 2)
+  ANIMATION_BACKEND    — default backend when a record doesn't pick one (kling)
+  LOCAL_ANIMATION_CONCURRENCY
+                       — Ken Burns clips rendered at once (default: CPU count)
 """
 
 import os
 import sys
 import json
-import sqlite3
-import requests
+import time
+import random
+import threading
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 
 load_dotenv()
 
-DB_FILE         = os.getenv("DB_FILE", "youtube.db")
+from tools import db, events
+from tools.downloads import DOWNLOADS
+from tools.fal_jobs import FAL_JOBS, WEBHOOK_URL as FAL_WEBHOOK_URL
+from tools.ffmpeg_utils import concat_copy
+from tools.scene_planner import plan_shots, split_audio
+
 OPENAI_KEY      = os.getenv("OPENAI_API_KEY")
 ELEVENLABS_KEY  = os.getenv("ELEVENLABS_API_KEY")
 FAL_KEY         = os.getenv("FAL_API_KEY") or os.getenv("FAL_KEY")
@@ -46,6 +87,10 @@ ELEVEN_MODEL    = "eleven_multilingual_v2"  # Best accent consistency
 KLING_I2V_MODEL      = "fal-ai/kling-video/v2.1/standard/image-to-video"
 KLING_LIPSYNC_MODEL  = "fal-ai/sync-lipsync"
 
+# Scene animation: Kling i2v on fal.ai, or Ken Burns camera moves rendered locally
+ANIMATION_BACKENDS = ("kling", "ken_burns")
+ANIMATION_BACKEND  = os.getenv("ANIMATION_BACKEND", "kling")
+
 # ---------------------------------------------------------------------------
 # Master Character Descriptor — prepended to every DALL-E 3 prompt
 # ---------------------------------------------------------------------------
@@ -80,24 +125,15 @@ def _check_credentials():
 # DB helpers
 # ---------------------------------------------------------------------------
 
-def _get_db():
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-
 def _set_status(record_id: str, status: str):
-    conn = _get_db()
-    conn.execute("UPDATE Videos SET auto_prod_status = ? WHERE record_id = ?", (status, record_id))
-    conn.commit()
-    conn.close()
+    db.execute("UPDATE Videos SET auto_prod_status = ? WHERE record_id = ?", (status, record_id))
+    events.publish(record_id, auto_prod_status=status)
 
 
 def _save_scene_data(record_id: str, scenes: list):
-    conn = _get_db()
-    conn.execute("UPDATE Videos SET scene_data = ? WHERE record_id = ?", (json.dumps(scenes), record_id))
-    conn.commit()
-    conn.close()
+    # Checkpointed after every step of every scene — coalesced, flushed in the background.
+    db.defer(("scene_data", record_id),
+             "UPDATE Videos SET scene_data = ? WHERE record_id = ?", (json.dumps(scenes), record_id))
 
 
 # ---------------------------------------------------------------------------
@@ -118,11 +154,7 @@ def generate_image(scene_action: str, output_path: Path) -> str:
     )
     image_url = response.data[0].url
 
-    r = requests.get(image_url, timeout=60)
-    r.raise_for_status()
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(output_path, "wb") as f:
-        f.write(r.content)
+    DOWNLOADS.fetch(image_url, output_path)
 
     print(f"    Image saved: {output_path}")
     return image_url
@@ -157,97 +189,362 @@ def generate_scene_audio(dialogue: str, output_path: Path) -> Path:
 # Phase 3 — Kling image-to-video
 # ---------------------------------------------------------------------------
 
-def generate_kling_clip(image_path: str, output_path: Path) -> Path:
-    """Animate a still image into a 5-second video clip via Kling i2v."""
+def upload_asset(path) -> str:
+    """Upload a local file to fal.ai storage once; the URL is reused by later stages."""
     import fal_client
 
     os.environ["FAL_KEY"] = FAL_KEY
+    return fal_client.upload_file(str(path))
 
-    print(f"    Uploading image to fal.ai storage...")
-    image_url = fal_client.upload_file(image_path)
-
-    print(f"    Submitting Kling i2v job...")
-    handler = fal_client.submit(
-        KLING_I2V_MODEL,
-        arguments={
-            "image_url": image_url,
-            "prompt": (
-                "The cartoon character makes natural, expressive gestures — "
-                "slight head nod, hand movement, confident body language. "
-                "Smooth animation, character stays on screen."
-            ),
-            "duration": "10",
-            "aspect_ratio": "16:9",
-            "negative_prompt": "distorted face, blurry, morphing, text, watermark",
-        },
-    )
-    result = handler.get()
-    video_url = result["video"]["url"]
 
-    r = requests.get(video_url, timeout=120)
-    r.raise_for_status()
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(output_path, "wb") as f:
-        f.write(r.content)
+def generate_kling_clip(image_path: str, record_id: str, index: int, image_url: str = None,
+                        duration: int = 10, stage: str = "clip") -> str:
+    """
+    Animate a still image into a 5- or 10-second video clip via Kling i2v.
+    Returns the clip's fal.ai URL — lipsync takes it as-is, the local copy
+    is only archived. `image_url` (DALL-E's own URL) skips the image upload.
+    """
+    import fal_client
 
-    print(f"    Clip saved: {output_path}")
-    return output_path
+    os.environ["FAL_KEY"] = FAL_KEY
+
+    def submit() -> str:
+        url = image_url
+        if url is None:
+            print(f"    Uploading image to fal.ai storage...")
+            url = fal_client.upload_file(image_path)
+
+        print(f"    Submitting Kling i2v job...")
+        handler = fal_client.submit(
+            KLING_I2V_MODEL,
+            arguments={
+                "image_url": url,
+                "prompt": (
+                    "The cartoon character makes natural, expressive gestures — "
+                    "slight head nod, hand movement, confident body language. "
+                    "Smooth animation, character stays on screen."
+                ),
+                "duration": str(duration),
+                "aspect_ratio": "16:9",
+                "negative_prompt": "distorted face, blurry, morphing, text, watermark",
+            },
+            webhook_url=FAL_WEBHOOK_URL,
+        )
+        return handler.request_id
+
+    result = FAL_JOBS.run(record_id, index, stage, KLING_I2V_MODEL, [image_path],
+                          lambda: _call_provider("fal", submit), params={"duration": duration})
+    return result["video"]["url"]
 
 
 # ---------------------------------------------------------------------------
 # Phase 4 — Kling lipsync
 # ---------------------------------------------------------------------------
 
-def apply_lipsync(clip_path: str, audio_path: str, output_path: Path) -> Path:
-    """Apply lip-sync to an animated clip using the scene audio."""
+def apply_lipsync(clip: str, audio_path: str, output_path: Path, record_id: str, index: int,
+                  audio_url: str = None, stage: str = "lipsync") -> Path:
+    """
+    Apply lip-sync to an animated clip using the scene audio. `clip` is the
+    i2v result URL (passed straight through) or a local file to upload;
+    `audio_url` is the scene audio already in fal.ai storage.
+    """
     import fal_client
 
     os.environ["FAL_KEY"] = FAL_KEY
+    remote = clip.startswith(("http://", "https://"))
+
+    def submit() -> str:
+        video_url, sound_url = clip, audio_url
+        if not remote or sound_url is None:
+            print(f"    Uploading {'audio' if remote else 'clip + audio'} for lipsync...")
+        if not remote:
+            video_url = fal_client.upload_file(clip)
+        if sound_url is None:
+            sound_url = fal_client.upload_file(audio_path)
+
+        print(f"    Submitting Kling lipsync job...")
+        handler = fal_client.submit(
+            KLING_LIPSYNC_MODEL,
+            arguments={
+                "video_url": video_url,
+                "audio_url": sound_url,
+                "sync_mode": "bounce",   # smoother sync than default
+                "enhance_quality": True,
+            },
+            webhook_url=FAL_WEBHOOK_URL,
+        )
+        return handler.request_id
 
-    print(f"    Uploading clip + audio for lipsync...")
-    video_url = fal_client.upload_file(clip_path)
-    audio_url = fal_client.upload_file(audio_path)
-
-    print(f"    Submitting Kling lipsync job...")
-    handler = fal_client.submit(
-        KLING_LIPSYNC_MODEL,
-        arguments={
-            "video_url": video_url,
-            "audio_url": audio_url,
-            "sync_mode": "bounce",   # smoother sync than default
-            "enhance_quality": True,
-        },
-    )
-    result = handler.get()
+    result = FAL_JOBS.run(record_id, index, stage, KLING_LIPSYNC_MODEL, [clip, audio_path],
+                          lambda: _call_provider("fal", submit))
     output_url = result["video"]["url"]
 
-    r = requests.get(output_url, timeout=120)
-    r.raise_for_status()
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(output_path, "wb") as f:
-        f.write(r.content)
+    DOWNLOADS.fetch(output_url, output_path)
 
     print(f"    Lipsync saved: {output_path}")
     return output_path
 
 
+# ---------------------------------------------------------------------------
+# Scheduling — per-provider concurrency limits + rate-limit backoff
+# ---------------------------------------------------------------------------
+
+PROVIDER_LIMITS = {
+    "openai":     int(os.getenv("OPENAI_CONCURRENCY", "3")),
+    "elevenlabs": int(os.getenv("ELEVENLABS_CONCURRENCY", "2")),
+    "fal":        int(os.getenv("FAL_CONCURRENCY", "4")),
+    "local":      int(os.getenv("LOCAL_ANIMATION_CONCURRENCY", str(os.cpu_count() or 1))),
+}
+RATE_LIMIT_RETRIES = int(os.getenv("RATE_LIMIT_RETRIES", "5"))
+RATE_LIMIT_BACKOFF = float(os.getenv("RATE_LIMIT_BACKOFF", "5"))   # seconds, doubled per retry
+ARCHIVE_WORKERS    = int(os.getenv("ARCHIVE_WORKERS", "2"))         # background clip downloads
+
+_provider_slots = {name: threading.BoundedSemaphore(n) for name, n in PROVIDER_LIMITS.items()}
+
+
+def _is_rate_limited(exc: Exception) -> bool:
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    if status == 429:
+        return True
+    msg = str(exc).lower()
+    return "429" in msg or "rate limit" in msg or "too many requests" in msg
+
+
+def _call_provider(provider: str, fn, *args):
+    """Run one remote call inside the provider's concurrency slot, backing off on 429s."""
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        with _provider_slots[provider]:
+            try:
+                return fn(*args)
+            except Exception as e:
+                if attempt == RATE_LIMIT_RETRIES or not _is_rate_limited(e):
+                    raise
+        delay = RATE_LIMIT_BACKOFF * (2 ** attempt) * (1 + random.random() / 2)
+        print(f"    [{provider}] rate limited — retrying in {delay:.0f}s")
+        time.sleep(delay)
+
+
 # ---------------------------------------------------------------------------
 # Main pipeline
 # ---------------------------------------------------------------------------
 
-def generate_assets(record_id: str, script: str) -> list[dict]:
+# Phase → scene key that must be set on every scene for the phase to be done.
+PHASES = [
+    ("images_done",  "image_path"),
+    ("audio_done",   "audio_path"),
+    ("clips_done",   "clip_path"),
+    ("lipsync_done", "lipsync_path"),
+]
+
+
+class _SceneScheduler:
+    """
+    Advances every scene independently through the asset DAG:
+
+        audio → plan ──┐
+                       ├→ clip → lipsync  (per shot) → concat
+        image ─────────┘
+
+    Audio comes first: its exact length picks the Kling clip sizes (5 / 10 s)
+    and splits long dialogue into sub-shots (tools.scene_planner). The plan
+    is stored in scene_data as scene["plan"]; each shot has its own audio
+    slice, clip and lipsync, and a scene's shots run concurrently. With the
+    "ken_burns" backend the clip is rendered locally to the shot's audio
+    length and uploaded by lipsync instead.
+
+    Each step is skipped when its file is already on disk ("(cached)"), and
+    scene_data is checkpointed after every step, so an interrupted run
+    resumes where it stopped. The clip step is done once its URL is known;
+    its archive download runs on a small pool that run() drains at the end.
     """
-    Full 4-phase asset pipeline.
 
-    Status flow:
-      pending       → generating DALL-E 3 images
-      images_done   → generating ElevenLabs audio
-      audio_done    → generating Kling animated clips
-      clips_done    → applying Kling lipsync
+    def __init__(self, record_id: str, scenes: list, assets_dir: Path, backend: str = ANIMATION_BACKEND):
+        self.record_id = record_id
+        self.scenes = scenes
+        self.assets_dir = assets_dir
+        self.backend = backend
+        self.lock = threading.Lock()
+        self.failed = threading.Event()
+        self.status = None
+
+    def _checkpoint(self):
+        with self.lock:
+            _save_scene_data(self.record_id, self.scenes)
+            status = "pending"
+            for phase, key in PHASES:
+                if not all(s.get(key) for s in self.scenes):
+                    break
+                status = phase
+            if status != self.status:
+                self.status = status
+                _set_status(self.record_id, status)
+
+    def _step(self, scene: dict, key: str, path: Path, label: str, provider: str | None, fn, *args,
+              into: dict = None):
+        """
+        Run `fn` unless `path` exists; returns its result (None when cached).
+        The path is recorded under `key` in `into` (default: the scene).
+        provider=None: `fn` takes its own provider slot (fal jobs hold one only to submit).
+        """
+        if self.failed.is_set():
+            raise RuntimeError("aborted — another scene failed")
+        tag = f"  Scene {scene['index'] + 1}/{len(self.scenes)} {label}"
+        result = None
+        if path.exists():
+            print(f"{tag} (cached)")
+        elif provider is None:
+            print(f"{tag}...")
+            result = fn(*args)
+        else:
+            print(f"{tag}...")
+            result = _call_provider(provider, fn, *args)
+        (scene if into is None else into)[key] = str(path)
+        self._checkpoint()
+        return result
+
+    def _audio(self, scene: dict):
+        """Narration, then the shot plan and each shot's audio slice, uploaded for lipsync."""
+        n = scene["index"]
+        audio_path = self.assets_dir / f"audio_{n}.mp3"
+        self._step(scene, "audio_path", audio_path, "audio (ElevenLabs)",
+                   "elevenlabs", generate_scene_audio, scene["dialogue"], audio_path)
+
+        plan = plan_shots(audio_path)
+        shots = plan["shots"]
+        if len(shots) == 1:
+            shots[0]["audio_path"] = str(audio_path)
+        else:
+            paths = [self.assets_dir / f"audio_{n}_{k}.mp3" for k in range(len(shots))]
+            for shot, path in zip(shots, split_audio(audio_path, plan, paths)):
+                shot["audio_path"] = path
+        print(f"  Scene {n + 1}/{len(self.scenes)} plan: {plan['audio_duration']:.1f}s of dialogue → "
+              + " + ".join(f"{shot['duration']}s" for shot in shots))
+
+        # Uploaded here, off the clip's critical path, and reused by lipsync.
+        for k, shot in enumerate(shots):
+            if not self._shot_path("lipsync", n, k, len(shots)).exists():
+                shot["audio_url"] = _call_provider("fal", upload_asset, shot["audio_path"])
+        scene["plan"] = plan
+        self._checkpoint()
+
+    def _archive(self, url: str, path: Path):
+        try:
+            DOWNLOADS.fetch(url, path)
+        except Exception as e:
+            print(f"    Could not archive {path.name}: {e}")
+
+    def _shot_path(self, kind: str, n: int, k: int, count: int) -> Path:
+        """clip_<n>.mp4 for a single-shot scene, clip_<n>_<k>.mp4 per sub-shot."""
+        return self.assets_dir / (f"{kind}_{n}.mp4" if count == 1 else f"{kind}_{n}_{k}.mp4")
+
+    def _clip_paths(self, scene: dict) -> str | list[str]:
+        count = len(scene["plan"]["shots"])
+        paths = [str(self._shot_path("clip", scene["index"], k, count)) for k in range(count)]
+        return paths[0] if count == 1 else paths
+
+    def _shot(self, scene: dict, k: int, image_url: str | None, archive_pool: ThreadPoolExecutor):
+        n = scene["index"]
+        shots = scene["plan"]["shots"]
+        shot, count = shots[k], len(shots)
+        suffix = "" if count == 1 else f".{k}"
+        label = "" if count == 1 else f" shot {k + 1}/{count}"
+
+        clip_path = self._shot_path("clip", n, k, count)
+        if self.backend == "ken_burns":
+            from tools import ken_burns
+
+            # Any length works locally: cover the shot's audio, with a frame or two to spare.
+            # The seed picks the camera move, so neighbouring scenes and sub-shots differ.
+            seconds = shot["end"] - shot["start"] + 0.1
+            self._step(scene, "clip_path", clip_path, f"clip{label} (Ken Burns, {seconds:.1f}s)",
+                       "local", ken_burns.animate, scene["image_path"], clip_path, seconds, n * 2 + k, into=shot)
+            clip_url = None
+        else:
+            clip_url = self._step(scene, "clip_path", clip_path, f"clip{label} (Kling i2v, {shot['duration']}s)",
+                                  None, generate_kling_clip, scene["image_path"], self.record_id, n, image_url,
+                                  shot["duration"], f"clip{suffix}", into=shot)
+        if all(sh.get("clip_path") for sh in shots):
+            scene["clip_path"] = self._clip_paths(scene)
+        if clip_url:
+            archive_pool.submit(self._archive, clip_url, clip_path)
+        elif self.backend == "kling":
+            # Archived already — still pass the remote clip on if fal has it on record.
+            stored = FAL_JOBS.stored(self.record_id, n, f"clip{suffix}", KLING_I2V_MODEL,
+                                     [scene["image_path"]], {"duration": shot["duration"]})
+            clip_url = stored and stored["video"]["url"]
+        if clip_url:
+            shot["clip_url"] = clip_url
+        self._checkpoint()
+
+        lipsync_path = self._shot_path("lipsync", n, k, count)
+        self._step(scene, "lipsync_path", lipsync_path, f"lipsync{label} (Kling)",
+                   None, apply_lipsync, shot.get("clip_url") or shot["clip_path"], shot["audio_path"],
+                   lipsync_path, self.record_id, n, shot.get("audio_url"), f"lipsync{suffix}", into=shot)
+
+    def _scene(self, scene: dict, audio_pool: ThreadPoolExecutor, archive_pool: ThreadPoolExecutor):
+        n = scene["index"]
+        audio = audio_pool.submit(self._audio, scene)
+        try:
+            img_path = self.assets_dir / f"scene_{n}.png"
+            image_url = self._step(scene, "image_path", img_path, f"image (DALL-E 3): {scene['action'][:50]}",
+                                   "openai", generate_image, scene["action"], img_path)
+        finally:
+            audio.result()
+
+        shots = scene["plan"]["shots"]
+        lipsync_path = self.assets_dir / f"lipsync_{n}.mp4"
+        if len(shots) > 1 and lipsync_path.exists():
+            print(f"  Scene {n + 1}/{len(self.scenes)} lipsync (cached)")
+        else:
+            with ThreadPoolExecutor(len(shots), thread_name_prefix=f"scene{n}-shot") as pool:
+                for future in [pool.submit(self._shot, scene, k, image_url, archive_pool)
+                               for k in range(len(shots))]:
+                    future.result()
+            if len(shots) > 1:
+                tmp = self.assets_dir / f"lipsync_{n}.part.mp4"
+                concat_copy([shot["lipsync_path"] for shot in shots], tmp, self.assets_dir / f"lipsync_{n}.txt")
+                os.replace(tmp, lipsync_path)
+                (self.assets_dir / f"lipsync_{n}.txt").unlink(missing_ok=True)
+
+        scene["clip_path"] = self._clip_paths(scene)
+        scene["clip_url"] = shots[0].get("clip_url") if len(shots) == 1 else None
+        scene["lipsync_path"] = str(lipsync_path)
+        self._checkpoint()
+
+    def run(self):
+        self._checkpoint()
+        errors = []
+        workers = len(self.scenes)
+        with ThreadPoolExecutor(ARCHIVE_WORKERS, thread_name_prefix="archive") as archive_pool, \
+                ThreadPoolExecutor(workers, thread_name_prefix="audio") as audio_pool, \
+                ThreadPoolExecutor(workers, thread_name_prefix="scene") as scene_pool:
+            futures = [scene_pool.submit(self._scene, s, audio_pool, archive_pool) for s in self.scenes]
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    self.failed.set()
+                    errors.append(e)
+        if errors:
+            raise errors[0]
+
+
+def generate_assets(record_id: str, script: str, backend: str = ANIMATION_BACKEND) -> list[dict]:
+    """
+    Full 4-phase asset pipeline, with every scene advancing concurrently.
+    `backend` animates the stills: "kling" (fal.ai i2v) or "ken_burns" (local).
+
+    Status flow (a phase is "done" once every scene has finished it):
+      pending       → generating images / audio / clips
+      images_done   → all DALL-E 3 images ready
+      audio_done    → all ElevenLabs audio ready
+      clips_done    → all animated clips ready
       lipsync_done  → ready for sync_assembler
 
     Returns the completed scene list.
     """
+    if backend not in ANIMATION_BACKENDS:
+        raise ValueError(f"Unknown animation backend {backend!r} — expected one of {ANIMATION_BACKENDS}")
     _check_credentials()
 
     from tools.rewrite_script import parse_scenes
@@ -260,101 +557,30 @@ def generate_assets(record_id: str, script: str) -> list[dict]:
     assets_dir.mkdir(parents=True, exist_ok=True)
 
     print(f"\n[Asset Generator] {len(scenes)} scenes for record {record_id}")
+    print(f"  Animation: {backend}, provider limits: {PROVIDER_LIMITS}")
 
-    # -----------------------------------------------------------------------
-    # Phase 1: DALL-E 3 images
-    # -----------------------------------------------------------------------
-    print("\n--- Phase 1: Generating images (DALL-E 3) ---")
-    _set_status(record_id, "pending")
-
-    for scene in scenes:
-        n = scene["index"]
-        img_path = assets_dir / f"scene_{n}.png"
-        print(f"  Scene {n + 1}/{len(scenes)}: {scene['action'][:70]}...")
-        if img_path.exists():
-            print("    (cached)")
-        else:
-            generate_image(scene["action"], img_path)
-        scene["image_path"] = str(img_path)
-        _save_scene_data(record_id, scenes)
-
-    _set_status(record_id, "images_done")
-    print("Phase 1 complete.")
-
-    # -----------------------------------------------------------------------
-    # Phase 2: ElevenLabs audio
-    # -----------------------------------------------------------------------
-    print("\n--- Phase 2: Generating audio (ElevenLabs) ---")
-
-    for scene in scenes:
-        n = scene["index"]
-        audio_path = assets_dir / f"audio_{n}.mp3"
-        print(f"  Scene {n + 1}/{len(scenes)}")
-        if audio_path.exists():
-            print(f"    (cached)")
-        else:
-            generate_scene_audio(scene["dialogue"], audio_path)
-        scene["audio_path"] = str(audio_path)
-        _save_scene_data(record_id, scenes)
-
-    _set_status(record_id, "audio_done")
-    print("Phase 2 complete.")
-
-    # -----------------------------------------------------------------------
-    # Phase 3: Kling image-to-video
-    # -----------------------------------------------------------------------
-    print("\n--- Phase 3: Animating scenes (Kling i2v) ---")
-
-    for scene in scenes:
-        n = scene["index"]
-        clip_path = assets_dir / f"clip_{n}.mp4"
-        print(f"  Scene {n + 1}/{len(scenes)}")
-        if clip_path.exists():
-            print(f"    (cached)")
-        else:
-            generate_kling_clip(scene["image_path"], clip_path)
-        scene["clip_path"] = str(clip_path)
-        _save_scene_data(record_id, scenes)
-
-    _set_status(record_id, "clips_done")
-    print("Phase 3 complete.")
-
-    # -----------------------------------------------------------------------
-    # Phase 4: Kling lipsync
-    # -----------------------------------------------------------------------
-    print("\n--- Phase 4: Applying lipsync (Kling) ---")
-
-    for scene in scenes:
-        n = scene["index"]
-        lipsync_path = assets_dir / f"lipsync_{n}.mp4"
-        print(f"  Scene {n + 1}/{len(scenes)}")
-        if lipsync_path.exists():
-            print(f"    (cached)")
-        else:
-            apply_lipsync(scene["clip_path"], scene["audio_path"], lipsync_path)
-        scene["lipsync_path"] = str(lipsync_path)
-        _save_scene_data(record_id, scenes)
-
-    _set_status(record_id, "lipsync_done")
-    print("Phase 4 complete — all assets ready for assembly.")
+    started = time.time()
+    try:
+        _SceneScheduler(record_id, scenes, assets_dir, backend).run()
+    finally:
+        db.flush()
+    print(f"All assets ready for assembly ({time.time() - started:.0f}s).")
 
     return scenes
 
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: python automated_asset_generator.py <record_id>")
+        print("Usage: python automated_asset_generator.py <record_id> [kling|ken_burns]")
         sys.exit(1)
 
     record_id = sys.argv[1]
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
-    row = conn.execute("SELECT Script FROM Videos WHERE record_id = ?", (record_id,)).fetchone()
-    conn.close()
+    row = db.query_one("SELECT Script, Animation_Backend FROM Videos WHERE record_id = ?", (record_id,))
 
     if not row or not row["Script"]:
         print("No script found for that record_id.")
         sys.exit(1)
 
-    scenes = generate_assets(record_id, row["Script"])
+    backend = sys.argv[2] if len(sys.argv) > 2 else row["Animation_Backend"] or ANIMATION_BACKEND
+    scenes = generate_assets(record_id, row["Script"], backend)
     print(f"\nDone. {len(scenes)} scenes processed.")
@@ -12,9 +12,18 @@ Background music: royalty-free hip-hop from Free Music Archive.
 Voiceover: Microsoft edge-tts (free).
 
 Supports both landscape (1920x1080) and vertical Shorts (1080x1920) format.
+build_workout_videos() produces several formats from one build: clip
+resolution, voice cues, the audio of each segment and the source decode
+(tools.prepare_clips) are shared; only the fit and the overlay layout
+branch per format, and every format is encoded in the same worker pool.
 
 Usage:
-  python build_workout_video.py workout.json output.mp4
+  python build_workout_video.py workout.json output.mp4 [--short | --both] [--segmented] [--workers N]
+
+--both writes output.mp4 (landscape) and output_short.mp4 in one build.
+
+--segmented renders each intro / work / rest / break / outro segment in its
+own worker process and stitches them losslessly with ffmpeg's concat demuxer.
 
 workout.json format:
 {
@@ -32,114 +41,162 @@ workout.json format:
 import os
 import sys
 import json
-import asyncio
-import tempfile
-import requests
+import time
+import multiprocessing
 import numpy as np
 from pathlib import Path
-from PIL import Image, ImageDraw, ImageFont
-from moviepy import (
-    VideoFileClip, ImageClip, CompositeVideoClip,
-    ColorClip, concatenate_videoclips, AudioFileClip,
-    CompositeAudioClip, AudioArrayClip, concatenate_audioclips
-)
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from moviepy import VideoClip, concatenate_videoclips
 from dotenv import load_dotenv
 
-load_dotenv()
+from tools import events, reader_pool, render_profiles
+from tools.audio_mixer import Mix, silence
+from tools.clip_resolver import CLIP_RESOLVER
+from tools.compositor import Compositor
+from tools.disk_cache import DiskCache
+from tools.downloads import DOWNLOADS
+from tools.ffmpeg_utils import concat_copy
+from tools.frame_buffer import looping_clip
+from tools.glyph_atlas import GlyphAtlas, SpriteTrack
+from tools.prepare_clips import prepare_many
+from tools.tts_cache import TTS_CACHE, DEFAULT_VOICE, DEFAULT_RATE, tts_available
 
-PEXELS_KEY = os.getenv("PIXEL_API")
+load_dotenv()
 
-# Default dimensions — overridden per-build via is_short flag
+# Default dimensions — overridden per-build via is_short flag / formats
 LANDSCAPE = (1920, 1080)
 PORTRAIT  = (1080, 1920)
-FPS = 30
+FORMATS   = ("landscape", "short")
+
+# Text sprites are rasterised once per (text, size, colour) and shared by
+# every segment of every build in this process.
+ATLAS = GlyphAtlas()
+
+# Encoder settings come from the render profile ("final" or "preview", see
+# tools.render_profiles) and are shared by the export and every cached
+# segment, so a cached segment is interchangeable with a freshly rendered one.
+VOICE = DEFAULT_VOICE
+VOICE_RATE = DEFAULT_RATE
+
+# Background music level, and how far it dips (0–1) under each voice cue.
+MUSIC_VOLUME = 0.12
+MUSIC_DUCK   = float(os.getenv("MUSIC_DUCK", "0.5"))
+
+# Normalise exercise clips once (tools.prepare_clips) instead of fitting
+# them frame by frame in every render. Set PREPARE_CLIPS=0 to disable.
+PREPARE_CLIPS = os.getenv("PREPARE_CLIPS", "1") == "1"
+
+# Pre-encoded REST / round-break / section-break / intro segments, shared by
+# every build. Bump SEGMENT_CACHE_VERSION whenever their look changes.
+SEGMENT_CACHE_VERSION = 3
+SEGMENT_CACHE = DiskCache(
+    os.getenv("SEGMENT_CACHE_DIR", ".tmp/cache/segments"),
+    max_bytes=int(os.getenv("SEGMENT_CACHE_MAX_MB", "4096")) * 1024 * 1024,
+)
 
 
 # --- Progress logger ---
 
+PROGRESS_INTERVAL = float(os.getenv("PROGRESS_INTERVAL", "0.5"))   # seconds between updates
+PROGRESS_VERBOSE  = os.getenv("PROGRESS_VERBOSE", "0") == "1"
+
+
+def write_json_atomic(path: str, data: dict):
+    """Write JSON via tmp file + rename so readers never see a half-written file."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
 try:
     import proglog as _proglog
 
     class FileProgressLogger(_proglog.ProgressBarLogger):
-        """Proglog-compatible logger that writes render % to a JSON file."""
-
-        def __init__(self, progress_file: str):
+        """
+        Proglog-compatible logger that publishes render progress to a JSON file
+        and the event bus: pct, index/total, units per second, ETA and the
+        segment being rendered.
+
+        Updates are throttled to one per `min_interval` seconds (plus the final
+        one), so a per-frame callback costs a clock read and a comparison.
+        `segments` — [(end_time, name), ...] — maps the export's frame index
+        to a segment name; renderers that work per segment can instead call
+        logger(segment=name) before advancing their bar.
+        """
+
+        def __init__(self, progress_file: str, record_id: str = None, segments: list = None,
+                     fps: float = None, min_interval: float = PROGRESS_INTERVAL,
+                     verbose: bool = PROGRESS_VERBOSE):
             super().__init__()
             self.progress_file = progress_file
-            self._last_pct = -1
-            print(f"[FileProgressLogger] Initialized. Writing progress to: {progress_file}")
-
-        def bars_callback(self, bar, attr, value, _old_value=None):
-            print(f"[FileProgressLogger] bars_callback → bar={bar!r} attr={attr!r} value={value!r}", flush=True)
-            if attr == "index":
-                bar_info = self.bars.get(bar) or {}
-                total = bar_info.get("total") or 0
-                print(f"[FileProgressLogger]   bar_info={bar_info}  total={total}", flush=True)
-                if total > 0:
-                    pct = int(value / total * 100)
-                    if pct != self._last_pct:
-                        self._last_pct = pct
-                        print(f"[FileProgressLogger] Writing {pct}% ({value}/{total}) to {self.progress_file}", flush=True)
-                        try:
-                            with open(self.progress_file, "w") as f:
-                                json.dump({"pct": pct, "index": value, "total": total}, f)
-                        except Exception as write_err:
-                            print(f"[FileProgressLogger] ERROR writing progress file: {write_err}", flush=True)
-
-        def callback(self, **kw):
-            print(f"[FileProgressLogger] callback() kw={list(kw.keys())}", flush=True)
+            self.record_id = record_id
+            self.segments = segments or []
+            self.fps = fps
+            self.min_interval = min_interval
+            self.verbose = verbose
+            self._bar = None
+            self._bar_start = 0.0
+            self._last_emit = 0.0
+
+        def bars_callback(self, bar, attr, value, old_value=None):
+            if attr != "index":
+                return
+            now = time.monotonic()
+            if bar != self._bar:
+                self._bar, self._bar_start = bar, now
+            total = (self.bars.get(bar) or {}).get("total") or 0
+            if now - self._last_emit < self.min_interval and value < total:
+                return
+            self._emit(bar, value, total, now)
+
+        def _current_segment(self, bar, value):
+            if self.segments and self.fps and bar == "frame_index":
+                t = value / self.fps
+                for end_time, name in self.segments:
+                    if t < end_time:
+                        return name
+                return self.segments[-1][1]
+            return self.state.get("segment")
+
+        def _emit(self, bar, value, total, now):
+            self._last_emit = now
+            if total <= 0:
+                return
+            elapsed = now - self._bar_start
+            rate = value / elapsed if elapsed > 0 else 0.0
+            data = {
+                "pct": int(value / total * 100),
+                "index": value,
+                "total": total,
+                "bar": bar,
+                "rate": round(rate, 2),
+                "eta": round((total - value) / rate, 1) if rate > 0 else None,
+                "elapsed": round(elapsed, 1),
+                "segment": self._current_segment(bar, value),
+            }
+            try:
+                write_json_atomic(self.progress_file, data)
+            except OSError as write_err:
+                print(f"[FileProgressLogger] ERROR writing progress file: {write_err}", flush=True)
+            events.publish(self.record_id, **data)
+            if self.verbose:
+                eta = f"{data['eta']:.0f}s" if data["eta"] is not None else "?"
+                print(f"[progress] {bar} {data['pct']:3d}% ({value}/{total}) "
+                      f"{rate:.1f}/s ETA {eta}  {data['segment'] or ''}", flush=True)
 
 except ImportError:
     print("[FileProgressLogger] WARNING: proglog not installed — no render progress tracking")
     class FileProgressLogger:
-        def __init__(self, progress_file: str):
+        def __init__(self, progress_file: str, record_id: str = None, **kw):
             self.progress_file = progress_file
+        def __call__(self, **kw):
+            pass
         def callback(self, **kw):
             pass
 
 
-# --- Font helpers ---
-
-def get_font(size: int):
-    candidates = [
-        "/System/Library/Fonts/Helvetica.ttc",
-        "/System/Library/Fonts/Arial.ttf",
-        "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
-        "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf",
-    ]
-    for path in candidates:
-        if os.path.exists(path):
-            try:
-                return ImageFont.truetype(path, size)
-            except Exception:
-                pass
-    return ImageFont.load_default()
-
-
-def text_image(text: str, font_size: int, color: tuple, bg_color=None,
-               w: int = 1920, h: int = 1080,
-               position="center", alpha=255) -> np.ndarray:
-    """Render text onto a transparent (or solid) RGBA canvas of size (w, h)."""
-    img = Image.new("RGBA", (w, h), bg_color if bg_color else (0, 0, 0, 0))
-    draw = ImageDraw.Draw(img)
-    font = get_font(font_size)
-    bbox = draw.textbbox((0, 0), text, font=font)
-    tw, th = bbox[2] - bbox[0], bbox[3] - bbox[1]
-    if position == "center":
-        x, y = (w - tw) // 2, (h - th) // 2
-    elif position == "top":
-        x, y = (w - tw) // 2, int(h * 0.08)
-    elif position == "bottom":
-        x, y = (w - tw) // 2, int(h * 0.82)
-    elif isinstance(position, tuple):
-        x, y = position
-    else:
-        x, y = (w - tw) // 2, (h - th) // 2
-    draw.text((x, y), text, font=font, fill=(*color, alpha))
-    return np.array(img)
-
-
-def fit_clip_to_frame(clip, w: int, h: int) -> VideoFileClip:
+def fit_clip_to_frame(clip, w: int, h: int) -> VideoClip:
     """
     Fit a video clip into (w, h) without distortion.
     - Landscape source → landscape target: simple resize/crop
@@ -167,283 +224,269 @@ def fit_clip_to_frame(clip, w: int, h: int) -> VideoFileClip:
     return clip.resized((w, h))
 
 
-# --- Pexels video fetcher ---
-
-CLIPS_DIR = Path("clips/exercises")
-
-
-def fetch_exercise_clip(exercise: str, dest_dir: Path) -> Path:
-    """
-    Return a video clip for the given exercise.
-    Priority:
-      1. clips/exercises/<safe_name>.mp4  — user-provided clips
-      2. .tmp/.../downloads/<safe_name>.mp4 — cached Pexels download
-      3. Pexels API — download and cache
-    """
-    safe = exercise.lower().replace(" ", "_").replace("/", "_")
-
-    local = CLIPS_DIR / f"{safe}.mp4"
-    if local.exists():
-        print(f"  Using local clip: {local}")
-        return local
-
-    dest = dest_dir / f"{safe}.mp4"
-    if dest.exists():
-        return dest
-
-    if not PEXELS_KEY:
-        raise RuntimeError(f"No local clip found for '{exercise}' and PIXEL_API not set.")
+def format_size(fmt: str) -> tuple[int, int]:
+    """Layout size of an output format ("landscape" or "short")."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown output format: {fmt}")
+    return PORTRAIT if fmt == "short" else LANDSCAPE
 
-    headers = {"Authorization": PEXELS_KEY}
-    params = {"query": f"{exercise} dumbbell workout exercise", "per_page": 5, "size": "medium"}
-    r = requests.get("https://api.pexels.com/videos/search", headers=headers, params=params, timeout=15)
-    r.raise_for_status()
-    data = r.json()
 
-    if not data.get("videos"):
-        params["query"] = f"{exercise} workout"
-        r = requests.get("https://api.pexels.com/videos/search", headers=headers, params=params, timeout=15)
-        r.raise_for_status()
-        data = r.json()
+# --- Exercise clips ---
+# Resolution (local clip → cached Pexels search → shared download store) lives
+# in tools.clip_resolver; builds prefetch every exercise of the plan up front,
+# linking stock clips into the job directory so store eviction can't touch them.
 
-    if not data.get("videos"):
-        raise RuntimeError(f"No clip found for: {exercise}. Add one to clips/exercises/{safe}.mp4")
-
-    video = data["videos"][0]
-    files = sorted(video["video_files"], key=lambda x: x.get("width", 0), reverse=True)
-    url = next((f["link"] for f in files if f.get("width", 0) <= 1920), files[0]["link"])
-
-    print(f"  Downloading from Pexels: {exercise}")
-    with requests.get(url, stream=True, timeout=60) as resp:
-        resp.raise_for_status()
-        with open(dest, "wb") as f:
-            for chunk in resp.iter_content(chunk_size=65536):
-                f.write(chunk)
-    return dest
+def fetch_exercise_clips(plan: dict, w: int, h: int, dest_dir: Path = None) -> dict:
+    """Resolve every exercise in the plan concurrently. Returns {exercise: Path}."""
+    exercises = [ex for section in plan["sections"] for ex in section["exercises"]]
+    clips = CLIP_RESOLVER.prefetch(exercises, w, h, dest_dir)
+    for exercise, result in clips.items():
+        if isinstance(result, Exception):
+            raise result
+    return clips
 
 
 # --- Voiceover ---
-
-async def _tts(text: str, path: str):
-    try:
-        import edge_tts
-        communicate = edge_tts.Communicate(text, "en-US-GuyNeural")
-        await communicate.save(path)
-    except ImportError:
-        pass
+# Cues come from the shared TTS phrase cache; build_workout_video prefetches
+# every cue of the timeline up front, so lookups here are normally hits.
+
+def cue_text(kind: str, *labels) -> str | None:
+    """Spoken cue for a segment kind, or None for silent segments."""
+    if kind == "work":
+        return f"Starting {labels[0]}"
+    if kind == "rest":
+        return f"Rest. Next up, {labels[0]}"
+    if kind == "round_break":
+        return f"Round {labels[0]} complete. Get ready for round {labels[0] + 1}."
+    if kind == "section_break":
+        return f"Great work! Get ready for {labels[0]}."
+    return None
 
 
-def make_voiceover(text: str, path: str):
-    asyncio.run(_tts(text, path))
+def spec_cue(spec: dict) -> str | None:
+    """Spoken cue of a timeline entry."""
+    if spec["kind"] == "work":
+        return cue_text("work", spec["exercise"])
+    return cue_text(spec["kind"], *spec["labels"])
 
 
-def silence(duration: float) -> AudioArrayClip:
-    samples = int(44100 * duration)
-    arr = np.zeros((samples, 2), dtype=np.float32)
-    return AudioArrayClip(arr, fps=44100)
+def cue_audio(text: str, duration: int):
+    """Voice cue, cut or padded with (implicit) silence to exactly `duration` seconds."""
+    path = TTS_CACHE.get(text, VOICE, VOICE_RATE) if text else None
+    if not path:
+        return silence(duration)
+    return Mix(duration).add(path).to_audioclip()
 
 
 # --- Video segment builders ---
 # All builders accept w, h so they work correctly for both landscape and Shorts.
+# w, h is the layout; the frames come out at the profile's frame_size().
 
 def make_exercise_segment(exercise: str, video_path: Path,
-                          duration: int, tmp_dir: Path,
-                          w: int, h: int) -> VideoFileClip:
-    """Work segment: stock footage + overlays."""
-    base = VideoFileClip(str(video_path)).without_audio()
-
-    if (base.duration or 0) < duration:
-        loops = int(duration / (base.duration or 1)) + 1
-        base = concatenate_videoclips([base] * loops)
-    base = base.subclipped(0, duration)
-    base = fit_clip_to_frame(base, w, h)
-
-    dark = ColorClip((w, h), color=(0, 0, 0), duration=duration).with_opacity(0.45)
+                          duration: int, w: int, h: int, prepared: bool = False,
+                          profile: str = "final", buffered: bool = True) -> VideoClip:
+    """
+    Work segment: stock footage + overlays. `prepared` clips come from
+    tools.prepare_clips — already at the output size and FPS and
+    loop-seamless — so they skip the per-frame fit. Clips shorter than the
+    segment are decoded and fitted once into a frame buffer and looped
+    from memory; buffered=False loops the pooled reader instead, so a
+    caller after a single frame pays one seek, not a whole-clip decode.
+    """
+    ow, oh = render_profiles.frame_size(w, h, profile)
+    base = looping_clip(video_path, ow, oh, render_profiles.get(profile)["fps"], duration) if buffered else None
+    if base is None:
+        base = reader_pool.video(video_path)
+        if (base.duration or 0) < duration:
+            loops = int(duration / (base.duration or 1)) + 1
+            base = concatenate_videoclips([base] * loops)
+        base = base.subclipped(0, duration)
+        if not prepared:
+            base = fit_clip_to_frame(base, ow, oh)
 
     font_name  = 72  if w >= 1920 else 90   # larger font for Shorts (narrower but taller)
     font_count = 130 if w >= 1920 else 150
     font_warn  = 160 if w >= 1920 else 180
 
-    name_arr  = text_image(exercise.upper(), font_name, (255, 255, 255), w=w, h=h, position="top")
-    name_clip = ImageClip(name_arr).with_duration(duration)
-
-    work_arr  = text_image("WORK", 40, (255, 255, 255),
-                           bg_color=(220, 50, 50, 200), w=160, h=60, position="center")
-    work_clip = ImageClip(work_arr).with_duration(duration).with_position((40, 40))
-
-    countdown_clips = []
+    track = SpriteTrack(w, h)
+    track.add(ATLAS.label(exercise.upper(), font_name, (255, 255, 255)), "top")
+    track.add(ATLAS.badge("WORK", 40, (255, 255, 255), (220, 50, 50, 200), (160, 60)), (40, 40))
     for sec in range(duration, 0, -1):
         t_start = duration - sec
         is_warn = sec <= 5
         color = (255, 60, 60) if is_warn else (255, 255, 255)
         fs = font_warn if is_warn else font_count
-        arr  = text_image(str(sec), fs, color, w=w, h=h, position="bottom")
-        clip = ImageClip(arr).with_start(t_start).with_duration(1)
-        countdown_clips.append(clip)
+        track.add(ATLAS.number(sec, fs, color), "bottom", start=t_start, end=t_start + 1)
 
-    vo_path = str(tmp_dir / f"vo_{exercise.replace(' ', '_')}_start.mp3")
-    make_voiceover(f"Starting {exercise}", vo_path)
-    audio = AudioFileClip(vo_path) if os.path.exists(vo_path) else silence(duration)
-    pad   = silence(max(0, duration - (audio.duration or 0)))
-    full_audio = concatenate_audioclips([audio, pad]).subclipped(0, duration)
+    full_audio = cue_audio(cue_text("work", exercise), duration)
 
-    composite = CompositeVideoClip([base, dark, name_clip, work_clip] + countdown_clips)
+    composite = Compositor(track, dim=0.45, size=(ow, oh)).apply(base)
     return composite.with_audio(full_audio)
 
 
-def make_rest_segment(next_exercise: str, duration: int, tmp_dir: Path,
-                      w: int, h: int) -> CompositeVideoClip:
+def make_rest_segment(next_exercise: str, duration: int,
+                      w: int, h: int, profile: str = "final") -> VideoClip:
     """Rest screen."""
-    clips = []
+    track = SpriteTrack(w, h)
+    track.add(ATLAS.label("REST", 160, (76, 200, 76)), ((w - 400) // 2, int(h * 0.15)))
+    track.add(ATLAS.label(f"Next: {next_exercise.upper()}", 52, (180, 180, 180)),
+              ((w - min(900, w - 40)) // 2, int(h * 0.5)))
     for sec in range(duration, 0, -1):
         t_start = duration - sec
-        bg_arr = np.zeros((h, w, 3), dtype=np.uint8)
-        bg_arr[:] = (15, 30, 15)
-        bg_clip = ImageClip(bg_arr).with_start(t_start).with_duration(1)
-
-        rest_arr  = text_image("REST", 160, (76, 200, 76), w=w, h=h,
-                               position=((w - 400) // 2, int(h * 0.15)))
-        rest_clip = ImageClip(rest_arr).with_start(t_start).with_duration(1)
-
-        next_arr  = text_image(f"Next: {next_exercise.upper()}", 52, (180, 180, 180), w=w, h=h,
-                               position=((w - min(900, w - 40)) // 2, int(h * 0.5)))
-        next_clip = ImageClip(next_arr).with_start(t_start).with_duration(1)
-
-        count_arr  = text_image(str(sec), 100, (255, 255, 255), w=w, h=h, position="bottom")
-        count_clip = ImageClip(count_arr).with_start(t_start).with_duration(1)
+        track.add(ATLAS.number(sec, 100, (255, 255, 255)), "bottom", start=t_start, end=t_start + 1)
 
-        clips.extend([bg_clip, rest_clip, next_clip, count_clip])
+    full_audio = cue_audio(cue_text("rest", next_exercise), duration)
 
-    vo_path = str(tmp_dir / f"vo_rest_{next_exercise.replace(' ', '_')}.mp3")
-    make_voiceover(f"Rest. Next up, {next_exercise}", vo_path)
-    audio = AudioFileClip(vo_path) if os.path.exists(vo_path) else silence(duration)
-    pad   = silence(max(0, duration - (audio.duration or 0)))
-    full_audio = concatenate_audioclips([audio, pad]).subclipped(0, duration)
-
-    composite = CompositeVideoClip(clips, size=(w, h)).with_duration(duration)
+    size = render_profiles.frame_size(w, h, profile)
+    composite = Compositor(track, bg_color=(15, 30, 15), size=size).to_clip(duration)
     return composite.with_audio(full_audio)
 
 
-def make_section_break(section_name: str, duration: int, tmp_dir: Path,
-                       w: int, h: int) -> CompositeVideoClip:
+def make_section_break(section_name: str, duration: int,
+                       w: int, h: int, profile: str = "final") -> VideoClip:
     """Section break between upper/lower body."""
-    clips = []
+    track = SpriteTrack(w, h)
+    track.add(ATLAS.label("Great Work!", 100, (255, 215, 0)), ((w - 700) // 2, int(h * 0.2)))
+    track.add(ATLAS.label(f"Starting {section_name.upper()}", 60, (255, 255, 255)),
+              ((w - min(900, w - 40)) // 2, int(h * 0.42)))
     for sec in range(duration, 0, -1):
         t_start = duration - sec
-        bg_arr = np.zeros((h, w, 3), dtype=np.uint8)
-        bg_arr[:] = (10, 10, 30)
-        bg_clip = ImageClip(bg_arr).with_start(t_start).with_duration(1)
-
-        title_arr = text_image("Great Work!", 100, (255, 215, 0), w=w, h=h,
-                               position=((w - 700) // 2, int(h * 0.2)))
-        title_clip = ImageClip(title_arr).with_start(t_start).with_duration(1)
-
-        next_arr  = text_image(f"Starting {section_name.upper()}", 60, (255, 255, 255), w=w, h=h,
-                               position=((w - min(900, w - 40)) // 2, int(h * 0.42)))
-        next_clip = ImageClip(next_arr).with_start(t_start).with_duration(1)
-
-        in_arr  = text_image(f"in {sec} seconds", 50, (160, 160, 160), w=w, h=h,
-                             position=((w - 600) // 2, int(h * 0.56)))
-        in_clip = ImageClip(in_arr).with_start(t_start).with_duration(1)
+        track.add(ATLAS.label(f"in {sec} seconds", 50, (160, 160, 160)),
+                  ((w - 600) // 2, int(h * 0.56)), start=t_start, end=t_start + 1)
 
-        clips.extend([bg_clip, title_clip, next_clip, in_clip])
+    full_audio = cue_audio(cue_text("section_break", section_name), duration)
 
-    vo_path = str(tmp_dir / f"vo_break_{section_name.replace(' ', '_')}.mp3")
-    make_voiceover(f"Great work! Get ready for {section_name}.", vo_path)
-    audio = AudioFileClip(vo_path) if os.path.exists(vo_path) else silence(duration)
-    pad   = silence(max(0, duration - (audio.duration or 0)))
-    full_audio = concatenate_audioclips([audio, pad]).subclipped(0, duration)
-
-    composite = CompositeVideoClip(clips, size=(w, h)).with_duration(duration)
+    size = render_profiles.frame_size(w, h, profile)
+    composite = Compositor(track, bg_color=(10, 10, 30), size=size).to_clip(duration)
     return composite.with_audio(full_audio)
 
 
-def make_round_break(round_num: int, total_rounds: int, duration: int, tmp_dir: Path,
-                     w: int, h: int) -> CompositeVideoClip:
+def make_round_break(round_num: int, total_rounds: int, duration: int,
+                     w: int, h: int, profile: str = "final") -> VideoClip:
     """Break between rounds."""
-    clips = []
+    track = SpriteTrack(w, h)
+    track.add(ATLAS.label(f"Round {round_num} Complete!", 90, (255, 215, 0)),
+              ((w - 800) // 2, int(h * 0.2)))
+    track.add(ATLAS.label(f"Round {round_num + 1} of {total_rounds}", 65, (255, 255, 255)),
+              ((w - 600) // 2, int(h * 0.42)))
     for sec in range(duration, 0, -1):
         t_start = duration - sec
-        bg_arr = np.zeros((h, w, 3), dtype=np.uint8)
-        bg_arr[:] = (20, 20, 20)
-        bg_clip = ImageClip(bg_arr).with_start(t_start).with_duration(1)
+        track.add(ATLAS.label(f"starting in {sec}s", 48, (160, 160, 160)),
+                  ((w - 500) // 2, int(h * 0.56)), start=t_start, end=t_start + 1)
+        track.add(ATLAS.number(sec, 80, (255, 255, 255)), "bottom", start=t_start, end=t_start + 1)
 
-        done_arr  = text_image(f"Round {round_num} Complete!", 90, (255, 215, 0), w=w, h=h,
-                               position=((w - 800) // 2, int(h * 0.2)))
-        done_clip = ImageClip(done_arr).with_start(t_start).with_duration(1)
+    full_audio = cue_audio(cue_text("round_break", round_num), duration)
 
-        next_arr  = text_image(f"Round {round_num + 1} of {total_rounds}", 65, (255, 255, 255), w=w, h=h,
-                               position=((w - 600) // 2, int(h * 0.42)))
-        next_clip = ImageClip(next_arr).with_start(t_start).with_duration(1)
+    size = render_profiles.frame_size(w, h, profile)
+    composite = Compositor(track, bg_color=(20, 20, 20), size=size).to_clip(duration)
+    return composite.with_audio(full_audio)
 
-        in_arr  = text_image(f"starting in {sec}s", 48, (160, 160, 160), w=w, h=h,
-                             position=((w - 500) // 2, int(h * 0.56)))
-        in_clip = ImageClip(in_arr).with_start(t_start).with_duration(1)
 
-        count_arr  = text_image(str(sec), 80, (255, 255, 255), w=w, h=h, position="bottom")
-        count_clip = ImageClip(count_arr).with_start(t_start).with_duration(1)
+def make_intro(title: str, duration: int = 5, w: int = 1920, h: int = 1080,
+               profile: str = "final") -> VideoClip:
+    """Simple 5-second intro/outro card (silent track, so segments concat cleanly)."""
+    track = SpriteTrack(w, h)
+    track.add(ATLAS.label(title.upper(), 80, (255, 255, 255)), "center")
+    size = render_profiles.frame_size(w, h, profile)
+    return Compositor(track, bg_color=(10, 10, 30), size=size).to_clip(duration).with_audio(silence(duration))
 
-        clips.extend([bg_clip, done_clip, next_clip, in_clip, count_clip])
 
-    vo_path = str(tmp_dir / f"vo_round_{round_num}_break.mp3")
-    make_voiceover(f"Round {round_num} complete. Get ready for round {round_num + 1}.", vo_path)
-    audio = AudioFileClip(vo_path) if os.path.exists(vo_path) else silence(duration)
-    pad   = silence(max(0, duration - (audio.duration or 0)))
-    full_audio = concatenate_audioclips([audio, pad]).subclipped(0, duration)
+# --- Segment cache ---
 
-    composite = CompositeVideoClip(clips, size=(w, h)).with_duration(duration)
-    return composite.with_audio(full_audio)
+def _segment_key(kind: str, labels: tuple, duration: int, w: int, h: int,
+                 profile: str = "final") -> str:
+    return DiskCache.key(SEGMENT_CACHE_VERSION, kind, labels, duration,
+                         render_profiles.frame_size(w, h, profile), render_profiles.get(profile),
+                         VOICE, VOICE_RATE, tts_available())
+
+
+def ensure_cached_segment(kind: str, labels: tuple, duration: int, w: int, h: int,
+                          build, profile: str = "final") -> tuple[Path, bool]:
+    """
+    Make sure a template segment is encoded in SEGMENT_CACHE, rendering it
+    with `build()` on a miss. Returns (path, was_hit).
+
+    The key covers everything that changes the encoded bytes: segment kind,
+    its text labels, duration, frame size, FPS, encoder settings and voice.
+    """
+    key = _segment_key(kind, labels, duration, w, h, profile)
+    path = SEGMENT_CACHE.get(key, ".mp4")
+    if path is not None:
+        return path, True
+    clip = build()
+    tmp = SEGMENT_CACHE.reserve(key, ".mp4")
+    clip.write_videofile(
+        str(tmp),
+        fps=render_profiles.get(profile)["fps"],
+        threads=4,
+        temp_audiofile_path=str(tmp.parent),
+        logger=None,
+        **render_profiles.encode_params(profile),
+    )
+    clip.close()
+    return SEGMENT_CACHE.put(key, tmp, ".mp4"), False
 
 
-def make_intro(title: str, duration: int = 5, w: int = 1920, h: int = 1080) -> CompositeVideoClip:
-    """Simple 5-second intro/outro card."""
-    bg_arr = np.zeros((h, w, 3), dtype=np.uint8)
-    bg_arr[:] = (10, 10, 30)
-    bg_clip    = ImageClip(bg_arr).with_duration(duration)
-    title_arr  = text_image(title.upper(), 80, (255, 255, 255), w=w, h=h)
-    title_clip = ImageClip(title_arr).with_duration(duration)
-    return CompositeVideoClip([bg_clip, title_clip]).with_duration(duration)
+def cached_segment(kind: str, labels: tuple, duration: int, w: int, h: int, build,
+                   profile: str = "final"):
+    """Template segment as a clip, loaded from SEGMENT_CACHE when possible."""
+    path, hit = ensure_cached_segment(kind, labels, duration, w, h, build, profile)
+    if hit:
+        print(f"    ({kind} segment cached)")
+    return reader_pool.video(path, audio=True).with_duration(duration)
 
 
 # --- Music ---
 
 def fetch_music(tmp_dir: Path) -> str | None:
+    """First available track, from the shared download store (fetched once, ever)."""
     tracks = [
         "https://files.freemusicarchive.org/storage-freemusicarchive-org/music/no_curator/Broke_For_Free/Directionless_EP/Broke_For_Free_-_01_-_Night_Owl.mp3",
         "https://files.freemusicarchive.org/storage-freemusicarchive-org/music/ccCommunity/Kai_Engel/Sustains/Kai_Engel_-_09_-_Downfall.mp3",
     ]
-    dest = tmp_dir / "background_music.mp3"
-    if dest.exists():
-        return str(dest)
     for url in tracks:
         try:
-            print("  Downloading background music...")
-            r = requests.get(url, timeout=30, stream=True)
-            if r.status_code == 200:
-                with open(dest, "wb") as f:
-                    for chunk in r.iter_content(65536):
-                        f.write(chunk)
-                return str(dest)
-        except Exception:
-            continue
+            return str(DOWNLOADS.fetch(url, tmp_dir / "background_music.mp3"))
+        except Exception as e:
+            print(f"  Music download failed: {e}")
     return None
 
 
-def add_background_music(video, music_path: str, volume: float = 0.12):
-    music = AudioFileClip(music_path)
-    loops = int((video.duration or 0) / (music.duration or 1)) + 2
-    looped = concatenate_audioclips([music] * loops).subclipped(0, video.duration or 1)
-    looped = looped.with_volume_scaled(volume)
-    if video.audio:
-        mixed = CompositeAudioClip([video.audio, looped])
-        return video.with_audio(mixed)
-    return video.with_audio(looped)
+def timeline_mix(timeline: list[dict], music_path: str = None, volume: float = MUSIC_VOLUME,
+                 duck: float = MUSIC_DUCK) -> Mix:
+    """
+    The whole soundtrack: every voice cue at its segment's start (cut at the
+    segment's end) over the looped music, ducked under the cues.
+    """
+    mix = Mix(sum(spec["duration"] for spec in timeline))
+    start = 0
+    for spec in timeline:
+        text = spec_cue(spec)
+        path = TTS_CACHE.get(text, VOICE, VOICE_RATE) if text else None
+        if path:
+            mix.add(path, start=start, end=start + spec["duration"])
+        start += spec["duration"]
+    if music_path:
+        mix.bed(music_path, volume, duck=duck)
+    return mix
 
 
-# --- Main builder ---
+# --- Timeline ---
+# The plan is compiled into a flat list of segment specs (plain dicts, so
+# they can be shipped to worker processes). Template kinds are fully
+# described by their labels and are served from SEGMENT_CACHE; "work"
+# segments depend on the stock clip and are always rendered.
+
+TEMPLATE_KINDS = {"intro", "rest", "round_break", "section_break"}
+OUTRO_TITLE = "Great Work! Subscribe for More!"
+
 
-def build_workout_video(plan: dict, output_path: str, record_id: str = None, is_short: bool = False):
-    """Build the full workout video. is_short=True produces 1080x1920 vertical format."""
+def compile_timeline(plan: dict, clips: dict) -> list[dict]:
+    """
+    Walk sections / rounds / exercises and return the ordered segment specs.
+    `clips` maps each exercise to its resolved source clip (fetch_exercise_clips);
+    exercises missing from it get video_path None, to be resolved by the caller.
+    """
     title         = plan.get("title", "Dumbbell Workout")
     sections      = plan["sections"]
     work_dur      = plan.get("work_duration", 40)
@@ -452,18 +495,7 @@ def build_workout_video(plan: dict, output_path: str, record_id: str = None, is_
     global_rounds = plan.get("rounds", 1)
     round_rest    = plan.get("round_rest", 30)
 
-    w, h = PORTRAIT if is_short else LANDSCAPE
-    print(f"Format: {'Shorts (portrait)' if is_short else 'Landscape'} — {w}x{h}")
-
-    tmp_dir   = Path(".tmp") / f"workout_{record_id or Path(output_path).stem}"
-    downloads = tmp_dir / "downloads"
-    tmp_dir.mkdir(parents=True, exist_ok=True)
-    downloads.mkdir(exist_ok=True)
-
-    all_clips = []
-
-    print("Building intro...")
-    all_clips.append(make_intro(title, w=w, h=h))
+    timeline = [{"kind": "intro", "labels": (title,), "duration": 5}]
 
     for s_idx, section in enumerate(sections):
         section_name  = section["name"]
@@ -480,9 +512,10 @@ def build_workout_video(plan: dict, output_path: str, record_id: str = None, is_
 
             for e_idx, exercise in enumerate(exercises):
                 print(f"    [{e_idx + 1}/{len(exercises)}] {exercise}")
-                video_path = fetch_exercise_clip(exercise, downloads)
-                work_clip  = make_exercise_segment(exercise, video_path, work_dur, tmp_dir, w, h)
-                all_clips.append(work_clip)
+                video_path = clips.get(exercise)
+                timeline.append({"kind": "work", "exercise": exercise,
+                                 "video_path": str(video_path) if video_path else None,
+                                 "duration": work_dur})
 
                 is_last_exercise = (e_idx == len(exercises) - 1)
                 is_very_last     = is_last_section and is_last_round and is_last_exercise
@@ -496,61 +529,392 @@ def build_workout_video(plan: dict, output_path: str, record_id: str = None, is_
                         next_ex = sections[s_idx + 1]["exercises"][0]
                     else:
                         next_ex = "Done!"
-                    rest_clip = make_rest_segment(next_ex, rest_dur, tmp_dir, w, h)
-                    all_clips.append(rest_clip)
+                    timeline.append({"kind": "rest", "labels": (next_ex,), "duration": rest_dur})
 
             if not is_last_round:
                 print(f"  Round break → Round {round_num + 1}")
-                round_clip = make_round_break(round_num, rounds, round_rest, tmp_dir, w, h)
-                all_clips.append(round_clip)
+                timeline.append({"kind": "round_break", "labels": (round_num, rounds),
+                                 "duration": round_rest})
 
         if not is_last_section:
             next_section = sections[s_idx + 1]["name"]
             print(f"  Section break → {next_section}")
-            break_clip = make_section_break(next_section, section_rest, tmp_dir, w, h)
-            all_clips.append(break_clip)
+            timeline.append({"kind": "section_break", "labels": (next_section,),
+                             "duration": section_rest})
 
-    print("\nBuilding outro...")
-    all_clips.append(make_intro("Great Work! Subscribe for More!", w=w, h=h))
+    timeline.append({"kind": "intro", "labels": (OUTRO_TITLE,), "duration": 5})
+    return timeline
+
+
+def _template_builder(spec: dict, w: int, h: int, profile: str = "final"):
+    kind, labels, dur = spec["kind"], spec["labels"], spec["duration"]
+    if kind == "intro":
+        return lambda: make_intro(labels[0], dur, w, h, profile)
+    if kind == "rest":
+        return lambda: make_rest_segment(labels[0], dur, w, h, profile)
+    if kind == "round_break":
+        return lambda: make_round_break(labels[0], labels[1], dur, w, h, profile)
+    if kind == "section_break":
+        return lambda: make_section_break(labels[0], dur, w, h, profile)
+    raise ValueError(f"Unknown segment kind: {kind}")
+
+
+def prefetch_cues(timeline: list[dict], layouts: list[tuple[int, int]], profile: str = "final") -> dict:
+    """
+    Synthesise every voice cue the timeline still needs, concurrently in one
+    event loop. Template segments already in SEGMENT_CACHE (in every layout)
+    need no cue. Returns the TTS cache hit/miss counts for this prefetch.
+    """
+    phrases = []
+    for spec in timeline:
+        if spec["kind"] == "work":
+            phrases.append(spec_cue(spec))
+        elif not all(SEGMENT_CACHE.path(_segment_key(spec["kind"], spec["labels"], spec["duration"],
+                                                     w, h, profile), ".mp4").exists()
+                     for w, h in layouts):
+            phrases.append(spec_cue(spec))
+
+    before = TTS_CACHE.stats()
+    TTS_CACHE.prefetch([p for p in phrases if p], VOICE, VOICE_RATE)
+    after = TTS_CACHE.stats()
+    return {k: after[k] - before[k] for k in after}
+
+
+def build_segment(spec: dict, w: int, h: int, profile: str = "final"):
+    """MoviePy clip for one timeline entry."""
+    if spec["kind"] == "work":
+        prepared = spec.get("prepared", {}).get(render_profiles.frame_size(w, h, profile))
+        return make_exercise_segment(spec["exercise"], Path(prepared or spec["video_path"]),
+                                     spec["duration"], w, h, prepared is not None,
+                                     profile)
+    return cached_segment(spec["kind"], spec["labels"], spec["duration"], w, h,
+                          _template_builder(spec, w, h, profile), profile)
+
+
+def prepare_timeline_clips(timeline: list[dict], layouts: list[tuple[int, int]],
+                           profile: str = "final") -> int:
+    """
+    Record, per work segment, its normalised intermediate at the profile's
+    output size of every layout (prepared in parallel, once per library,
+    one source decode for all sizes) in spec["prepared"]. Sources that fail
+    to prepare keep the raw clip and the per-frame fit. Returns the number
+    of intermediates in use.
+    """
+    sizes = [render_profiles.frame_size(w, h, profile) for w, h in layouts]
+    sources = {spec["video_path"] for spec in timeline if spec["kind"] == "work"}
+    results = prepare_many(sources, sizes, fps=render_profiles.get(profile)["fps"])
+    for (src, (w, h)), out in results.items():
+        if isinstance(out, Exception):
+            print(f"  Clip prep failed for {src} @ {w}x{h} — using raw clip: {out}")
+
+    prepared = 0
+    for spec in timeline:
+        if spec["kind"] != "work":
+            continue
+        spec["prepared"] = {}
+        for size in sizes:
+            out = results.get((spec["video_path"], size))
+            if out is not None and not isinstance(out, Exception):
+                spec["prepared"][size] = str(out)
+                prepared += 1
+    return prepared
+
+
+def segment_digest(spec: dict) -> str:
+    """Content hash of a timeline entry — equal digests render identical segments."""
+    return DiskCache.key(spec["kind"], spec.get("exercise"), spec.get("video_path"),
+                         sorted(spec.get("prepared", {}).items()), spec.get("labels", ()),
+                         spec["duration"])
+
+
+def dedupe_timeline(timeline: list[dict]) -> tuple[list[dict], list[int]]:
+    """
+    Collapse identical entries (the same exercise in every round, repeated
+    rest screens, ...). Returns (unique specs, index into them per entry).
+    """
+    unique, refs, seen = [], [], {}
+    for spec in timeline:
+        digest = segment_digest(spec)
+        if digest not in seen:
+            seen[digest] = len(unique)
+            unique.append(spec)
+        refs.append(seen[digest])
+    return unique, refs
+
+
+def segment_name(spec: dict) -> str:
+    """Human-readable name of a timeline entry, for progress reporting."""
+    kind, labels = spec["kind"], spec.get("labels", ())
+    if kind == "work":
+        return spec["exercise"]
+    if kind == "rest":
+        return f"Rest → {labels[0]}"
+    if kind == "round_break":
+        return f"Round {labels[0]}/{labels[1]} break"
+    if kind == "section_break":
+        return f"Up next: {labels[0]}"
+    return "Outro" if labels == (OUTRO_TITLE,) else "Intro"
+
+
+# --- Segmented rendering ---
+
+def _render_segment(spec: dict, targets: list[tuple[int, int, str]],
+                    threads: int, profile: str = "final") -> tuple[list[str], int, int]:
+    """
+    Worker-process entry point: encode one timeline entry to its own MP4 in
+    every (w, h, out_path) target. Template segments are served straight
+    from SEGMENT_CACHE (no re-encode). Work segments are video only — the
+    soundtrack is mixed once for the whole timeline (timeline_mix). Returns
+    (paths, segment-cache hits, peak live decoders).
+    """
+    fps = render_profiles.get(profile)["fps"]
+    params = render_profiles.encode_params(profile)
+    with reader_pool.session() as readers:
+        if spec["kind"] in TEMPLATE_KINDS:
+            paths, hits = [], 0
+            for w, h, _ in targets:
+                path, hit = ensure_cached_segment(spec["kind"], spec["labels"], spec["duration"],
+                                                  w, h, _template_builder(spec, w, h, profile),
+                                                  profile)
+                paths.append(str(path))
+                hits += hit
+            return paths, hits, readers.peak
+
+        for w, h, out_path in targets:
+            clip = build_segment(spec, w, h, profile)
+            clip.write_videofile(
+                out_path,
+                fps=fps,
+                threads=threads,
+                audio=False,
+                logger=None,
+                **params,
+            )
+            clip.close()
+    return [out_path for _, _, out_path in targets], 0, readers.peak
+
+
+def render_segments(timeline: list[dict], seg_dir: Path,
+                    layouts: list[tuple[int, int]], workers: int, logger,
+                    profile: str = "final") -> tuple[list[list[str]], int, int]:
+    """
+    Encode every distinct timeline entry once, in every layout, in a process
+    pool, reporting completed segments through the proglog `logger`.
+    Returns (per layout: paths in timeline order — repeats share a file —,
+    number of segment-cache hits, peak live decoders in any one worker).
+    """
+    seg_dir.mkdir(parents=True, exist_ok=True)
+    unique, refs = dedupe_timeline(timeline)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    paths = [None] * len(unique)
+    hits = peak = 0
+
+    logger(segments__total=len(unique), segments__index=0)
+    # spawn, not fork: the dashboard calls this from a worker thread and
+    # forking a threaded process can inherit held locks.
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        futures = {
+            pool.submit(_render_segment, spec,
+                        [(w, h, str(seg_dir / f"{i:04d}_{spec['kind']}_{w}x{h}.mp4")) for w, h in layouts],
+                        threads, profile): i
+            for i, spec in enumerate(unique)
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            i = futures[future]
+            paths[i], hit, decoders = future.result()
+            hits += hit
+            peak = max(peak, decoders)
+            logger(segment=segment_name(unique[i]))
+            logger(segments__index=done)
+    except BaseException:
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+    return [[paths[i][k] for i in refs] for k in range(len(layouts))], hits, peak
+
+
+def render_frame(plan: dict, t: float, is_short: bool = False, profile: str = "preview") -> np.ndarray:
+    """
+    Single frame of the workout at time t (seconds), without rendering the
+    video — used for review thumbnails. Only the segment covering t is built:
+    a work segment resolves just its own exercise and seeks one source frame.
+    """
+    w, h = PORTRAIT if is_short else LANDSCAPE
+    timeline = compile_timeline(plan, {})
+    start = 0.0
+    for spec in timeline:
+        if t < start + spec["duration"] or spec is timeline[-1]:
+            break
+        start += spec["duration"]
+    local = min(max(t - start, 0.0), spec["duration"] - 1e-3)
+
+    with reader_pool.session():
+        if spec["kind"] == "work":
+            clip = make_exercise_segment(spec["exercise"], CLIP_RESOLVER.resolve(spec["exercise"], w, h),
+                                         spec["duration"], w, h, profile=profile, buffered=False)
+        else:
+            clip = _template_builder(spec, w, h, profile)()
+        return np.array(clip.get_frame(local), dtype=np.uint8)
 
-    print("\nNormalising clips...")
-    normed = [clip.resized((w, h)).with_fps(FPS) for clip in all_clips]
 
-    print("Concatenating clips...")
-    final = concatenate_videoclips(normed, method="compose")
+# --- Main builder ---
 
+def mix_soundtrack(timeline: list[dict], tmp_dir: Path) -> str:
+    """Stream the timeline's soundtrack (cues + ducked music) to one AAC file."""
     music_path = fetch_music(tmp_dir)
-    if music_path:
-        print("Adding background music...")
-        final = add_background_music(final, music_path, volume=0.12)
-    else:
+    if not music_path:
         print("  (No music — download failed, continuing without)")
+    print("Mixing soundtrack...")
+    return timeline_mix(timeline, music_path).write(tmp_dir / "soundtrack.m4a")
+
+
+def build_workout_videos(plan: dict, outputs: dict, record_id: str = None,
+                         segmented: bool = False, workers: int = None, profile: str = "final") -> dict:
+    """
+    Build the workout in every format of `outputs` ({"landscape": path,
+    "short": path}) in one run. Everything up to the fit / overlay layout —
+    clip resolution, timeline, voice cues, source decode, the soundtrack —
+    is done once; each format then gets its own frames and encode.
+
+    The soundtrack is one streaming mix (tools.audio_mixer) of every cue
+    over the ducked music, encoded once and muxed into each output.
+
+    segmented=True encodes every segment independently across `workers`
+    processes (default: one per CPU) and stitches them with ffmpeg's concat
+    demuxer; otherwise the whole timeline is composed and exported by MoviePy
+    in one pass per format.
+
+    profile="preview" renders the same timeline small and fast for review
+    (see tools.render_profiles); "final" is the full-quality export.
+    Returns `outputs`.
+    """
+    title = plan.get("title", "Dumbbell Workout")
+    formats = list(outputs)
+    layouts = [format_size(fmt) for fmt in formats]
+    fps = render_profiles.get(profile)["fps"]
+    for fmt, (w, h) in zip(formats, layouts):
+        ow, oh = render_profiles.frame_size(w, h, profile)
+        print(f"Format: {'Shorts (portrait)' if fmt == 'short' else 'Landscape'} — "
+              f"{ow}x{oh} @ {fps}fps ({profile}) → {outputs[fmt]}")
+
+    first_output = outputs[formats[0]]
+    tmp_dir = Path(".tmp") / f"workout_{record_id or Path(first_output).stem}"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+
+    SEGMENT_CACHE.clean_stale()
+    cache_before = SEGMENT_CACHE.stats()
+
+    # One source clip per exercise for every format — the Short is centre-cropped
+    # from the same footage, so it is fetched and decoded once.
+    print("Resolving exercise clips...")
+    clips = fetch_exercise_clips(plan, *layouts[0], dest_dir=tmp_dir / "clips")
+
+    print(f"Planning '{title}'...")
+    timeline = compile_timeline(plan, clips)
+
+    if PREPARE_CLIPS:
+        print("Preparing exercise clips...")
+        prepare_timeline_clips(timeline, layouts, profile)
+
+    unique, refs = dedupe_timeline(timeline)
+    print(f"Timeline: {len(timeline)} segments, {len(unique)} distinct "
+          f"(dedup {len(timeline) / len(unique):.1f}x)")
+
+    print("Prefetching voice cues...")
+    tts = prefetch_cues(unique, layouts, profile)
+    print(f"Voice cue cache: {tts['hits']} hits, {tts['misses']} misses")
 
-    print(f"\nExporting to {output_path}...")
     progress_file = str(tmp_dir / "progress.json")
     print(f"Progress file path: {os.path.abspath(progress_file)}")
-    print(f"Final video: {final.duration:.1f}s  fps: {final.fps}  size: {final.size}")
-
-    logger = FileProgressLogger(progress_file) if record_id else "bar"
-    final.write_videofile(
-        output_path,
-        fps=FPS,
-        codec="libx264",
-        audio_codec="aac",
-        threads=4,
-        preset="fast",
-        logger=logger,
-    )
-    print(f"\nDone: {output_path}")
-    return output_path
+    # Frame index → segment name for the single-pass export.
+    ends, t = [], 0.0
+    for spec in timeline:
+        t += spec["duration"]
+        ends.append((t, segment_name(spec)))
+    logger = FileProgressLogger(progress_file, record_id, segments=ends, fps=fps) if record_id else "bar"
+
+    if segmented:
+        import proglog
+        workers = workers or os.cpu_count() or 1
+        print(f"\nRendering {len(unique)} segments × {len(formats)} format(s) on {workers} worker(s)...")
+        paths, hits, peak = render_segments(timeline, tmp_dir / "segments", layouts,
+                                            workers, proglog.default_bar_logger(logger), profile)
+        templates = sum(1 for spec in unique if spec["kind"] in TEMPLATE_KINDS) * len(formats)
+        print(f"Segment cache: {hits} hits, {templates - hits} misses")
+        print(f"Decoders: peak {peak} live per worker (cap {reader_pool.MAX_OPEN})")
+
+        audio = mix_soundtrack(timeline, tmp_dir)
+        for fmt, fmt_paths in zip(formats, paths):
+            print(f"\nStitching to {outputs[fmt]}...")
+            concat_copy(fmt_paths, outputs[fmt], tmp_dir / "segments" / f"concat_{fmt}.txt",
+                        audio_path=audio)
+        print(f"\nDone: {', '.join(outputs.values())}")
+        return outputs
+
+    # Every decoder opened for the single-pass export is closed once it's written.
+    with reader_pool.session() as readers:
+        audio = mix_soundtrack(timeline, tmp_dir)
+        params = {**render_profiles.encode_params(profile), "audio_codec": "copy"}
+        for fmt, (w, h) in zip(formats, layouts):
+            ow, oh = render_profiles.frame_size(w, h, profile)
+            print(f"\nBuilding segments ({fmt})...")
+            built = [build_segment(spec, w, h, profile) for spec in unique]
+
+            print("\nNormalising clips...")
+            built = [(clip if tuple(clip.size) == (ow, oh) else clip.resized((ow, oh))).with_fps(fps)
+                     for clip in built]
+            normed = [built[i] for i in refs]
+
+            print("Concatenating clips...")
+            final = concatenate_videoclips(normed, method="compose")
+
+            output_path = outputs[fmt]
+            print(f"\nExporting to {output_path}...")
+            print(f"Final video: {final.duration:.1f}s  fps: {final.fps}  size: {final.size}")
+
+            final.write_videofile(
+                output_path,
+                fps=fps,
+                threads=4,
+                audio=audio,
+                logger=logger,
+                **params,
+            )
+    decoders = readers.stats()
+    print(f"Decoders: peak {decoders['peak']} live (cap {decoders['max_open']}), "
+          f"{decoders['opens']} opens for {decoders['readers']} readers")
+    cache = SEGMENT_CACHE.stats()
+    print(f"Segment cache: {cache['hits'] - cache_before['hits']} hits, "
+          f"{cache['misses'] - cache_before['misses']} misses")
+    print(f"\nDone: {', '.join(outputs.values())}")
+    return outputs
+
+
+def build_workout_video(plan: dict, output_path: str, record_id: str = None, is_short: bool = False,
+                        segmented: bool = False, workers: int = None, profile: str = "final"):
+    """
+    Build the full workout video. is_short=True produces 1080x1920 vertical format.
+    Single-format wrapper around build_workout_videos().
+    """
+    fmt = "short" if is_short else "landscape"
+    return build_workout_videos(plan, {fmt: output_path}, record_id=record_id, segmented=segmented,
+                                workers=workers, profile=profile)[fmt]
 
 
 if __name__ == "__main__":
     if len(sys.argv) < 3:
-        print("Usage: python build_workout_video.py workout.json output.mp4 [--short]")
+        print("Usage: python build_workout_video.py workout.json output.mp4 "
+              "[--short | --both] [--segmented] [--workers N]")
         sys.exit(1)
 
     with open(sys.argv[1]) as f:
         plan = json.load(f)
-    is_short = "--short" in sys.argv
-    build_workout_video(plan, sys.argv[2], is_short=is_short)
+    output    = sys.argv[2]
+    segmented = "--segmented" in sys.argv
+    workers   = int(sys.argv[sys.argv.index("--workers") + 1]) if "--workers" in sys.argv else None
+    if "--both" in sys.argv:
+        outputs = {"landscape": output, "short": str(Path(output).with_name(f"{Path(output).stem}_short.mp4"))}
+    else:
+        outputs = {"short" if "--short" in sys.argv else "landscape": output}
+    build_workout_videos(plan, outputs, segmented=segmented, workers=workers)
@@ -0,0 +1,157 @@
+"""
+clip_resolver.py
+----------------
+Global exercise-clip resolver shared by every workout build.
+
+Lookup order per exercise:
+  1. clips/exercises/<safe_name>.mp4   — user-provided clips
+  2. Pexels search (cached on disk for PEXELS_SEARCH_TTL_HOURS)
+     → best rendition → tools.downloads.DOWNLOADS (downloaded once, ever)
+
+Stock footage shares the pipeline's one download store (and its size
+bound) with music, stills and fal.ai results. A build passes its job
+directory as `dest_dir` and gets hard links there, so the store's LRU
+eviction can't pull a clip out from under a render in progress. Links
+keep the object's SHA-256 name, which is what tools.prepare_clips keys
+its intermediates on.
+
+prefetch() resolves every exercise of a plan concurrently before any
+segment is built, so search and download latency overlap instead of
+being paid one exercise at a time mid-render.
+
+Rendition choice: Pexels lists several files per video. The resolver
+asks for the target orientation (portrait for Shorts) and takes the
+smallest file of that orientation that still covers the frame without
+upscaling — falling back to the largest one available.
+
+Config (.env):
+  PIXEL_API                — Pexels API key
+  PEXELS_API_URL           — API base (default https://api.pexels.com; point
+                             it at a local stand-in server for testing)
+  PEXELS_SEARCH_TTL_HOURS  — search-result cache lifetime (default 168)
+  PEXELS_CONCURRENCY       — parallel searches/downloads in prefetch (default 4)
+  PEXELS_SEARCH_DIR        — search-result cache (default .tmp/cache/pexels_search)
+"""
+
+import os
+import json
+import time
+import threading
+import requests
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+from tools.disk_cache import DiskCache
+from tools.downloads import DOWNLOADS, DownloadStore, link_into
+
+load_dotenv()
+
+PEXELS_KEY        = os.getenv("PIXEL_API")
+PEXELS_API_URL    = os.getenv("PEXELS_API_URL", "https://api.pexels.com").rstrip("/")
+SEARCH_TTL        = float(os.getenv("PEXELS_SEARCH_TTL_HOURS", "168")) * 3600
+CONCURRENCY       = int(os.getenv("PEXELS_CONCURRENCY", "4"))
+SEARCH_DIR        = os.getenv("PEXELS_SEARCH_DIR", ".tmp/cache/pexels_search")
+
+CLIPS_DIR = Path("clips/exercises")
+
+
+def safe_name(exercise: str) -> str:
+    return exercise.lower().replace(" ", "_").replace("/", "_")
+
+
+def pick_rendition(files: list[dict], w: int, h: int) -> dict:
+    """Smallest file in the target orientation that covers w x h, else the largest."""
+    portrait = h > w
+    same = [f for f in files if (f.get("height", 0) > f.get("width", 0)) == portrait] or files
+    area = lambda f: f.get("width", 0) * f.get("height", 0)
+    covering = [f for f in same if f.get("width", 0) >= w and f.get("height", 0) >= h]
+    return min(covering, key=area) if covering else max(same, key=area)
+
+
+class ClipResolver:
+    def __init__(self, api_key: str, clips_dir: Path, search_dir, store: DownloadStore = DOWNLOADS,
+                 search_ttl: float = SEARCH_TTL, concurrency: int = CONCURRENCY):
+        self.api_key = api_key
+        self.clips_dir = Path(clips_dir)
+        self.store = store
+        self.search_dir = Path(search_dir)
+        self.search_ttl = search_ttl
+        self.concurrency = concurrency
+
+    # --- Search (cached) ---
+
+    def search(self, query: str, orientation: str) -> dict:
+        """Pexels video search, served from disk while younger than the TTL."""
+        key = DiskCache.key("pexels-search", query, orientation)
+        path = self.search_dir / f"{key}.json"
+        try:
+            with open(path) as f:
+                cached = json.load(f)
+            if time.time() - cached["fetched_at"] < self.search_ttl:
+                return cached["data"]
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+
+        params = {"query": query, "per_page": 5, "size": "medium", "orientation": orientation}
+        r = requests.get(f"{PEXELS_API_URL}/videos/search", headers={"Authorization": self.api_key},
+                         params=params, timeout=15)
+        r.raise_for_status()
+        data = r.json()
+
+        self.search_dir.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"fetched_at": time.time(), "data": data}, f)
+        os.replace(tmp, path)
+        return data
+
+    # --- Download (shared store) ---
+
+    def download(self, url: str, dest_dir=None) -> Path:
+        """The stored body of `url`, hard-linked into `dest_dir` (same name) when given."""
+        path = self.store.fetch(url, suffix=".mp4")
+        return link_into(path, Path(dest_dir) / path.name) if dest_dir is not None else path
+
+    # --- Resolve ---
+
+    def resolve(self, exercise: str, w: int, h: int, dest_dir=None) -> Path:
+        """
+        Local clip, or the best cached / downloaded Pexels rendition for (w, h)
+        — linked into `dest_dir` (a build's job directory) when given.
+        """
+        safe = safe_name(exercise)
+        local = self.clips_dir / f"{safe}.mp4"
+        if local.exists():
+            print(f"  Using local clip: {local}")
+            return local
+
+        if not self.api_key:
+            raise RuntimeError(f"No local clip found for '{exercise}' and PIXEL_API not set.")
+
+        orientation = "portrait" if h > w else "landscape"
+        data = self.search(f"{exercise} dumbbell workout exercise", orientation)
+        if not data.get("videos"):
+            data = self.search(f"{exercise} workout", orientation)
+        if not data.get("videos"):
+            raise RuntimeError(f"No clip found for: {exercise}. Add one to clips/exercises/{safe}.mp4")
+
+        rendition = pick_rendition(data["videos"][0]["video_files"], w, h)
+        print(f"  Pexels clip for {exercise}: {rendition.get('width')}x{rendition.get('height')}")
+        return self.download(rendition["link"], dest_dir)
+
+    def prefetch(self, exercises, w: int, h: int, dest_dir=None) -> dict:
+        """Resolve every exercise concurrently. Returns {exercise: Path or Exception}."""
+        unique = list(dict.fromkeys(exercises))
+
+        def attempt(exercise):
+            try:
+                return self.resolve(exercise, w, h, dest_dir)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max(1, self.concurrency)) as pool:
+            return dict(zip(unique, pool.map(attempt, unique)))
+
+
+CLIP_RESOLVER = ClipResolver(PEXELS_KEY, CLIPS_DIR, SEARCH_DIR)
@@ -0,0 +1,212 @@
+"""
+compositor.py
+-------------
+Fixed-point overlay engine for workout segments.
+
+A work segment used to be CompositeVideoClip([footage, ColorClip(...)
+.with_opacity(0.45)]) plus a SpriteTrack pass: MoviePy converts every
+frame to float, alpha-blends a full-frame black layer, converts back,
+and then each text sprite is blended in float32 again.
+
+Compositor does the same picture with integer arithmetic only:
+  - dim:     one uint16 multiply + shift over the frame
+             (out = (px * keep + 128) >> 8, keep = round((1 - dim) * 256))
+  - sprites: blended in uint16 inside their clipped bounding boxes,
+             with 255 - alpha and colour x alpha precomputed per sprite
+             (out = (px * (255 - a) + c * a) / 255, rounded)
+
+Tracks are laid out at full resolution. With a smaller output `size`
+(preview renders) each sprite is resampled once and placed at the
+scaled position, so the picture matches the full-size one.
+
+On a solid background (rest / break / intro cards) the background and
+every whole-duration sprite are baked once; the timed sprites change
+once a second, so the finished frame is cached per set of visible
+sprites and returned read-only until the set changes.
+
+Usage:
+  Compositor(track, dim=0.45).apply(footage)            # work segment
+  Compositor(track, bg_color=(15, 30, 15)).to_clip(20)  # rest card
+  Compositor(track, dim=0.45, size=(854, 480))          # 480p preview of a 1080p layout
+
+  python -m tools.compositor                 # micro-benchmark vs MoviePy path
+  python -m tools.compositor 1080 1920 60    # w h frames
+"""
+
+import sys
+import time
+import numpy as np
+from PIL import Image
+
+from tools.glyph_atlas import SpriteTrack
+
+
+def div255(x: np.ndarray) -> np.ndarray:
+    """Round-to-nearest x / 255 for uint16 x <= 255 * 255, without division."""
+    x += 128
+    x += x >> 8
+    x >>= 8
+    return x
+
+
+def dim_into(frame: np.ndarray, keep: int, out: np.ndarray, scratch: np.ndarray) -> np.ndarray:
+    """out = frame * keep / 256 (rounded), via a uint16 scratch plane."""
+    np.multiply(frame, np.uint16(keep), out=scratch, dtype=np.uint16)
+    scratch += 128
+    np.right_shift(scratch, 8, out=out, casting="unsafe")
+    return out
+
+
+def _resampled(sprite, s: float) -> tuple[np.ndarray, np.ndarray]:
+    """Sprite planes scaled by s (identity at 1.0)."""
+    if s == 1.0:
+        return sprite.rgb, sprite.alpha
+    size = (max(1, round(sprite.w * s)), max(1, round(sprite.h * s)))
+    rgb = np.array(Image.fromarray(sprite.rgb).resize(size, Image.LANCZOS))
+    alpha = np.array(Image.fromarray(sprite.alpha).resize(size, Image.LANCZOS))
+    return rgb, alpha
+
+
+class _Layer:
+    """One track item, scaled and clipped to the frame, with its blend terms precomputed."""
+
+    __slots__ = ("start", "end", "box", "inv", "premul")
+
+    def __init__(self, start, end, sprite, x, y, w, h, s: float = 1.0):
+        self.start, self.end = start, end
+        rgb, alpha = _resampled(sprite, s)
+        x, y = round(x * s), round(y * s)
+        sh, sw = alpha.shape
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + sw, w), min(y + sh, h)
+        if x0 >= x1 or y0 >= y1:
+            self.box = None
+            return
+        self.box = (slice(y0, y1), slice(x0, x1))
+        sx, sy = x0 - x, y0 - y
+        a = alpha[sy:sy + (y1 - y0), sx:sx + (x1 - x0), None].astype(np.uint16)
+        self.inv = 255 - a
+        self.premul = rgb[sy:sy + (y1 - y0), sx:sx + (x1 - x0)].astype(np.uint16) * a
+
+    def blend(self, frame: np.ndarray):
+        region = frame[self.box]
+        mixed = region * self.inv
+        mixed += self.premul
+        region[:] = div255(mixed)
+
+
+class Compositor:
+    def __init__(self, track: SpriteTrack, dim: float = 0.0, bg_color: tuple = None,
+                 size: tuple[int, int] = None):
+        """size: output frame (default: the track's layout size)."""
+        self.w, self.h = size or (track.w, track.h)
+        self.keep = int(round((1.0 - dim) * 256))
+        scale = self.w / track.w
+        layers = [_Layer(start, end, sprite, x, y, self.w, self.h, scale)
+                  for start, end, sprite, x, y in track.items]
+        layers = [layer for layer in layers if layer.box is not None]
+        self._scratch = None
+
+        self.base = None
+        if bg_color is not None:
+            # Bake the background and every always-visible sprite once.
+            self.base = np.empty((self.h, self.w, 3), dtype=np.uint8)
+            self.base[:] = bg_color[:3]
+            if self.keep != 256:
+                dim_into(self.base, self.keep, self.base, self._plane())
+            static = [layer for layer in layers if layer.start <= 0 and layer.end == float("inf")]
+            for layer in static:
+                layer.blend(self.base)
+            layers = [layer for layer in layers if layer not in static]
+        self.layers = layers
+        self._cached_key = None
+        self._cached = None
+
+    def _plane(self) -> np.ndarray:
+        if self._scratch is None:
+            self._scratch = np.empty((self.h, self.w, 3), dtype=np.uint16)
+        return self._scratch
+
+    def frame(self, t: float, src: np.ndarray = None) -> np.ndarray:
+        """Composited frame at t, over `src` footage or the baked background."""
+        active = [layer for layer in self.layers if layer.start <= t < layer.end]
+
+        if src is None:
+            key = tuple(id(layer) for layer in active)
+            if key != self._cached_key:
+                out = self.base.copy()
+                for layer in active:
+                    layer.blend(out)
+                out.flags.writeable = False
+                self._cached_key, self._cached = key, out
+            return self._cached
+
+        if src.dtype != np.uint8:
+            src = src.astype(np.uint8)
+        out = np.empty((self.h, self.w, 3), dtype=np.uint8)
+        if self.keep == 256:
+            out[:] = src
+        else:
+            dim_into(src, self.keep, out, self._plane())
+        for layer in active:
+            layer.blend(out)
+        return out
+
+    def apply(self, clip):
+        """Dim `clip` and overlay the track in one pass per frame."""
+        return clip.transform(lambda get_frame, t: self.frame(t, get_frame(t)))
+
+    def to_clip(self, duration: float):
+        """Opaque clip: baked background plus the timed sprites."""
+        from moviepy import VideoClip
+        return VideoClip(lambda t: self.frame(t), duration=duration)
+
+
+# ---------------------------------------------------------------------------
+# Micro-benchmark
+# ---------------------------------------------------------------------------
+
+def _bench(w: int, h: int, frames: int):
+    from moviepy import ColorClip, CompositeVideoClip, VideoClip
+    from tools.glyph_atlas import GlyphAtlas
+
+    atlas = GlyphAtlas()
+    duration = max(1, frames // 30)
+    footage_frames = [np.random.default_rng(i).integers(0, 256, (h, w, 3), dtype=np.uint8)
+                      for i in range(8)]
+    footage = VideoClip(lambda t: footage_frames[int(t * 30) % 8], duration=duration)
+
+    track = SpriteTrack(w, h)
+    track.add(atlas.label("BICEP CURLS", 72, (255, 255, 255)), "top")
+    track.add(atlas.badge("WORK", 40, (255, 255, 255), (220, 50, 50, 200), (160, 60)), (40, 40))
+    for sec in range(duration, 0, -1):
+        track.add(atlas.number(sec, 130, (255, 255, 255)), "bottom",
+                  start=duration - sec, end=duration - sec + 1)
+
+    dark = ColorClip((w, h), color=(0, 0, 0), duration=duration).with_opacity(0.45)
+    cases = {
+        "work": (track.apply(CompositeVideoClip([footage, dark])),
+                 Compositor(track, dim=0.45).apply(footage)),
+        "rest": (track.to_clip(duration, bg_color=(15, 30, 15)),
+                 Compositor(track, bg_color=(15, 30, 15)).to_clip(duration)),
+    }
+    times = [i / 30 for i in range(frames)]
+    for name, (old, new) in cases.items():
+        results = []
+        for clip in (old, new):
+            clip.get_frame(0)
+            start = time.perf_counter()
+            for t in times:
+                clip.get_frame(t)
+            results.append((time.perf_counter() - start) / frames * 1000)
+        diff = max(np.abs(old.get_frame(t).astype(np.int16) - new.get_frame(t)).max()
+                   for t in times[::10])
+        print(f"  {name:5s} moviepy {results[0]:7.2f} ms/frame   compositor {results[1]:7.2f} ms/frame"
+              f"   {results[0] / results[1]:5.1f}x   max diff {diff}")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    w, h, frames = (args + [1920, 1080, 60][len(args):])[:3]
+    print(f"Compositing {frames} frames at {w}x{h}...")
+    _bench(w, h, frames)
@@ -0,0 +1,180 @@
+"""
+db.py
+-----
+Shared data-access layer for youtube.db.
+
+Every thread gets one long-lived connection per database file instead of
+a fresh sqlite3.connect() per statement. Connections run in WAL mode (so
+dashboard reads never block on a render's writes) with a busy timeout
+instead of failing immediately with "database is locked".
+
+Connections are in autocommit mode: a single execute() is its own
+transaction, and multi-statement work goes through transaction(), which
+takes the write lock up front (BEGIN IMMEDIATE).
+
+High-frequency progress updates (scene_data checkpoints, ...) can use
+defer(): writes are coalesced per key, latest value wins, and a
+background thread flushes them in one transaction every
+DB_FLUSH_INTERVAL seconds. Call flush() before anything that must see
+them (e.g. at the end of a pipeline).
+
+Config (.env):
+  DB_FILE              — default youtube.db
+  DB_BUSY_TIMEOUT_MS   — wait this long for a lock before erroring (default 30000)
+  DB_FLUSH_INTERVAL    — deferred-write flush period in seconds (default 1.0)
+
+Usage:
+  from tools import db
+  row = db.query_one("SELECT Status FROM Videos WHERE record_id = ?", (rid,))
+  db.execute("UPDATE Videos SET Status = ? WHERE record_id = ?", (status, rid))
+  with db.transaction() as conn:
+      ...
+  db.defer(("scene_data", rid), "UPDATE Videos SET scene_data = ? WHERE record_id = ?", (blob, rid))
+"""
+
+import os
+import time
+import atexit
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DB_FILE         = os.getenv("DB_FILE", "youtube.db")
+BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "30000"))
+FLUSH_INTERVAL  = float(os.getenv("DB_FLUSH_INTERVAL", "1.0"))
+
+_local = threading.local()
+
+
+# ---------------------------------------------------------------------------
+# Connections
+# ---------------------------------------------------------------------------
+
+def _open(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
+
+def connect(db_file: str = None) -> sqlite3.Connection:
+    """This thread's pooled connection to `db_file` (default DB_FILE). Don't close it."""
+    path = os.path.abspath(db_file or DB_FILE)
+    pool = getattr(_local, "pool", None)
+    if pool is None:
+        pool = _local.pool = {}
+    conn = pool.get(path)
+    if conn is None:
+        conn = pool[path] = _open(path)
+    return conn
+
+
+def close(db_file: str = None):
+    """Close this thread's pooled connection (e.g. before a worker thread exits)."""
+    pool = getattr(_local, "pool", {})
+    conn = pool.pop(os.path.abspath(db_file or DB_FILE), None)
+    if conn is not None:
+        conn.close()
+
+
+# ---------------------------------------------------------------------------
+# Queries
+# ---------------------------------------------------------------------------
+# Cursors are always closed so no half-read statement keeps a WAL read
+# snapshot open on the pooled connection.
+
+def execute(sql: str, params=(), db_file: str = None) -> int:
+    """Run one write statement in its own transaction. Returns lastrowid."""
+    cur = connect(db_file).execute(sql, params)
+    try:
+        return cur.lastrowid
+    finally:
+        cur.close()
+
+
+def query_one(sql: str, params=(), db_file: str = None):
+    cur = connect(db_file).execute(sql, params)
+    try:
+        return cur.fetchone()
+    finally:
+        cur.close()
+
+
+def query_all(sql: str, params=(), db_file: str = None) -> list:
+    cur = connect(db_file).execute(sql, params)
+    try:
+        return cur.fetchall()
+    finally:
+        cur.close()
+
+
+@contextmanager
+def transaction(db_file: str = None):
+    """BEGIN IMMEDIATE … COMMIT on the pooled connection; rolls back on error."""
+    conn = connect(db_file)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+# ---------------------------------------------------------------------------
+# Deferred (batched) progress writes
+# ---------------------------------------------------------------------------
+
+_pending = {}                      # key → (db_file, sql, params)
+_pending_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_flusher = None
+
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        try:
+            flush()
+        except sqlite3.Error as e:
+            print(f"[db] deferred flush failed: {e}")
+
+
+def defer(key, sql: str, params=(), db_file: str = None):
+    """
+    Queue a write to be applied within FLUSH_INTERVAL. A later defer() with
+    the same key replaces the pending one, so only the latest state is written.
+    """
+    global _flusher
+    with _pending_lock:
+        _pending[key] = (db_file, sql, params)
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name="db-flush", daemon=True)
+            _flusher.start()
+
+
+def flush():
+    """Write every pending deferred update now, one transaction per database."""
+    with _flush_lock:
+        with _pending_lock:
+            batch = list(_pending.items())
+            _pending.clear()
+        by_db = {}
+        for key, (db_file, sql, params) in batch:
+            by_db.setdefault(db_file, []).append((key, sql, params))
+        for db_file, writes in by_db.items():
+            try:
+                with transaction(db_file) as conn:
+                    for _, sql, params in writes:
+                        conn.execute(sql, params).close()
+            except sqlite3.Error:
+                # Re-queue what failed unless a newer value arrived meanwhile.
+                with _pending_lock:
+                    for key, sql, params in writes:
+                        _pending.setdefault(key, (db_file, sql, params))
+                raise
+
+
+atexit.register(flush)
@@ -0,0 +1,119 @@
+"""
+disk_cache.py
+-------------
+Content-addressed on-disk cache with LRU-by-size eviction.
+
+Entries are plain files named after the SHA-256 of their key, so they can
+be handed straight to MoviePy / ffmpeg. A hit refreshes the file's mtime;
+when the cache grows past max_bytes the least recently used files are
+deleted first.
+
+Writers render into reserve() and publish with put(), which is an atomic
+rename — a half-written file is never visible under its final name, so
+several builds (or worker processes) can share one cache directory.
+
+Usage:
+  cache = DiskCache(".tmp/cache/segments", max_bytes=2 * 1024**3)
+  key = DiskCache.key("rest", "Squats", 20, 1920, 1080)
+  path = cache.get(key, ".mp4")
+  if path is None:
+      tmp = cache.reserve(key, ".mp4")
+      ...write tmp...
+      path = cache.put(key, tmp, ".mp4")
+"""
+
+import os
+import json
+import time
+import uuid
+import hashlib
+import threading
+from pathlib import Path
+
+TMP_MARKER = ".part"
+
+
+class DiskCache:
+    def __init__(self, root, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(*parts) -> str:
+        """Stable SHA-256 over any JSON-serialisable key parts."""
+        blob = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def path(self, key: str, suffix: str = "") -> Path:
+        return self.root / key[:2] / f"{key}{suffix}"
+
+    def get(self, key: str, suffix: str = "") -> Path | None:
+        """Return the cached file and mark it recently used, or None on a miss."""
+        path = self.path(key, suffix)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def reserve(self, key: str, suffix: str = "") -> Path:
+        """Unique scratch path next to the final entry; keeps the real suffix for ffmpeg."""
+        final = self.path(key, suffix)
+        final.parent.mkdir(parents=True, exist_ok=True)
+        return final.with_name(f"{key}.{uuid.uuid4().hex[:8]}{TMP_MARKER}{suffix}")
+
+    def put(self, key: str, src, suffix: str = "") -> Path:
+        """Atomically move `src` into the cache under `key`, then enforce the size bound."""
+        final = self.path(key, suffix)
+        final.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(src, final)
+        self.evict(keep=final)
+        return final
+
+    def _entries(self):
+        for path in self.root.glob("*/*"):
+            if TMP_MARKER in path.name:
+                continue
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            yield path, st.st_size, st.st_mtime
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, keep: Path = None):
+        """Delete least-recently-used entries until the cache fits in max_bytes."""
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if keep is not None and path == keep:
+                continue
+            try:
+                path.unlink()
+                total -= size
+            except FileNotFoundError:
+                pass
+
+    def clean_stale(self, max_age: float = 24 * 3600):
+        """Remove scratch files left behind by crashed writers."""
+        cutoff = time.time() - max_age
+        for path in self.root.glob(f"*/*{TMP_MARKER}*"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,240 @@
+"""
+downloads.py
+------------
+Shared download manager: every remote file the pipeline pulls (background
+music, Pexels footage, DALL-E stills, Kling / lipsync results) goes
+through one content-addressed store.
+
+  - bodies stream to disk in CHUNK-sized pieces, hashed on the way in,
+    and are published under their SHA-256 (DiskCache — LRU-bounded,
+    atomic rename), so the same file behind two URLs is stored once
+  - a per-URL index remembers the object plus the server's ETag /
+    Last-Modified; a known URL is served from disk with no request at
+    all, or — once older than max_age — revalidated with a conditional
+    GET (If-None-Match / If-Modified-Since), where a 304 costs no body
+  - an interrupted transfer keeps its partial file and resumes with
+    Range + If-Range; a server that ignores the range (or whose file
+    changed) answers 200 and the transfer starts over
+  - fetch(url, dest) hard-links the object into a job directory (copy
+    across filesystems), so evicting the store never pulls a file out
+    from under a running build
+
+Usage:
+  path = DOWNLOADS.fetch(url, suffix=".mp3")          # path inside the store
+  DOWNLOADS.fetch(url, tmp_dir / "music.mp3")         # linked into a job dir
+  DOWNLOADS.fetch(url, max_age=24 * 3600)             # revalidate daily
+
+Config (.env):
+  DOWNLOAD_STORE_DIR     — default .tmp/cache/media
+  DOWNLOAD_STORE_MAX_MB  — size bound before LRU eviction (default 4096)
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import threading
+import requests
+from pathlib import Path
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:                     # Windows
+    fcntl = None
+    import msvcrt
+
+from tools.disk_cache import DiskCache
+
+CHUNK = 1024 * 1024
+
+
+def _atomic_json(path: Path, data: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _read_json(path: Path) -> dict | None:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+@contextmanager
+def _file_lock(path: Path):
+    """Exclusive cross-process lock on `path`: flock on POSIX, msvcrt.locking on Windows."""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)   # gives up after ~10 s...
+                    break
+                except OSError:
+                    pass                                          # ...so keep waiting
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def link_into(src, dest) -> Path:
+    """Hard-link `src` to `dest` (a copy if they are on different filesystems)."""
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f".{dest.name}.{uuid.uuid4().hex[:8]}.link")
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dest)
+    return dest
+
+
+class DownloadStore:
+    def __init__(self, root, max_bytes: int, timeout: float = 60):
+        self.root = Path(root)
+        self.objects = DiskCache(self.root / "objects", max_bytes)
+        self.index_dir = self.root / "urls"
+        self.partial_dir = self.root / "partial"
+        self.timeout = timeout
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, key: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    # --- Lookup ---
+
+    def cached(self, url: str) -> Path | None:
+        """The stored object for `url`, or None — never touches the network."""
+        entry = _read_json(self.index_dir / f"{DiskCache.key('url', url)}.json")
+        return self.objects.get(entry["sha256"], entry["suffix"]) if entry else None
+
+    def fetch(self, url: str, dest=None, suffix: str = None, max_age: float = None) -> Path:
+        """
+        Path of `url`'s body — linked to `dest` when given, else inside the
+        store. A stored copy is used as-is unless it was last checked more
+        than `max_age` seconds ago, in which case it is revalidated.
+        """
+        if suffix is None:
+            suffix = Path(dest).suffix if dest is not None else Path(url.split("?")[0]).suffix
+        key = DiskCache.key("url", url)
+        with self._lock(key):
+            path = self._fetch(url, key, suffix, max_age)
+        return link_into(path, dest) if dest is not None else path
+
+    def _fetch(self, url: str, key: str, suffix: str, max_age: float | None) -> Path:
+        index = self.index_dir / f"{key}.json"
+        entry = _read_json(index)
+        path = self.objects.get(entry["sha256"], entry["suffix"]) if entry else None
+        if path is not None and (max_age is None or time.time() - entry["checked_at"] < max_age):
+            return path
+
+        try:
+            return self._transfer(url, key, suffix, entry if path is not None else None, index)
+        except requests.RequestException as e:
+            if path is None:
+                raise
+            print(f"  Could not revalidate {url} ({e}) — using the stored copy")
+            return path
+
+    # --- Transfer ---
+
+    def _transfer(self, url: str, key: str, suffix: str, entry: dict | None, index: Path) -> Path:
+        self.partial_dir.mkdir(parents=True, exist_ok=True)
+        part = self.partial_dir / f"{key}.part"
+        meta_path = self.partial_dir / f"{key}.json"
+        name = Path(url.split("?")[0]).name
+
+        with _file_lock(self.partial_dir / f"{key}.lock"):   # another process may be on the same URL...
+            done = _read_json(index)                          # ...and may have finished it while we waited
+            if done and (entry is None or done["checked_at"] > entry["checked_at"]):
+                path = self.objects.get(done["sha256"], done["suffix"])
+                if path is not None:
+                    return path
+
+            headers = {"Accept-Encoding": "identity"}   # byte ranges refer to the raw body
+            if entry is not None:
+                if entry.get("etag"):
+                    headers["If-None-Match"] = entry["etag"]
+                if entry.get("last_modified"):
+                    headers["If-Modified-Since"] = entry["last_modified"]
+
+            offset = part.stat().st_size if part.exists() else 0
+            meta = _read_json(meta_path) or {}
+            etag = meta.get("etag")
+            validator = (etag if etag and not etag.startswith("W/") else None) or meta.get("last_modified")
+            if offset and validator:
+                headers["Range"] = f"bytes={offset}-"
+                headers["If-Range"] = validator
+
+            with requests.get(url, headers=headers, stream=True, timeout=self.timeout) as resp:
+                if resp.status_code == 304 and entry is not None:
+                    entry["checked_at"] = time.time()
+                    _atomic_json(index, entry)
+                    return self.objects.path(entry["sha256"], entry["suffix"])
+                resp.raise_for_status()
+
+                # A server that encodes anyway: decoded sizes can't be checked or resumed.
+                plain = resp.headers.get("Content-Encoding", "identity") == "identity"
+                digest = hashlib.sha256()
+                content_range = resp.headers.get("Content-Range", "")
+                if "Range" in headers and plain and resp.status_code == 206 \
+                        and content_range.startswith(f"bytes {offset}-"):
+                    print(f"  Resuming {name} at {offset / 1e6:.1f} MB...")
+                    with open(part, "rb") as f:
+                        for block in iter(lambda: f.read(CHUNK), b""):
+                            digest.update(block)
+                    total = content_range.rpartition("/")[2]
+                    expected = int(total) if total.isdigit() else None
+                    mode = "ab"
+                else:
+                    print(f"  Downloading {name}...")
+                    length = resp.headers.get("Content-Length", "")
+                    expected = int(length) if plain and length.isdigit() else None
+                    meta = {"etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified")}
+                    _atomic_json(meta_path, meta)
+                    mode = "wb"
+
+                with open(part, mode) as f:
+                    for chunk in resp.iter_content(CHUNK):
+                        f.write(chunk)
+                        digest.update(chunk)
+                    size = f.tell()
+
+            if expected is not None and size != expected:
+                raise requests.ConnectionError(
+                    f"Incomplete download of {url}: {size} of {expected} bytes (kept for resume)")
+
+            sha = digest.hexdigest()
+            tmp = self.objects.reserve(sha, suffix)
+            os.replace(part, tmp)
+            path = self.objects.put(sha, tmp, suffix)
+            _atomic_json(index, {
+                "url": url, "sha256": sha, "suffix": suffix, "size": size,
+                "etag": meta.get("etag"), "last_modified": meta.get("last_modified"),
+                "checked_at": time.time(),
+            })
+            meta_path.unlink(missing_ok=True)
+            return path
+
+
+DOWNLOADS = DownloadStore(
+    os.getenv("DOWNLOAD_STORE_DIR", ".tmp/cache/media"),
+    max_bytes=int(os.getenv("DOWNLOAD_STORE_MAX_MB", "4096")) * 1024 * 1024,
+)
@@ -0,0 +1,110 @@
+"""
+events.py
+---------
+In-process pub/sub bus for pipeline progress, streamed to the dashboard
+as Server-Sent Events.
+
+Publishers (job runners, FileProgressLogger, the asset generator's
+_set_status) call publish(record_id, ...) with whatever changed —
+status, auto_prod_status, pct. Every open /api/events connection gets
+its own bounded queue; a slow tab drops its oldest events instead of
+holding up the render threads.
+
+A snapshot per record is kept so a tab that connects (or reconnects)
+mid-render gets the current picture immediately: status and
+auto_prod_status, plus the render progress (pct, index, eta, ...) of the
+current step only — a status event clears it, so a finished build doesn't
+replay "100% rendered" to every new tab. One-shot `refresh` hints are
+never kept.
+
+Usage:
+  from tools import events
+  events.publish(record_id, status="4_Prompts_Pending")
+  events.publish(record_id, pct=42, index=420, total=1000)
+
+  return Response(events.BUS.stream(), mimetype="text/event-stream")
+"""
+
+import json
+import queue
+import threading
+from collections import OrderedDict
+
+KEEPALIVE_SECONDS = 15
+SUBSCRIBER_QUEUE  = 256
+SNAPSHOT_RECORDS  = 200
+
+STICKY    = ("status", "auto_prod_status")   # survive a status change
+TRANSIENT = ("refresh",)                     # never replayed from the snapshot
+
+
+class EventBus:
+    def __init__(self):
+        self._subscribers = set()
+        self._latest = OrderedDict()        # record_id → status + current step's progress
+        self._lock = threading.Lock()
+
+    def publish(self, record_id: str, **data):
+        event = {"record_id": record_id, **data}
+        with self._lock:
+            state = self._latest.pop(record_id, {})
+            if "status" in data:
+                state = {k: v for k, v in state.items() if k in STICKY}
+            state.update((k, v) for k, v in data.items() if k not in TRANSIENT)
+            if state:
+                self._latest[record_id] = {"record_id": record_id, **state}
+            while len(self._latest) > SNAPSHOT_RECORDS:
+                self._latest.popitem(last=False)
+            subscribers = list(self._subscribers)
+
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                try:
+                    q.get_nowait()          # drop the oldest event for this slow subscriber
+                    q.put_nowait(event)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def subscribe(self) -> queue.Queue:
+        q = queue.Queue(maxsize=SUBSCRIBER_QUEUE)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q: queue.Queue):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def snapshot(self) -> list[dict]:
+        with self._lock:
+            return [dict(state) for state in self._latest.values()]
+
+    def stream(self):
+        """SSE generator: current snapshot, then live events, with keep-alive comments."""
+        q = self.subscribe()
+        try:
+            for state in self.snapshot():
+                yield f"data: {json.dumps(state)}\n\n"
+            while True:
+                try:
+                    event = q.get(timeout=KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"data: {json.dumps(event)}\n\n"
+        finally:
+            self.unsubscribe(q)
+
+    def __len__(self):
+        return len(self._subscribers)
+
+
+BUS = EventBus()
+
+
+def publish(record_id: str, **data):
+    """Publish a progress/status change for `record_id` (no-op without a record)."""
+    if record_id:
+        BUS.publish(record_id, **data)
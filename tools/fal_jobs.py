@@ -0,0 +1,241 @@
+"""
+fal_jobs.py
+-----------
+Persistent, restart-safe tracking of fal.ai queue requests.
+
+fal_client.submit(...).get() parks a thread on each request for the whole
+multi-minute Kling queue wait, and the request id lives only in memory —
+if the process restarts mid-job, the paid submission is forgotten and the
+next run submits (and pays for) it again.
+
+FalJobs records every submission in a `fal_jobs` table (record, scene,
+stage, model, request id, status, result) the moment fal accepts it:
+
+  - reattach: run() first looks for a live request for the same scene,
+              stage, model and input files, and waits on that instead of
+              submitting — across restarts and retried jobs
+  - polling:  every wait is one coroutine on a single asyncio loop in a
+              background thread, polling fal's status endpoint every
+              FAL_POLL_SECONDS, so dozens of jobs in flight cost no threads
+  - failures: only fal reporting the request failed, or the request
+              outliving FAL_JOB_TIMEOUT, marks a row failed. Polling errors
+              (network trouble, fal's API briefly down) back off and keep
+              polling; anything that still escapes leaves the row live, so
+              a retry reattaches instead of paying for a new request
+  - webhooks: with FAL_WEBHOOK_URL set, submissions ask fal to call
+              /webhooks/fal on completion; the call only wakes the waiting
+              coroutine, which then fetches the result through the
+              authenticated API (a forged webhook can't inject a result)
+
+Usage:
+  result = FAL_JOBS.run(record_id, scene_index, "clip", KLING_I2V_MODEL,
+                        inputs=[image_path], submit=lambda: handler.request_id)
+  FAL_JOBS.wake(request_id)          # from the webhook endpoint
+
+Config (.env):
+  FAL_POLL_SECONDS  — status poll interval per request (default 10)
+  FAL_JOB_TIMEOUT   — seconds after submission before a request is given up
+                      (default 7200)
+  FAL_WEBHOOK_URL   — public URL of /webhooks/fal (optional; polling still runs)
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+
+from tools import db
+from tools.disk_cache import DiskCache
+
+log = logging.getLogger('pipeline')
+
+POLL_SECONDS = float(os.getenv("FAL_POLL_SECONDS", "10"))
+JOB_TIMEOUT  = float(os.getenv("FAL_JOB_TIMEOUT", "7200"))
+POLL_BACKOFF = 8      # max multiple of the poll interval while status calls fail
+WEBHOOK_URL  = os.getenv("FAL_WEBHOOK_URL") or None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fal_jobs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    record_id   TEXT NOT NULL,
+    scene       INTEGER NOT NULL,
+    stage       TEXT NOT NULL,
+    model       TEXT NOT NULL,
+    input_key   TEXT NOT NULL,
+    request_id  TEXT NOT NULL,
+    status      TEXT NOT NULL DEFAULT 'submitted',
+    result      TEXT,
+    error       TEXT,
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_fal_jobs_scene ON fal_jobs (record_id, scene, stage, status);
+CREATE INDEX IF NOT EXISTS idx_fal_jobs_request ON fal_jobs (request_id);
+"""
+
+LIVE = ("submitted", "completed")
+
+
+class FalJobFailed(RuntimeError):
+    """fal reported the request failed, or it outlived FAL_JOB_TIMEOUT — resubmitting is the only way on."""
+
+
+def _reported_failure(exc: Exception) -> bool:
+    """True for an error response from fal about the request itself (4xx), not a network or server blip."""
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    return status is not None and 400 <= status < 500 and status not in (408, 429)
+
+
+def input_key(model: str, inputs, params: dict = None) -> str:
+    """
+    Identity of a request's inputs — local files by path, size and mtime (a
+    changed file means a new request), remote results by URL — plus any
+    request `params` that change the output (e.g. clip duration).
+    """
+    parts = []
+    for src in inputs:
+        if str(src).startswith(("http://", "https://")):
+            parts.append(str(src))
+            continue
+        st = os.stat(src)
+        parts.append((str(src), st.st_size, st.st_mtime_ns))
+    return DiskCache.key("fal", model, parts) if params is None else DiskCache.key("fal", model, parts, params)
+
+
+class FalJobs:
+    def __init__(self, db_file: str, poll_seconds: float = POLL_SECONDS):
+        self.db_file = db_file
+        self.poll_seconds = poll_seconds
+        self._loop = None
+        self._wakeups = {}                 # request_id → asyncio.Event (loop thread only)
+        self._start_lock = threading.Lock()
+
+        db.connect(db_file).executescript(SCHEMA)
+
+    # --- Rows ---
+
+    def _live(self, record_id: str, scene: int, stage: str, key: str):
+        return db.query_one(
+            """SELECT * FROM fal_jobs
+               WHERE record_id = ? AND scene = ? AND stage = ? AND input_key = ? AND status IN (?, ?)
+               ORDER BY id DESC LIMIT 1""",
+            (record_id, scene, stage, key, *LIVE), self.db_file
+        )
+
+    def _set(self, job_id: int, **fields):
+        cols = ", ".join(f"{col} = ?" for col in fields)
+        db.execute(f"UPDATE fal_jobs SET {cols}, updated_at = ? WHERE id = ?",
+                   (*fields.values(), time.time(), job_id), self.db_file)
+
+    # --- Public API ---
+
+    def run(self, record_id: str, scene: int, stage: str, model: str, inputs, submit,
+            params: dict = None) -> dict:
+        """
+        Result of the fal request for this scene + stage. Reattaches to a
+        live request made from the same inputs; otherwise calls `submit()`
+        (upload + fal_client.submit, returning the request id) and records it.
+        Blocks the calling thread on a future, not on an HTTP connection.
+        """
+        key = input_key(model, inputs, params)
+        row = self._live(record_id, scene, stage, key)
+        if row is not None:
+            if row["status"] == "completed":
+                return json.loads(row["result"])
+            job_id, request_id, submitted_at = row["id"], row["request_id"], row["created_at"]
+            print(f"    Reattaching to fal request {request_id}")
+        else:
+            request_id = submit()
+            now = submitted_at = time.time()
+            job_id = db.execute(
+                """INSERT INTO fal_jobs (record_id, scene, stage, model, input_key, request_id,
+                                         created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (record_id, scene, stage, model, key, request_id, now, now), self.db_file
+            )
+            log.info(f"[fal] submitted {stage} for {record_id[:8]} scene {scene + 1}: {request_id}")
+
+        deadline = submitted_at + JOB_TIMEOUT
+        try:
+            result = asyncio.run_coroutine_threadsafe(self._wait(model, request_id, deadline), self._start()).result()
+        except FalJobFailed as e:
+            self._set(job_id, status="failed", error=str(e)[:500])
+            raise
+        # Any other error leaves the row live: the request may still finish, and a retry reattaches to it.
+        self._set(job_id, status="completed", result=json.dumps(result))
+        return result
+
+    def stored(self, record_id: str, scene: int, stage: str, model: str, inputs,
+               params: dict = None) -> dict | None:
+        """Result of an already completed request for these inputs, without submitting."""
+        row = self._live(record_id, scene, stage, input_key(model, inputs, params))
+        return json.loads(row["result"]) if row is not None and row["status"] == "completed" else None
+
+    def wake(self, request_id: str) -> bool:
+        """Webhook hook: check `request_id` now instead of at its next poll."""
+        if self._loop is None:
+            return False
+        self._loop.call_soon_threadsafe(self._notify, request_id)
+        return True
+
+    def stats(self) -> dict:
+        rows = db.query_all("SELECT stage, status, COUNT(*) AS n FROM fal_jobs GROUP BY stage, status",
+                            db_file=self.db_file)
+        out = {}
+        for row in rows:
+            out.setdefault(row["stage"], {})[row["status"]] = row["n"]
+        return out
+
+    # --- Event loop ---
+
+    def _start(self) -> asyncio.AbstractEventLoop:
+        """The shared polling loop, started on first use."""
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="fal-poller", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def _notify(self, request_id: str):
+        event = self._wakeups.get(request_id)
+        if event is not None:
+            event.set()
+
+    async def _wait(self, model: str, request_id: str, deadline: float) -> dict:
+        import fal_client
+
+        event = self._wakeups[request_id] = asyncio.Event()
+        errors = 0
+        try:
+            while True:
+                try:
+                    status = await fal_client.status_async(model, request_id)
+                    if isinstance(status, fal_client.Completed):
+                        if getattr(status, "error", None):
+                            raise FalJobFailed(f"fal request {request_id} failed: {status.error}")
+                        return await fal_client.result_async(model, request_id)
+                    errors = 0
+                except FalJobFailed:
+                    raise
+                except Exception as e:
+                    if _reported_failure(e):
+                        raise FalJobFailed(f"fal request {request_id} failed: {e}") from e
+                    errors += 1
+                    log.warning(f"[fal] polling {request_id} failed ({e}) — retrying")
+
+                if time.time() > deadline:
+                    raise FalJobFailed(f"fal request {request_id} still unfinished after {JOB_TIMEOUT:.0f}s")
+
+                event.clear()
+                try:
+                    await asyncio.wait_for(event.wait(), self.poll_seconds * min(2 ** errors, POLL_BACKOFF))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._wakeups.pop(request_id, None)
+
+
+FAL_JOBS = FalJobs(db.DB_FILE)
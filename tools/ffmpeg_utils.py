@@ -0,0 +1,67 @@
+"""
+ffmpeg_utils.py
+---------------
+Thin helpers around the ffmpeg binary that MoviePy already ships with
+(imageio-ffmpeg, or FFMPEG_BINARY from the environment), for the steps
+that are faster done by ffmpeg directly than frame-by-frame in Python.
+"""
+
+import subprocess
+from pathlib import Path
+
+from moviepy.config import FFMPEG_BINARY
+
+
+def run_ffmpeg(args: list[str]) -> None:
+    """Run ffmpeg with `args`, raising RuntimeError with its stderr on failure."""
+    cmd = [FFMPEG_BINARY, "-y", "-hide_banner", "-loglevel", "error", *args]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg exited {proc.returncode}: {proc.stderr.strip()[-2000:]}")
+
+
+def probe_duration(path) -> float:
+    """Container duration in seconds, via the same header parse MoviePy uses."""
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+    return float(ffmpeg_parse_infos(str(path))["duration"])
+
+
+def write_concat_list(paths: list, list_path) -> Path:
+    """Write an ffmpeg concat-demuxer list file for `paths`."""
+    list_path = Path(list_path)
+    with open(list_path, "w") as f:
+        for p in paths:
+            escaped = str(Path(p).resolve()).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    return list_path
+
+
+def concat_copy(paths: list, output_path: str, list_path,
+                music_path: str = None, music_volume: float = 0.12, audio_path: str = None) -> str:
+    """
+    Losslessly stitch pre-encoded segments with the concat demuxer.
+
+    Video is stream-copied, so every segment must share codec, size, FPS
+    and pixel format. With `audio_path` that (already mixed) track replaces
+    the segment audio and is stream-copied too. With `music_path` the audio
+    gets one extra pass that loops the track under the segment audio;
+    otherwise audio is copied too.
+    """
+    write_concat_list(paths, list_path)
+    args = ["-f", "concat", "-safe", "0", "-i", str(list_path)]
+    if audio_path:
+        args += ["-i", str(audio_path), "-map", "0:v", "-map", "1:a", "-c", "copy", "-shortest"]
+    elif music_path:
+        args += [
+            "-stream_loop", "-1", "-i", str(music_path),
+            "-filter_complex",
+            f"[1:a]volume={music_volume}[m];"
+            "[0:a][m]amix=inputs=2:duration=first:dropout_transition=0:normalize=0[a]",
+            "-map", "0:v", "-map", "[a]",
+            "-c:v", "copy", "-c:a", "aac", "-ar", "44100",
+        ]
+    else:
+        args += ["-c", "copy"]
+    args += ["-movflags", "+faststart", str(output_path)]
+    run_ffmpeg(args)
+    return str(output_path)
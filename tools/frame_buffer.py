@@ -0,0 +1,179 @@
+"""
+frame_buffer.py
+---------------
+Decode-once looping source for short stock clips.
+
+A work segment longer than its stock clip used to be built as
+concatenate_videoclips([base] * loops): every loop re-opened the file
+through MoviePy's ffmpeg reader, seeked back to zero, decoded it again,
+and re-ran fit_clip_to_frame on every frame.
+
+Here the clip is decoded exactly once by a single ffmpeg process that
+also does the fit (scale / centre crop, constant FPS) and writes raw
+uint8 RGB frames straight into one contiguous (n, h, w, 3) array. Loop
+iterations then index that array modulo n — get_frame() returns a
+read-only view, no copy and no decode.
+
+Small buffers live in RAM; above FRAME_BUFFER_RAM_MB they spill to a
+memory-mapped scratch file (unlinked right away, so it vanishes with
+the buffer — Windows can't delete a mapped file, so there it is removed
+once the mapping is released, and leftovers of a crash are swept on the
+next spill). Clips that would exceed FRAME_BUFFER_MAX_MB are not
+buffered at all — the caller falls back to the streaming reader, as it
+does for clips that already cover the segment.
+
+Buffers are shared while alive: segments that loop the same clip at the
+same size reuse one decode.
+
+Config (.env):
+  FRAME_BUFFER_RAM_MB  — spill to disk above this (default 512)
+  FRAME_BUFFER_MAX_MB  — don't buffer clips above this (default 4096)
+  FRAME_BUFFER_DIR     — spill directory (default .tmp/cache/frames)
+"""
+
+import os
+import time
+import uuid
+import weakref
+import threading
+import subprocess
+import numpy as np
+from pathlib import Path
+
+from moviepy import VideoClip
+from moviepy.config import FFMPEG_BINARY
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+from tools.prepare_clips import _fit_filter
+
+RAM_LIMIT  = int(os.getenv("FRAME_BUFFER_RAM_MB", "512")) * 1024 * 1024
+MAX_BYTES  = int(os.getenv("FRAME_BUFFER_MAX_MB", "4096")) * 1024 * 1024
+SPILL_DIR  = Path(os.getenv("FRAME_BUFFER_DIR", ".tmp/cache/frames"))
+
+_live = weakref.WeakValueDictionary()     # (path, w, h, fps) → FrameBuffer
+_live_lock = threading.Lock()
+
+STALE_SPILL = 24 * 3600                   # seconds before an orphaned scratch file is swept
+
+
+class FrameBuffer:
+    """All frames of one clip, fitted to (w, h) at `fps`, decoded once."""
+
+    def __init__(self, frames: np.ndarray, fps: int, spilled: bool):
+        frames.flags.writeable = False
+        self.frames = frames
+        self.fps = fps
+        self.spilled = spilled
+
+    def __len__(self):
+        return len(self.frames)
+
+    @property
+    def nbytes(self) -> int:
+        return self.frames.nbytes
+
+    @property
+    def duration(self) -> float:
+        return len(self.frames) / self.fps
+
+    def frame_at(self, t: float) -> np.ndarray:
+        """Frame shown at time t, wrapping around the end of the clip."""
+        return self.frames[int(t * self.fps + 1e-6) % len(self.frames)]
+
+    def looped(self, duration: float) -> VideoClip:
+        """A `duration`-long clip that plays this buffer on repeat."""
+        clip = VideoClip(frame_function=self.frame_at, duration=duration)
+        clip.fps = self.fps
+        return clip
+
+
+def _remove_scratch(path: Path):
+    try:
+        path.unlink(missing_ok=True)
+    except OSError:
+        pass                            # still mapped (e.g. at exit) — swept by a later spill
+
+
+def _sweep_spill_dir():
+    cutoff = time.time() - STALE_SPILL
+    for path in SPILL_DIR.glob("*.rgb"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except OSError:
+            pass
+
+
+def _decode(path: Path, w: int, h: int, fps: int, infos: dict) -> FrameBuffer:
+    capacity = int(infos["duration"] * fps) + 2         # header duration can be off by a frame
+    frame_bytes = w * h * 3
+    spilled = capacity * frame_bytes > RAM_LIMIT
+
+    if spilled:
+        SPILL_DIR.mkdir(parents=True, exist_ok=True)
+        _sweep_spill_dir()
+        scratch = SPILL_DIR / f"{uuid.uuid4().hex}.rgb"
+        frames = np.memmap(scratch, dtype=np.uint8, mode="w+", shape=(capacity, h, w, 3))
+        try:
+            scratch.unlink()                            # POSIX: mapping stays valid until released
+        except PermissionError:
+            # Windows: a mapped file can't be deleted — remove it once the mapping is closed.
+            weakref.finalize(frames._mmap, _remove_scratch, scratch)
+    else:
+        frames = np.empty((capacity, h, w, 3), dtype=np.uint8)
+
+    vf = f"{_fit_filter(*infos['video_size'], w, h)},setsar=1,fps={fps}"
+    cmd = [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-i", str(path),
+           "-an", "-vf", vf, "-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:1"]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    n = 0
+    try:
+        while n < capacity:
+            view = memoryview(frames[n].reshape(-1))
+            got = 0
+            while got < frame_bytes:
+                read = proc.stdout.readinto(view[got:])
+                if not read:
+                    break
+                got += read
+            if got < frame_bytes:
+                break
+            n += 1
+    finally:
+        proc.stdout.close()
+        if proc.poll() is None:
+            proc.kill()
+        stderr = proc.stderr.read().decode(errors="replace")
+        proc.stderr.close()
+        proc.wait()
+
+    if n == 0:
+        raise RuntimeError(f"ffmpeg decoded no frames from {path}: {stderr.strip()[-2000:]}")
+    return FrameBuffer(frames[:n], fps, spilled)
+
+
+def looping_clip(path, w: int, h: int, fps: int, duration: float) -> VideoClip | None:
+    """
+    `path` fitted to (w, h) and looped to `duration`, served from a frame
+    buffer shared with any live buffer for the same clip. Returns None when
+    the clip doesn't need looping (it already covers `duration`) or is too
+    large to buffer — the caller then streams it as usual.
+    """
+    path = Path(path)
+    key = (str(path.resolve()), w, h, fps)
+    with _live_lock:
+        buf = _live.get(key)
+
+    if buf is None:
+        infos = ffmpeg_parse_infos(str(path))
+        if infos["duration"] >= duration:
+            return None
+        if (infos["duration"] * fps + 2) * w * h * 3 > MAX_BYTES:
+            return None
+        buf = _decode(path, w, h, fps, infos)
+        with _live_lock:
+            buf = _live.setdefault(key, buf)
+    elif buf.duration >= duration:
+        return None
+
+    return buf.looped(duration)
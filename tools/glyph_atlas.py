@@ -0,0 +1,244 @@
+"""
+glyph_atlas.py
+--------------
+Sprite cache for the on-screen text in workout videos.
+
+Every distinct label ("REST", exercise names, round titles, ...) and every
+digit 0-9 is rasterised once per (size, colour) into a tight-bbox sprite.
+A SpriteTrack then blits the right sprites onto each frame, so a segment
+needs one dynamic clip instead of one full-frame ImageClip per second.
+
+Usage:
+  atlas = GlyphAtlas()
+  track = SpriteTrack(1920, 1080)
+  track.add(atlas.label("REST", 160, (76, 200, 76)), "top")
+  for sec in range(20, 0, -1):
+      track.add(atlas.number(sec, 100, (255, 255, 255)), "bottom",
+                start=20 - sec, end=21 - sec)
+  clip = track.to_clip(20, bg_color=(15, 30, 15))
+"""
+
+import os
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+FONT_CANDIDATES = [
+    "/System/Library/Fonts/Helvetica.ttc",
+    "/System/Library/Fonts/Arial.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf",
+]
+
+
+# --- Font helpers ---
+
+@lru_cache(maxsize=None)
+def get_font(size: int):
+    """Return the first available bold-ish font at `size` (cached per size)."""
+    for path in FONT_CANDIDATES:
+        if os.path.exists(path):
+            try:
+                return ImageFont.truetype(path, size)
+            except Exception:
+                pass
+    return ImageFont.load_default()
+
+
+# --- Sprites ---
+
+class Sprite:
+    """
+    Tight-bbox bitmap for one piece of text.
+
+    rgb   — (h, w, 3) uint8 colour plane
+    alpha — (h, w)    uint8 coverage
+    ox/oy — ink offset from the PIL draw origin, so placement matches
+            what ImageDraw.text((x, y), ...) would have produced
+    text_w/text_h — textbbox extents, used for centring
+    """
+
+    __slots__ = ("rgb", "alpha", "ox", "oy", "text_w", "text_h")
+
+    def __init__(self, rgb: np.ndarray, alpha: np.ndarray,
+                 ox: int = 0, oy: int = 0, text_w: int = None, text_h: int = None):
+        self.rgb = np.ascontiguousarray(rgb, dtype=np.uint8)
+        self.alpha = np.ascontiguousarray(alpha, dtype=np.uint8)
+        self.ox, self.oy = ox, oy
+        self.text_w = self.w if text_w is None else text_w
+        self.text_h = self.h if text_h is None else text_h
+
+    @property
+    def w(self) -> int:
+        return self.alpha.shape[1]
+
+    @property
+    def h(self) -> int:
+        return self.alpha.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return self.rgb.nbytes + self.alpha.nbytes
+
+
+def _solid(color: tuple, w: int, h: int) -> np.ndarray:
+    rgb = np.empty((h, w, 3), dtype=np.uint8)
+    rgb[:] = color[:3]
+    return rgb
+
+
+class GlyphAtlas:
+    """Renders each (text, size, colour) once and hands back cached Sprites."""
+
+    def __init__(self):
+        self._labels: dict[tuple, Sprite] = {}
+        self._digits: dict[tuple, tuple[np.ndarray, int]] = {}
+        self._numbers: dict[tuple, Sprite] = {}
+
+    def __len__(self) -> int:
+        return len(self._labels) + len(self._digits) + len(self._numbers)
+
+    @property
+    def nbytes(self) -> int:
+        sprites = list(self._labels.values()) + list(self._numbers.values())
+        return sum(s.nbytes for s in sprites) + sum(a.nbytes for a, _ in self._digits.values())
+
+    def label(self, text: str, size: int, color: tuple, alpha: int = 255) -> Sprite:
+        """Transparent text sprite, cropped to its ink bounding box."""
+        key = (text, size, tuple(color), alpha)
+        sprite = self._labels.get(key)
+        if sprite is None:
+            font = get_font(size)
+            left, top, right, bottom = ImageDraw.Draw(Image.new("L", (1, 1))).textbbox((0, 0), text, font=font)
+            tw, th = max(1, right - left), max(1, bottom - top)
+            mask = Image.new("L", (tw, th), 0)
+            ImageDraw.Draw(mask).text((-left, -top), text, font=font, fill=alpha)
+            sprite = Sprite(_solid(color, tw, th), np.array(mask), left, top, tw, th)
+            self._labels[key] = sprite
+        return sprite
+
+    def badge(self, text: str, size: int, color: tuple, bg_color: tuple,
+              box: tuple[int, int]) -> Sprite:
+        """Text centred on a filled (box_w, box_h) rectangle — e.g. the WORK tag."""
+        key = (text, size, tuple(color), tuple(bg_color), tuple(box))
+        sprite = self._labels.get(key)
+        if sprite is None:
+            bw, bh = box
+            img = Image.new("RGBA", (bw, bh), tuple(bg_color))
+            draw = ImageDraw.Draw(img)
+            font = get_font(size)
+            left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
+            x, y = (bw - (right - left)) // 2, (bh - (bottom - top)) // 2
+            draw.text((x, y), text, font=font, fill=(*color, 255))
+            arr = np.array(img)
+            sprite = Sprite(arr[..., :3], arr[..., 3])
+            self._labels[key] = sprite
+        return sprite
+
+    def _digit(self, digit: str, size: int, color: tuple) -> tuple[np.ndarray, int]:
+        """Coverage mask for one digit on a full line-height cell, plus its advance."""
+        key = (digit, size, tuple(color))
+        entry = self._digits.get(key)
+        if entry is None:
+            font = get_font(size)
+            advance = int(round(font.getlength(digit)))
+            _, _, right, bottom = font.getbbox(digit)
+            cell = Image.new("L", (max(advance, right, 1), max(bottom, 1)), 0)
+            ImageDraw.Draw(cell).text((0, 0), digit, font=font, fill=255)
+            entry = (np.array(cell), advance)
+            self._digits[key] = entry
+        return entry
+
+    def number(self, value: int, size: int, color: tuple) -> Sprite:
+        """Countdown number composed from cached per-digit sprites."""
+        text = str(value)
+        key = (text, size, tuple(color))
+        sprite = self._numbers.get(key)
+        if sprite is None:
+            cells = [self._digit(d, size, color) for d in text]
+            width = sum(adv for _, adv in cells[:-1]) + cells[-1][0].shape[1]
+            height = max(cell.shape[0] for cell, _ in cells)
+            canvas = np.zeros((height, width), dtype=np.uint8)
+            x = 0
+            for cell, adv in cells:
+                ch, cw = cell.shape
+                np.maximum(canvas[:ch, x:x + cw], cell, out=canvas[:ch, x:x + cw])
+                x += adv
+            rows = np.flatnonzero(canvas.any(axis=1))
+            cols = np.flatnonzero(canvas.any(axis=0))
+            if rows.size == 0:
+                top, bottom, left, right = 0, 1, 0, 1
+            else:
+                top, bottom = rows[0], rows[-1] + 1
+                left, right = cols[0], cols[-1] + 1
+            alpha = canvas[top:bottom, left:right]
+            sprite = Sprite(_solid(color, right - left, bottom - top), alpha, int(left), int(top))
+            self._numbers[key] = sprite
+        return sprite
+
+
+def place(sprite: Sprite, position, w: int, h: int) -> tuple[int, int]:
+    """
+    Top-left pixel of the sprite's ink for a named or absolute position.
+    Mirrors the old text_image() layout: "center", "top", "bottom" or (x, y).
+    """
+    tw, th = sprite.text_w, sprite.text_h
+    if position == "top":
+        x, y = (w - tw) // 2, int(h * 0.08)
+    elif position == "bottom":
+        x, y = (w - tw) // 2, int(h * 0.82)
+    elif isinstance(position, tuple):
+        x, y = position
+    else:
+        x, y = (w - tw) // 2, (h - th) // 2
+    return x + sprite.ox, y + sprite.oy
+
+
+def blit(frame: np.ndarray, sprite: Sprite, x: int, y: int) -> None:
+    """Alpha-blend a sprite into an (h, w, 3) uint8 frame in place, clipped to bounds."""
+    fh, fw = frame.shape[:2]
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + sprite.w, fw), min(y + sprite.h, fh)
+    if x0 >= x1 or y0 >= y1:
+        return
+    sx, sy = x0 - x, y0 - y
+    a = sprite.alpha[sy:sy + (y1 - y0), sx:sx + (x1 - x0), None].astype(np.float32) / 255.0
+    rgb = sprite.rgb[sy:sy + (y1 - y0), sx:sx + (x1 - x0)]
+    region = frame[y0:y1, x0:x1]
+    region[:] = (region * (1.0 - a) + rgb * a).astype(np.uint8)
+
+
+# --- Tracks ---
+
+class SpriteTrack:
+    """Timed list of positioned sprites, drawn onto frames on demand."""
+
+    def __init__(self, w: int, h: int):
+        self.w, self.h = w, h
+        self.items: list[tuple[float, float, Sprite, int, int]] = []
+
+    def add(self, sprite: Sprite, position="center", start: float = 0.0, end: float = None):
+        """Show `sprite` at `position` from `start` to `end` (None = whole clip)."""
+        x, y = place(sprite, position, self.w, self.h)
+        self.items.append((start, float("inf") if end is None else end, sprite, x, y))
+        return self
+
+    def draw(self, frame: np.ndarray, t: float) -> np.ndarray:
+        if not frame.flags.writeable or frame.dtype != np.uint8:
+            frame = frame.astype(np.uint8)
+        for start, end, sprite, x, y in self.items:
+            if start <= t < end:
+                blit(frame, sprite, x, y)
+        return frame
+
+    def apply(self, clip):
+        """Overlay this track on an existing clip in a single transform pass."""
+        return clip.transform(lambda get_frame, t: self.draw(get_frame(t), t))
+
+    def to_clip(self, duration: float, bg_color: tuple = (0, 0, 0)):
+        """Opaque clip: solid background plus this track."""
+        from moviepy import VideoClip
+
+        bg = _solid(bg_color, self.w, self.h)
+        return VideoClip(lambda t: self.draw(bg.copy(), t), duration=duration)
@@ -0,0 +1,319 @@
+"""
+job_queue.py
+------------
+SQLite-backed job queue with leased claims, retries and per-lane workers.
+
+Long-running dashboard actions (script generation, voiceovers, renders)
+are stored as rows in a `jobs` table next to the Videos table instead of
+being handed to an unbounded daemon thread. A fixed pool of worker threads
+per lane claims them, so heavy MoviePy renders can't pile up and work
+queued before a restart is picked up again afterwards.
+
+  - claim:   a worker atomically flips one due row to 'running' and takes
+             a lease; a heartbeat keeps extending it while the job runs.
+  - crash:   if the process dies the lease expires and the job is claimed
+             again (counted as another attempt).
+  - failure: a handler that raises is retried with exponential backoff
+             until max_attempts, then left as 'failed' with its error.
+             Only then does the task's on_failure hook run, so a card
+             never shows a terminal error for a job that will be retried.
+  - retry:   before a second or later attempt the task's still_wanted
+             check runs; if the record has moved on (reset, re-queued,
+             deleted) the job is dropped as 'cancelled' instead.
+
+Lanes separate CPU-heavy renders from I/O-bound API calls. Each lane has
+its own worker count and an admission limit — enqueue() raises QueueFull
+once that many jobs are already waiting or running in the lane.
+
+Usage:
+  jobs = JobQueue("youtube.db", lanes={"render": (1, 4), "io": (4, 50)})
+
+  @jobs.task(lane="render", on_failure=mark_failed, still_wanted=is_building)
+  def build(record_id, plan): ...
+
+  jobs.start()
+  jobs.enqueue("build", record_id, plan, record_id=record_id)
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+
+from tools import db
+
+log = logging.getLogger('pipeline')
+
+LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+POLL_SECONDS  = float(os.getenv("JOB_POLL_SECONDS", "2"))
+RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", "30"))   # seconds, doubled per attempt
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    name         TEXT NOT NULL,
+    lane         TEXT NOT NULL,
+    record_id    TEXT,
+    payload      TEXT NOT NULL,
+    status       TEXT NOT NULL DEFAULT 'queued',
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    run_after    REAL NOT NULL,
+    lease_until  REAL,
+    worker       TEXT,
+    last_error   TEXT,
+    created_at   REAL NOT NULL,
+    updated_at   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (lane, status, run_after);
+CREATE INDEX IF NOT EXISTS idx_jobs_record ON jobs (record_id, name, status);
+"""
+
+ACTIVE = ("queued", "running")
+
+
+class QueueFull(Exception):
+    """Raised by enqueue() when a lane is at its admission limit."""
+
+
+class JobQueue:
+    def __init__(self, db_file: str, lanes: dict[str, tuple[int, int]],
+                 lease_seconds: float = LEASE_SECONDS, poll_seconds: float = POLL_SECONDS):
+        """
+        lanes: {lane: (workers, admission_limit)}
+        """
+        self.db_file = db_file
+        self.lanes = lanes
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.handlers = {}
+        self._wake = {lane: threading.Condition() for lane in lanes}
+        self._threads = []
+        self._stopping = threading.Event()
+        self._start_lock = threading.Lock()
+
+        db.connect(db_file).executescript(SCHEMA)
+
+    # --- Registration / submission ---
+
+    def task(self, lane: str, max_attempts: int = 3, on_failure=None, still_wanted=None):
+        """
+        Decorator registering a function as the handler for jobs named after it.
+
+        on_failure(*args, error=e): called once, when the job is given up.
+        still_wanted(*args) -> bool: checked before each retry; False cancels it.
+        """
+        if lane not in self.lanes:
+            raise ValueError(f"Unknown lane: {lane}")
+
+        def register(fn):
+            self.handlers[fn.__name__] = (fn, lane, max_attempts, on_failure, still_wanted)
+            return fn
+        return register
+
+    def enqueue(self, name: str, *args, record_id: str = None) -> int:
+        """
+        Queue `name(*args)`. If the same job is already queued or running for
+        this record, its id is returned instead of queuing a duplicate.
+        """
+        fn, lane, max_attempts = self.handlers[name][:3]
+        now = time.time()
+        with db.transaction(self.db_file) as conn:
+            if record_id is not None:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE record_id = ? AND name = ? AND status IN (?, ?)",
+                    (record_id, name, *ACTIVE)
+                ).fetchone()
+                if row:
+                    return row["id"]
+
+            limit = self.lanes[lane][1]
+            active = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE lane = ? AND status IN (?, ?)", (lane, *ACTIVE)
+            ).fetchone()[0]
+            if active >= limit:
+                raise QueueFull(f"'{lane}' lane is full ({active}/{limit} jobs)")
+
+            job_id = conn.execute(
+                """INSERT INTO jobs (name, lane, record_id, payload, max_attempts,
+                                     run_after, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (name, lane, record_id, json.dumps(args), max_attempts, now, now, now)
+            ).lastrowid
+
+        with self._wake[lane]:
+            self._wake[lane].notify()
+        log.info(f"[jobs] queued #{job_id} {name} ({lane})")
+        return job_id
+
+    # --- Claim / lease ---
+
+    def claim(self, lane: str, worker: str):
+        """Atomically take the next due job in `lane` (or an abandoned one), or None."""
+        while True:
+            now = time.time()
+            with db.transaction(self.db_file) as conn:
+                row = conn.execute(
+                    """SELECT * FROM jobs
+                       WHERE lane = ? AND ((status = 'queued' AND run_after <= ?)
+                                           OR (status = 'running' AND lease_until < ?))
+                       ORDER BY run_after, id LIMIT 1""",
+                    (lane, now, now)
+                ).fetchone()
+                if row is None:
+                    return None
+
+                abandoned = row["status"] == "running" and row["attempts"] >= row["max_attempts"]
+                if abandoned:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'failed', last_error = ?, updated_at = ? WHERE id = ?",
+                        ("lease expired (worker died)", now, row["id"])
+                    )
+                else:
+                    conn.execute(
+                        """UPDATE jobs SET status = 'running', attempts = attempts + 1,
+                                           lease_until = ?, worker = ?, updated_at = ?
+                           WHERE id = ?""",
+                        (now + self.lease_seconds, worker, now, row["id"])
+                    )
+            if abandoned:
+                # Outside the transaction — the hook writes to the same database.
+                self._on_failure(dict(row), RuntimeError("lease expired (worker died)"))
+                continue
+            return dict(row, attempts=row["attempts"] + 1)
+
+    def _heartbeat(self, job_id: int, done: threading.Event):
+        try:
+            while not done.wait(self.lease_seconds / 3):
+                db.execute(
+                    "UPDATE jobs SET lease_until = ? WHERE id = ? AND status = 'running'",
+                    (time.time() + self.lease_seconds, job_id), self.db_file
+                )
+        finally:
+            db.close(self.db_file)
+
+    def _finish(self, job: dict, error: Exception = None):
+        now = time.time()
+        if error is None:
+            db.execute(
+                "UPDATE jobs SET status = 'done', lease_until = NULL, updated_at = ? WHERE id = ?",
+                (now, job["id"]), self.db_file
+            )
+        elif job["attempts"] < job["max_attempts"]:
+            delay = RETRY_BACKOFF * (2 ** (job["attempts"] - 1))
+            db.execute(
+                """UPDATE jobs SET status = 'queued', run_after = ?, lease_until = NULL,
+                                   last_error = ?, updated_at = ? WHERE id = ?""",
+                (now + delay, str(error)[:500], now, job["id"]), self.db_file
+            )
+        else:
+            db.execute(
+                """UPDATE jobs SET status = 'failed', lease_until = NULL,
+                                   last_error = ?, updated_at = ? WHERE id = ?""",
+                (str(error)[:500], now, job["id"]), self.db_file
+            )
+            self._on_failure(job, error)
+
+    def _on_failure(self, job: dict, error: Exception):
+        """Run the task's on_failure hook for a job that has been given up."""
+        hook = self.handlers[job["name"]][3] if job["name"] in self.handlers else None
+        if hook is None:
+            return
+        try:
+            hook(*json.loads(job["payload"]), error=error)
+        except Exception as e:
+            log.exception(f"[jobs] #{job['id']} {job['name']} on_failure raised: {e}")
+
+    def _cancel(self, job: dict, reason: str):
+        db.execute(
+            """UPDATE jobs SET status = 'cancelled', lease_until = NULL,
+                               last_error = ?, updated_at = ? WHERE id = ?""",
+            (reason, time.time(), job["id"]), self.db_file
+        )
+        log.info(f"[jobs] cancelled #{job['id']} {job['name']}: {reason}")
+
+    def run_one(self, job: dict):
+        fn, _, _, _, still_wanted = self.handlers[job["name"]]
+        args = json.loads(job["payload"])
+        if job["attempts"] > 1 and still_wanted is not None:
+            try:
+                wanted = still_wanted(*args)
+            except Exception as e:
+                log.exception(f"[jobs] #{job['id']} {job['name']} still_wanted raised: {e}")
+                wanted = True
+            if not wanted:
+                self._cancel(job, "record moved on before retry")
+                return
+
+        done = threading.Event()
+        beat = threading.Thread(target=self._heartbeat, args=(job["id"], done), daemon=True)
+        beat.start()
+        log.info(f"[jobs] start #{job['id']} {job['name']} (attempt {job['attempts']}/{job['max_attempts']})")
+        try:
+            fn(*args)
+        except Exception as e:
+            log.exception(f"[jobs] #{job['id']} {job['name']} raised: {e}")
+            self._finish(job, e)
+        else:
+            self._finish(job)
+            log.info(f"[jobs] done #{job['id']} {job['name']}")
+        finally:
+            done.set()
+
+    # --- Workers ---
+
+    def _worker(self, lane: str, worker: str):
+        wake = self._wake[lane]
+        while not self._stopping.is_set():
+            try:
+                job = self.claim(lane, worker)
+            except sqlite3.Error as e:
+                log.warning(f"[jobs] {worker} claim failed: {e}")
+                job = None
+            if job is None:
+                with wake:
+                    wake.wait(self.poll_seconds)
+                continue
+            self.run_one(job)
+
+    def start(self):
+        """Start the lane worker threads (idempotent)."""
+        with self._start_lock:
+            if self._threads:
+                return
+            host = uuid.uuid4().hex[:6]
+            for lane, (workers, _) in self.lanes.items():
+                for i in range(workers):
+                    name = f"{lane}-{host}-{i}"
+                    t = threading.Thread(target=self._worker, args=(lane, name), name=name, daemon=True)
+                    t.start()
+                    self._threads.append(t)
+            log.info(f"[jobs] started workers: "
+                     + ", ".join(f"{lane}={w}" for lane, (w, _) in self.lanes.items()))
+
+    def stop(self):
+        self._stopping.set()
+        for cond in self._wake.values():
+            with cond:
+                cond.notify_all()
+
+    # --- Introspection ---
+
+    def stats(self) -> dict:
+        """{lane: {status: count}} over all jobs."""
+        out = {lane: {} for lane in self.lanes}
+        for row in db.query_all("SELECT lane, status, COUNT(*) AS n FROM jobs GROUP BY lane, status",
+                                db_file=self.db_file):
+            out.setdefault(row["lane"], {})[row["status"]] = row["n"]
+        return out
+
+    def recent(self, limit: int = 50) -> list[dict]:
+        rows = db.query_all(
+            """SELECT id, name, lane, record_id, status, attempts, max_attempts,
+                      last_error, created_at, updated_at
+               FROM jobs ORDER BY id DESC LIMIT ?""", (limit,), self.db_file
+        )
+        return [dict(r) for r in rows]
@@ -0,0 +1,299 @@
+"""
+ken_burns.py
+------------
+Local Ken Burns / parallax animation — an offline alternative to Kling
+i2v for Finance scenes.
+
+Kling turns scene_<n>.png into motion on a remote queue that dominates a
+production's wall-clock time. This engine animates the same still on the
+CPU in a few seconds per scene:
+
+  - camera:   an eased (smootherstep) zoom + pan between two framings
+              picked per shot from a seeded set of moves, so neighbouring
+              scenes don't all push in the same way
+  - parallax: the character is cut out with a simple foreground mask
+              (distance from the border colour — DALL-E stills are drawn on
+              a plain background), the hole left in the background plate
+              is filled push-pull from its surroundings, and
+              the foreground layer moves PARALLAX times further than the
+              plate, so the figure separates from the background
+  - frames:   each layer is one separable crop-and-scale (PIL resize
+              with a sub-pixel box, so slow pans don't step) from a
+              source pre-scaled once to just cover the largest framing;
+              the foreground is resampled only over its mask's bounding
+              box and pasted through the mask, and raw RGB is piped into
+              one ffmpeg x264 encoder — no intermediate images
+
+Output follows the clip_path contract of generate_kling_clip: an MP4 at
+clip_path that apply_lipsync and sync_assembler take unchanged.
+
+Usage:
+  animate("scene_0.png", "clip_0.mp4", duration=8.2, seed=0)
+
+  python -m tools.ken_burns scene.png             # benchmark: 15 scenes x 8 s
+  python -m tools.ken_burns scene.png 15 8 out/   # scenes, seconds, keep clips
+
+Config (.env):
+  KEN_BURNS_SIZE      — output WxH (default 1280x720, Kling's 16:9 size)
+  KEN_BURNS_FPS       — default 24
+  KEN_BURNS_ZOOM      — zoom change over a shot (default 0.12)
+  KEN_BURNS_PARALLAX  — extra foreground motion (default 0.6)
+  KEN_BURNS_CRF       — x264 quality of the clip (default 20)
+"""
+
+import os
+import sys
+import math
+import time
+import random
+import subprocess
+import numpy as np
+from pathlib import Path
+from PIL import Image, ImageFilter
+
+from moviepy.config import FFMPEG_BINARY
+
+SIZE     = tuple(int(v) for v in os.getenv("KEN_BURNS_SIZE", "1280x720").split("x"))
+FPS      = int(os.getenv("KEN_BURNS_FPS", "24"))
+ZOOM     = float(os.getenv("KEN_BURNS_ZOOM", "0.12"))
+PARALLAX = float(os.getenv("KEN_BURNS_PARALLAX", "0.6"))
+CRF      = int(os.getenv("KEN_BURNS_CRF", "20"))
+
+BG_DISTANCE = 28       # per-channel distance from the border colour that counts as foreground
+FG_MIN, FG_MAX = 0.03, 0.85   # mask coverage outside this range → no parallax
+
+
+def ease(t: float) -> float:
+    """Smootherstep: zero velocity and acceleration at both ends."""
+    t = min(max(t, 0.0), 1.0)
+    return t * t * t * (t * (t * 6 - 15) + 10)
+
+
+# ---------------------------------------------------------------------------
+# Layers
+# ---------------------------------------------------------------------------
+
+def _foreground_mask(rgb: np.ndarray) -> np.ndarray | None:
+    """Soft uint8 mask of everything that isn't the border colour, or None if unusable."""
+    border = np.concatenate([rgb[0], rgb[-1], rgb[:, 0], rgb[:, -1]])
+    bg = np.median(border, axis=0)
+    hard = (np.abs(rgb.astype(np.int16) - bg).max(axis=2) > BG_DISTANCE)
+    coverage = hard.mean()
+    if not FG_MIN <= coverage <= FG_MAX:
+        return None
+    mask = Image.fromarray(hard.astype(np.uint8) * 255)
+    mask = mask.filter(ImageFilter.MinFilter(3)).filter(ImageFilter.MaxFilter(7))   # drop specks, close gaps
+    return np.asarray(mask.filter(ImageFilter.GaussianBlur(2)))
+
+
+def _resize(a: np.ndarray, shape: tuple[int, int]) -> np.ndarray:
+    """Bilinear resize of a float (h, w, c) array to `shape`."""
+    size = (shape[1], shape[0])
+    return np.stack([np.asarray(Image.fromarray(np.ascontiguousarray(a[..., c])).resize(size, Image.BILINEAR))
+                     for c in range(a.shape[2])], axis=2)
+
+
+def _background_plate(rgb: np.ndarray, hole: np.ndarray) -> np.ndarray:
+    """
+    The still with `hole` painted out. Push-pull: the kept pixels are
+    averaged down a pyramid, then every level's gaps are filled from the
+    level above — each hidden pixel takes the colour of what surrounds it,
+    at whatever scale the hole needs.
+    """
+    keep = (hole < 8).astype(np.float32)
+    num, weight = rgb.astype(np.float32) * keep[..., None], keep
+    pyramid = []
+    while min(weight.shape) > 4:
+        pyramid.append((num, weight))
+        h, w = weight.shape[0] // 2, weight.shape[1] // 2
+        num = num[:h * 2, :w * 2].reshape(h, 2, w, 2, 3).sum(axis=(1, 3))
+        weight = weight[:h * 2, :w * 2].reshape(h, 2, w, 2).sum(axis=(1, 3))
+        num *= (np.minimum(weight, 1) / np.maximum(weight, 1e-6))[..., None]
+        weight = np.minimum(weight, 1)
+    filled = num / np.maximum(weight, 1e-6)[..., None]
+    for num, weight in reversed(pyramid):
+        filled = num + _resize(filled, weight.shape) * (1 - weight)[..., None]
+
+    alpha = (hole.astype(np.float32) / 255)[..., None]
+    return np.clip(rgb * (1 - alpha) + filled * alpha, 0, 255).astype(np.uint8)
+
+
+class _Scene:
+    """A still prepared for animation: source pre-scaled to cover the widest framing."""
+
+    def __init__(self, image_path, size: tuple[int, int]):
+        self.w, self.h = size
+        img = Image.open(image_path).convert("RGB")
+        cover = max(self.w / img.width, self.h / img.height) * (1 + ZOOM)
+        if cover < 1:
+            img = img.resize((round(img.width * cover), round(img.height * cover)), Image.LANCZOS)
+        self.sw, self.sh = img.size
+        self.base = max(self.w / self.sw, self.h / self.sh)     # source px → output px at zoom 1
+
+        rgb = np.asarray(img)
+        mask = _foreground_mask(rgb)
+        if mask is None:
+            self.plate, self.fg, self.mask = img, None, None
+        else:
+            # Paint out a little more than the figure, so its anti-aliased edge doesn't ghost on the plate.
+            hole = Image.fromarray(mask).filter(ImageFilter.MaxFilter(9)).filter(ImageFilter.GaussianBlur(2))
+            self.plate = Image.fromarray(_background_plate(rgb, np.asarray(hole)))
+            self.fg, self.mask = img, Image.fromarray(mask)
+            self.bbox = self.mask.getbbox()
+
+    def box(self, zoom: float, cx: float, cy: float) -> tuple[float, float, float]:
+        """(k, x0, y0): output pixel (x, y) samples source (x0 + k*x, y0 + k*y)."""
+        k = 1.0 / (self.base * zoom)
+        return k, cx - self.w / 2 * k, cy - self.h / 2 * k
+
+    def clamp(self, zoom: float, cx: float, cy: float) -> tuple[float, float]:
+        """Keep the framing inside the source."""
+        half_w, half_h = self.w / (2 * self.base * zoom), self.h / (2 * self.base * zoom)
+        return (min(max(cx, half_w), self.sw - half_w), min(max(cy, half_h), self.sh - half_h))
+
+
+# ---------------------------------------------------------------------------
+# Camera
+# ---------------------------------------------------------------------------
+
+MOVES = ("push_in", "pull_out", "pan_left", "pan_right", "rise")
+
+
+def camera_path(scene: _Scene, seed: int) -> tuple[str, tuple, tuple]:
+    """(move, (zoom, cx, cy) at start, at end) — a seeded move, clamped to the still."""
+    rng = random.Random(seed)
+    move = MOVES[seed % len(MOVES)]
+    cx, cy = scene.sw / 2, scene.sh / 2
+    drift = lambda: rng.uniform(-0.04, 0.04) * scene.sw
+    z_lo, z_hi = 1.0, 1.0 + ZOOM
+    span = scene.sw * ZOOM / 3
+
+    if move == "push_in":
+        a, b = (z_lo, cx, cy), (z_hi, cx + drift(), cy - scene.sh * 0.03)
+    elif move == "pull_out":
+        a, b = (z_hi, cx + drift(), cy - scene.sh * 0.03), (z_lo, cx, cy)
+    elif move == "pan_left":
+        z = 1.0 + ZOOM * 0.75
+        a, b = (z, cx + span, cy), (z, cx - span, cy)
+    elif move == "pan_right":
+        z = 1.0 + ZOOM * 0.75
+        a, b = (z, cx - span, cy), (z, cx + span, cy)
+    else:
+        z = 1.0 + ZOOM * 0.75
+        a, b = (z, cx + drift(), cy + scene.sh * 0.04), (z_hi, cx, cy - scene.sh * 0.02)
+    a = (a[0], *scene.clamp(*a))
+    b = (b[0], *scene.clamp(*b))
+    return move, a, b
+
+
+def _layer(scene: _Scene, k: float, x0: float, y0: float):
+    """The foreground resampled over just the output rectangle its mask covers: (rgb, mask, offset)."""
+    bx0, by0, bx1, by1 = scene.bbox
+    ox0 = max(0, math.ceil(-x0 / k), math.floor((bx0 - x0) / k))
+    oy0 = max(0, math.ceil(-y0 / k), math.floor((by0 - y0) / k))
+    ox1 = min(scene.w, math.floor((scene.sw - x0) / k), math.ceil((bx1 - x0) / k))
+    oy1 = min(scene.h, math.floor((scene.sh - y0) / k), math.ceil((by1 - y0) / k))
+    if ox1 <= ox0 or oy1 <= oy0:
+        return None
+    size = (ox1 - ox0, oy1 - oy0)
+    box = (x0 + ox0 * k, y0 + oy0 * k, x0 + ox1 * k, y0 + oy1 * k)
+    return (scene.fg.resize(size, Image.BILINEAR, box=box),
+            scene.mask.resize(size, Image.BILINEAR, box=box), (ox0, oy0))
+
+
+def frames(scene: _Scene, n: int, seed: int = 0):
+    """n composited RGB frames (PIL images) along the shot's camera path."""
+    _, (z0, x0, y0), (z1, x1, y1) = camera_path(scene, seed)
+    size = (scene.w, scene.h)
+    for i in range(n):
+        e = ease(i / max(n - 1, 1))
+        zoom, cx, cy = z0 + (z1 - z0) * e, x0 + (x1 - x0) * e, y0 + (y1 - y0) * e
+        k, bx, by = scene.box(zoom, cx, cy)
+        frame = scene.plate.resize(size, Image.BILINEAR, box=(bx, by, bx + k * scene.w, by + k * scene.h))
+        if scene.fg is not None:
+            # The figure moves further than the plate: its framing runs ahead along the same path.
+            fz = zoom * (zoom / z0) ** PARALLAX
+            fx, fy = x0 + (cx - x0) * (1 + PARALLAX), y0 + (cy - y0) * (1 + PARALLAX)
+            layer = _layer(scene, *scene.box(fz, fx, fy))
+            if layer is not None:
+                frame.paste(layer[0], layer[2], layer[1])
+        yield frame
+
+
+# ---------------------------------------------------------------------------
+# Encode
+# ---------------------------------------------------------------------------
+
+def animate(image_path, output_path, duration: float, seed: int = 0,
+            size: tuple[int, int] = SIZE, fps: int = FPS) -> Path:
+    """Render `duration` seconds of camera motion over `image_path` to an MP4 at `output_path`."""
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    scene = _Scene(image_path, size)
+    n = max(2, round(duration * fps))
+    tmp = output_path.with_name(f"{output_path.stem}.part{output_path.suffix}")
+
+    cmd = [FFMPEG_BINARY, "-y", "-hide_banner", "-loglevel", "error",
+           "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{size[0]}x{size[1]}", "-r", str(fps), "-i", "pipe:0",
+           "-c:v", "libx264", "-preset", "veryfast", "-crf", str(CRF), "-pix_fmt", "yuv420p",
+           "-movflags", "+faststart", str(tmp)]
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        for frame in frames(scene, n, seed):
+            proc.stdin.write(frame.tobytes())
+    except BrokenPipeError:
+        pass                                   # ffmpeg exited early — its stderr says why
+    except BaseException:
+        proc.kill()                            # a frame failed: don't leave the encoder running
+        raise
+    finally:
+        try:
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        stderr = proc.stderr.read().decode(errors="replace")
+        proc.stderr.close()
+        code = proc.wait()
+        if code != 0:
+            tmp.unlink(missing_ok=True)
+    if code != 0:
+        raise RuntimeError(f"ffmpeg could not encode {output_path}: {stderr.strip()[-2000:]}")
+    os.replace(tmp, output_path)
+    return output_path
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+def _bench(image_path: str, scenes: int, seconds: float, out_dir: str = None):
+    from concurrent.futures import ThreadPoolExecutor
+    import tempfile
+
+    work = Path(out_dir or tempfile.mkdtemp(prefix="ken_burns_"))
+    start = time.perf_counter()
+    scene = _Scene(image_path, SIZE)
+    prep = time.perf_counter() - start
+    print(f"  prepare: {prep * 1000:.0f} ms, parallax {'on' if scene.fg is not None else 'off (no usable mask)'}")
+
+    n = round(seconds * FPS)
+    start = time.perf_counter()
+    for _ in frames(scene, n):
+        pass
+    per_frame = (time.perf_counter() - start) / n * 1000
+    print(f"  frames:  {per_frame:.1f} ms/frame at {SIZE[0]}x{SIZE[1]} (no encode)")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(os.cpu_count() or 1) as pool:
+        list(pool.map(lambda i: animate(image_path, work / f"clip_{i}.mp4", seconds, seed=i), range(scenes)))
+    total = time.perf_counter() - start
+    print(f"  {scenes} scenes x {seconds:g}s: {total:.1f}s wall on {os.cpu_count()} cores -> {work}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python -m tools.ken_burns <image.png> [scenes] [seconds] [out_dir]")
+        sys.exit(1)
+    args = sys.argv[1:]
+    _bench(args[0], int(args[1]) if len(args) > 1 else 15, float(args[2]) if len(args) > 2 else 8,
+           args[3] if len(args) > 3 else None)
@@ -0,0 +1,206 @@
+"""
+prepare_clips.py
+----------------
+Normalised, loopable exercise-clip intermediates.
+
+Every work segment used to open the raw stock clip and resize / crop it
+frame by frame in Python, in every round of every build. This stage
+transcodes each source once per (width, height, fps) with ffmpeg:
+
+  - fit to the frame exactly like fit_clip_to_frame (plain resize when
+    the aspect ratios match, centre crop for landscape → portrait)
+  - constant frame rate, yuv420p, no audio, 1 s GOP for cheap seeking
+  - the tail cross-fades into the head (LOOP_XFADE seconds), so looping
+    the result has no visible jump
+
+A source needed at several sizes (landscape + Shorts) is decoded once:
+one ffmpeg process splits the decoded frames into a fit chain per size.
+
+Results live in a managed library (DiskCache — LRU-bounded, atomic
+publish, safe to share between builds). A user clip is identified by its
+resolved path, size and mtime, so replacing a clip re-prepares it. Stock
+footage from the download store — or a build's hard link to it — is named
+after its SHA-256, and that name is its identity: the store touching the
+object or a new job directory doesn't re-prepare it.
+
+Usage:
+  python -m tools.prepare_clips                 # whole library, both formats
+  python -m tools.prepare_clips --landscape --workers 4
+  python -m tools.prepare_clips clips/exercises/squats.mp4 --portrait
+
+Config (.env):
+  CLIP_LIBRARY_DIR     — default .tmp/cache/clips
+  CLIP_LIBRARY_MAX_MB  — size bound before LRU eviction (default 8192)
+"""
+
+import os
+import sys
+import glob
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from tools.downloads import DOWNLOADS
+from tools.disk_cache import DiskCache, TMP_MARKER
+from tools.ffmpeg_utils import run_ffmpeg, probe_duration
+
+FORMATS = {
+    "landscape": (1920, 1080),
+    "portrait":  (1080, 1920),
+}
+DEFAULT_FPS = 30
+LOOP_XFADE  = 0.5    # seconds of tail → head cross-fade
+PREP_VERSION = 1     # bump when the transcode recipe changes
+
+SOURCE_GLOBS = ["clips/exercises/*.mp4", f"{DOWNLOADS.objects.root}/*/*.mp4"]
+
+CLIP_LIBRARY = DiskCache(
+    os.getenv("CLIP_LIBRARY_DIR", ".tmp/cache/clips"),
+    max_bytes=int(os.getenv("CLIP_LIBRARY_MAX_MB", "8192")) * 1024 * 1024,
+)
+
+
+def _source_identity(src: Path) -> tuple:
+    st = src.stat()
+    if len(src.stem) == 64 and all(c in "0123456789abcdef" for c in src.stem):
+        return ("sha256", src.stem, st.st_size)          # content-addressed store object
+    return (str(src.resolve()), st.st_size, st.st_mtime_ns)
+
+
+def _source_key(src: Path, w: int, h: int, fps: int) -> str:
+    return DiskCache.key("clip", PREP_VERSION, *_source_identity(src), w, h, fps, LOOP_XFADE)
+
+
+def _fit_filter(src_w: int, src_h: int, w: int, h: int) -> str:
+    """ffmpeg equivalent of build_workout_video.fit_clip_to_frame."""
+    target_ratio = w / h
+    source_ratio = src_w / src_h
+    if abs(target_ratio - source_ratio) >= 0.05 and target_ratio < 1.0 and source_ratio > 1.0:
+        # Portrait target, landscape source — scale to height, crop centre column
+        return f"scale=-2:{h},crop={w}:{h}"
+    return f"scale={w}:{h}"
+
+
+def _probe_size(src: Path) -> tuple[int, int]:
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+    infos = ffmpeg_parse_infos(str(src))
+    w, h = infos["video_size"]
+    return int(w), int(h)
+
+
+def prepare_sizes(src, sizes, fps: int = DEFAULT_FPS) -> dict:
+    """
+    Prepared intermediates for `src` at every (w, h) in `sizes`. Misses are
+    transcoded together: the source is decoded once and split per size.
+    Returns {(w, h): path}.
+    """
+    src = Path(src)
+    keys = {size: _source_key(src, *size, fps) for size in dict.fromkeys(sizes)}
+    results = {}
+    for size, key in keys.items():
+        cached = CLIP_LIBRARY.get(key, ".mp4")
+        if cached is not None:
+            results[size] = cached
+    missing = [size for size in keys if size not in results]
+    if not missing:
+        return results
+
+    duration = probe_duration(src)
+    src_w, src_h = _probe_size(src)
+    parts = [f"[0:v]split={len(missing)}" + "".join(f"[s{i}]" for i in range(len(missing)))]
+    for i, (w, h) in enumerate(missing):
+        fit = f"{_fit_filter(src_w, src_h, w, h)},setsar=1,fps={fps},format=yuv420p"
+        if duration >= 3 * LOOP_XFADE:
+            # Body runs from LOOP_XFADE to the end, then dissolves into the first
+            # LOOP_XFADE seconds — which is exactly where the body starts again.
+            parts += [
+                f"[s{i}]{fit},split[a{i}][b{i}]",
+                f"[a{i}]trim=start={LOOP_XFADE},setpts=PTS-STARTPTS,fps={fps}[body{i}]",
+                f"[b{i}]trim=duration={LOOP_XFADE},setpts=PTS-STARTPTS,fps={fps}[head{i}]",
+                f"[body{i}][head{i}]xfade=transition=fade:duration={LOOP_XFADE}"
+                f":offset={duration - 2 * LOOP_XFADE:.3f}[v{i}]",
+            ]
+        else:
+            parts.append(f"[s{i}]{fit}[v{i}]")
+
+    tmps = {size: CLIP_LIBRARY.reserve(keys[size], ".mp4") for size in missing}
+    args = ["-i", str(src), "-filter_complex", ";".join(parts)]
+    for i, size in enumerate(missing):
+        args += [
+            "-map", f"[v{i}]", "-an",
+            "-c:v", "libx264", "-preset", "fast", "-crf", "18", "-g", str(fps),
+            "-movflags", "+faststart", str(tmps[size]),
+        ]
+    try:
+        run_ffmpeg(args)
+    except BaseException:
+        for tmp in tmps.values():
+            tmp.unlink(missing_ok=True)
+        raise
+    for size, tmp in tmps.items():
+        results[size] = CLIP_LIBRARY.put(keys[size], tmp, ".mp4")
+    return results
+
+
+def prepare_clip(src, w: int, h: int, fps: int = DEFAULT_FPS) -> Path:
+    """Return the prepared intermediate for `src` at (w, h, fps), transcoding on a miss."""
+    return prepare_sizes(src, [(w, h)], fps)[(w, h)]
+
+
+def prepare_many(sources, sizes, fps: int = DEFAULT_FPS, workers: int = None) -> dict:
+    """
+    Prepare every (source, size) pair in parallel — one ffmpeg process per
+    source, covering all of its sizes. Returns {(source, (w, h)): prepared
+    path or exception}.
+    """
+    sources = list(dict.fromkeys(str(src) for src in sources))
+    sizes = list(dict.fromkeys(sizes))
+    workers = workers or max(1, (os.cpu_count() or 2) // 2)
+    results = {}
+    with ThreadPoolExecutor(workers) as pool:
+        futures = {pool.submit(prepare_sizes, src, sizes, fps): src for src in sources}
+        for future in as_completed(futures):
+            src = futures[future]
+            try:
+                for size, path in future.result().items():
+                    results[(src, size)] = path
+            except Exception as e:
+                for size in sizes:
+                    results[(src, size)] = e
+    return results
+
+
+def library_sources() -> list[Path]:
+    found = {}
+    for pattern in SOURCE_GLOBS:
+        for p in glob.glob(pattern):
+            if TMP_MARKER in p:
+                continue                              # download still in flight
+            found.setdefault(Path(p).name, Path(p))   # user clips win over downloads
+    return sorted(found.values())
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    workers = int(args[args.index("--workers") + 1]) if "--workers" in args else None
+    if "--workers" in args:
+        i = args.index("--workers")
+        del args[i:i + 2]
+    picked = [name for name in FORMATS if f"--{name}" in args] or list(FORMATS)
+    paths = [Path(a) for a in args if not a.startswith("--")] or library_sources()
+
+    if not paths:
+        print("No source clips found.")
+        sys.exit(1)
+
+    sizes = [FORMATS[name] for name in picked]
+    print(f"Preparing {len(paths)} clip(s) × {', '.join(picked)} ...")
+    CLIP_LIBRARY.clean_stale()
+    results = prepare_many(paths, sizes, workers=workers)
+    failed = 0
+    for (src, (w, h)), out in sorted(results.items(), key=lambda kv: kv[0]):
+        if isinstance(out, Exception):
+            failed += 1
+            print(f"  FAILED {src} @ {w}x{h}: {out}")
+        else:
+            print(f"  {src} @ {w}x{h} → {out}")
+    sys.exit(1 if failed else 0)
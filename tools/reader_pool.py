@@ -0,0 +1,247 @@
+"""
+reader_pool.py
+--------------
+Bounded pool of MoviePy media readers (ffmpeg decoder subprocesses).
+
+A VideoFileClip / AudioFileClip starts its ffmpeg process in the
+constructor and keeps it until close() — which the builders never call,
+because the clip is only consumed by the final write_videofile. A long
+workout therefore held one idle decoder (and its pipes) per exercise,
+per round and per voice cue.
+
+Clips made through the pool instead:
+  - open lazily: no process is started until the first frame is requested
+  - are capped: when more than READER_POOL_MAX decoders are live, the
+    least recently used one is closed; it reopens (seeking to where it is
+    needed) the next time it is read
+  - are closed together when the session that created them ends
+
+Sessions are per thread, so concurrent builds never evict each other's
+readers. Outside a session a shared default pool is used.
+
+Usage:
+  from tools import reader_pool
+
+  with reader_pool.session() as readers:
+      clip  = reader_pool.video("clip.mp4")
+      voice = reader_pool.audio("cue.mp3")
+      ...write_videofile(...)
+  print(readers.stats())      # {'readers': .., 'opens': .., 'peak': .., 'max_open': ..}
+
+Config (.env):
+  READER_POOL_MAX  — live decoder cap per pool (default 16)
+"""
+
+import os
+import threading
+import numpy as np
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from moviepy import AudioClip, VideoClip
+from moviepy.audio.io.readers import FFMPEG_AudioReader
+from moviepy.video.io.ffmpeg_reader import FFMPEG_VideoReader
+
+MAX_OPEN = int(os.getenv("READER_POOL_MAX", "16"))
+
+
+# ---------------------------------------------------------------------------
+# Pool
+# ---------------------------------------------------------------------------
+
+class ReaderPool:
+    def __init__(self, max_open: int = MAX_OPEN):
+        self.max_open = max(1, max_open)
+        self._live = OrderedDict()        # id(reader) → reader, least recently used first
+        self._lock = threading.Lock()
+        self.readers = 0                  # readers created
+        self.opens = 0                    # decoder processes started (incl. reopens)
+        self.peak = 0                     # most decoders live at once
+
+    def opened(self, reader):
+        with self._lock:
+            self._live[id(reader)] = reader
+            self._live.move_to_end(id(reader))
+            self.opens += 1
+            evict = []
+            while len(self._live) > self.max_open:
+                evict.append(self._live.popitem(last=False)[1])
+            self.peak = max(self.peak, len(self._live))
+        for r in evict:
+            r.close()
+
+    def touch(self, reader):
+        with self._lock:
+            if id(reader) in self._live:
+                self._live.move_to_end(id(reader))
+
+    def closed(self, reader):
+        with self._lock:
+            self._live.pop(id(reader), None)
+
+    def close_all(self):
+        with self._lock:
+            live = list(self._live.values())
+        for r in live:
+            r.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"readers": self.readers, "opens": self.opens, "peak": self.peak,
+                    "live": len(self._live), "max_open": self.max_open}
+
+
+# ---------------------------------------------------------------------------
+# Lazy readers
+# ---------------------------------------------------------------------------
+# MoviePy's readers open their process (and pre-read) in __init__; these
+# skip that and open on first use, telling the pool whenever a process
+# starts or stops.
+
+class _PooledVideoReader(FFMPEG_VideoReader):
+    def __init__(self, pool: ReaderPool, filename, **kw):
+        self._pool = pool
+        self._constructing = True
+        super().__init__(filename, **kw)
+        self._constructing = False
+
+    def initialize(self, start_time=0):
+        if self._constructing:
+            return
+        super().initialize(start_time)
+        self._pool.opened(self)
+
+    def get_frame(self, t):
+        self._pool.touch(self)
+        if not self.proc:
+            self.initialize(t)
+            return self.last_read
+        return super().get_frame(t)
+
+    def close(self, delete_lastread=True):
+        super().close(delete_lastread)
+        self._pool.closed(self)
+
+
+class _PooledAudioReader(FFMPEG_AudioReader):
+    def __init__(self, pool: ReaderPool, filename, **kw):
+        self._pool = pool
+        self._constructing = True
+        super().__init__(filename, **kw)
+        self._constructing = False
+        self.pos = 0
+
+    def initialize(self, start_time=0):
+        if self._constructing:
+            return
+        super().initialize(start_time)
+        self._pool.opened(self)
+
+    def buffer_around(self, frame_number):
+        if not self._constructing:
+            super().buffer_around(frame_number)
+
+    def seek(self, pos):
+        if not self.proc:
+            self.initialize(pos / self.fps)
+        super().seek(pos)
+
+    def read_chunk(self, chunksize):
+        if not self.proc:
+            self.initialize(self.pos / self.fps)
+        return super().read_chunk(chunksize)
+
+    def get_frame(self, tt):
+        self._pool.touch(self)
+        if self.buffer is None:
+            first = np.min(tt) if isinstance(tt, np.ndarray) else tt
+            self.buffer_around(max(1, int(self.fps * first)))
+        return super().get_frame(tt)
+
+    def close(self):
+        super().close()
+        self._pool.closed(self)
+
+
+# ---------------------------------------------------------------------------
+# Clips
+# ---------------------------------------------------------------------------
+
+class PooledAudioClip(AudioClip):
+    """AudioFileClip equivalent backed by a pooled reader."""
+
+    def __init__(self, pool: ReaderPool, filename, buffersize=200000, nbytes=2, fps=44100):
+        AudioClip.__init__(self)
+        self.filename = filename
+        self.reader = _PooledAudioReader(pool, filename, fps=fps, nbytes=nbytes,
+                                         buffersize=buffersize)
+        self.fps = fps
+        self.duration = self.end = self.reader.duration
+        self.buffersize = self.reader.buffersize
+        self.nchannels = self.reader.nchannels
+        self.frame_function = lambda t: self.reader.get_frame(t)
+        pool.readers += 1
+
+    def close(self):
+        if self.reader:
+            self.reader.close()
+
+
+class PooledVideoClip(VideoClip):
+    """VideoFileClip equivalent (no mask) backed by a pooled reader."""
+
+    def __init__(self, pool: ReaderPool, filename, audio: bool = True):
+        VideoClip.__init__(self)
+        self.filename = filename
+        self.reader = _PooledVideoReader(pool, filename)
+        self.duration = self.end = self.reader.duration
+        self.fps = self.reader.fps
+        self.size = self.reader.size
+        self.rotation = self.reader.rotation
+        self.frame_function = lambda t: self.reader.get_frame(t)
+        pool.readers += 1
+        if audio and self.reader.infos["audio_found"]:
+            self.audio = PooledAudioClip(pool, filename)
+
+    def __deepcopy__(self, memo):
+        return self.__copy__()
+
+    def close(self):
+        if self.reader:
+            self.reader.close()
+        if self.audio:
+            self.audio.close()
+
+
+# ---------------------------------------------------------------------------
+# Per-thread sessions
+# ---------------------------------------------------------------------------
+
+DEFAULT_POOL = ReaderPool()
+_local = threading.local()
+
+
+def current() -> ReaderPool:
+    """The pool of this thread's active session, else the shared default."""
+    return getattr(_local, "pool", None) or DEFAULT_POOL
+
+
+@contextmanager
+def session(max_open: int = MAX_OPEN):
+    """Fresh pool for this thread; every decoder it opened is closed on exit."""
+    pool = ReaderPool(max_open)
+    outer = getattr(_local, "pool", None)
+    _local.pool = pool
+    try:
+        yield pool
+    finally:
+        _local.pool = outer
+        pool.close_all()
+
+
+def video(path, audio: bool = False) -> PooledVideoClip:
+    return PooledVideoClip(current(), str(path), audio=audio)
+
+
+def audio(path) -> PooledAudioClip:
+    return PooledAudioClip(current(), str(path))
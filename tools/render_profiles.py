@@ -0,0 +1,78 @@
+"""
+render_profiles.py
+------------------
+Output quality profiles shared by the workout builder and the finance
+assembler.
+
+  final    — the published export: full resolution, 30 fps, x264 "fast"
+  preview  — what a reviewer watches in 7_Final_Review: the same timeline
+             with the short side scaled to PREVIEW_SHORT_SIDE, PREVIEW_FPS,
+             x264 "ultrafast" at PREVIEW_CRF. Overlays are laid out at full
+             resolution and scaled, so the preview looks like the final.
+
+Usage:
+  w, h = render_profiles.frame_size(1920, 1080, "preview")     # (854, 480)
+  clip.write_videofile(path, fps=render_profiles.get("preview")["fps"],
+                       **render_profiles.encode_params("preview"))
+
+Config (.env):
+  PREVIEW_SHORT_SIDE  — preview height of landscape / width of portrait (default 480)
+  PREVIEW_FPS         — default 15
+  PREVIEW_CRF         — default 32
+"""
+
+import os
+
+PROFILES = {
+    "final": {
+        "short_side": None,
+        "fps": 30,
+        "preset": "fast",
+        "crf": None,
+    },
+    "preview": {
+        "short_side": int(os.getenv("PREVIEW_SHORT_SIDE", "480")),
+        "fps": int(os.getenv("PREVIEW_FPS", "15")),
+        "preset": "ultrafast",
+        "crf": int(os.getenv("PREVIEW_CRF", "32")),
+    },
+}
+
+
+def get(profile: str) -> dict:
+    try:
+        return PROFILES[profile]
+    except KeyError:
+        raise ValueError(f"Unknown render profile: {profile}") from None
+
+
+def scale(w: int, h: int, profile: str) -> float:
+    """Factor from the (w, h) layout to the profile's output frame."""
+    short = get(profile)["short_side"]
+    return 1.0 if short is None else min(1.0, short / min(w, h))
+
+
+def frame_size(w: int, h: int, profile: str) -> tuple[int, int]:
+    """Output frame for a (w, h) layout — even dimensions, as yuv420p requires."""
+    s = scale(w, h, profile)
+    if s == 1.0:
+        return w, h
+    return int(round(w * s / 2)) * 2, int(round(h * s / 2)) * 2
+
+
+def encode_params(profile: str) -> dict:
+    """MoviePy write_videofile() encoder kwargs."""
+    p = get(profile)
+    params = {"codec": "libx264", "audio_codec": "aac", "preset": p["preset"]}
+    if p["crf"] is not None:
+        params["ffmpeg_params"] = ["-crf", str(p["crf"])]
+    return params
+
+
+def ffmpeg_video_args(profile: str) -> list[str]:
+    """The same encoder settings as raw ffmpeg arguments."""
+    p = get(profile)
+    args = ["-c:v", "libx264", "-preset", p["preset"]]
+    if p["crf"] is not None:
+        args += ["-crf", str(p["crf"])]
+    return args
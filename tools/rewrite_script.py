@@ -105,6 +105,7 @@ def parse_scenes(script: str) -> list[dict]:
                 "clip_url":   None,
                 "clip_path":  None,
                 "audio_path": None,
+                "plan":       None,
             })
     return scenes
 
@@ -0,0 +1,95 @@
+"""
+scene_planner.py
+----------------
+Audio-first shot planning for Finance scenes.
+
+Kling i2v bills and renders clips of 5 or 10 seconds. Every scene used to
+ask for 10 s whatever its dialogue, so a 3-second line paid (and waited)
+for twice the footage it used, and a 25-second line looped one 10 s clip
+two and a half times.
+
+Once a scene's narration exists, plan_shots() picks the cheapest set of
+clips that covers it — total footage 5 s x ceil(dialogue / 5), as few shots
+as possible — and gives each shot its share of the audio. Cuts between
+sub-shots are moved to the quietest moment near the proportional split
+(between words, ideally between sentences), never so far that a shot's
+audio outgrows its clip. split_audio() writes each shot's slice; every
+shot is then animated and lip-synced on its own and the results are
+concatenated back into the scene's lipsync clip.
+
+Usage:
+  plan = plan_shots("audio_3.mp3")
+  # {"audio_duration": 23.4, "shots": [{"start": 0.0, "end": 9.1, "duration": 10}, ...]}
+  split_audio("audio_3.mp3", plan, ["audio_3_0.mp3", "audio_3_1.mp3", ...])
+
+Config (.env):
+  SHOT_SLACK   — seconds of audio a clip may be short by before the next
+                 size up is used; lipsync covers it (default 0.25)
+  CUT_SEARCH   — how far a sub-shot cut may move to find a pause (default 0.75)
+"""
+
+import os
+import math
+import numpy as np
+
+from tools.audio_mixer import decode, FPS
+from tools.ffmpeg_utils import run_ffmpeg, probe_duration
+
+CLIP_SHORT = 5     # Kling i2v clip lengths, seconds
+CLIP_LONG  = 10
+SLACK      = float(os.getenv("SHOT_SLACK", "0.25"))
+CUT_SEARCH = float(os.getenv("CUT_SEARCH", "0.75"))
+HOP        = 0.02  # energy window for finding pauses, seconds
+
+
+def clip_lengths(duration: float) -> list[int]:
+    """Cheapest clip set covering `duration`: 10 s clips, plus one 5 s clip if that is enough."""
+    total = CLIP_SHORT * max(1, math.ceil((duration - SLACK) / CLIP_SHORT))
+    return [CLIP_LONG] * (total // CLIP_LONG) + [CLIP_SHORT] * (total % CLIP_LONG // CLIP_SHORT)
+
+
+def _quietest(pcm: np.ndarray, lo: float, hi: float) -> float:
+    """Centre of the lowest-energy HOP window in [lo, hi] seconds."""
+    a, b = int(lo * FPS), int(hi * FPS)
+    hop = int(HOP * FPS)
+    window = pcm[a:b]
+    n = len(window) // hop
+    if n < 2:
+        return (lo + hi) / 2
+    energy = np.square(window[:n * hop]).reshape(n, -1).sum(axis=1)
+    return (a + (int(np.argmin(energy)) + 0.5) * hop) / FPS
+
+
+def plan_shots(audio_path) -> dict:
+    """Shot list for a scene's narration — stored in scene_data as scene["plan"]."""
+    duration = probe_duration(audio_path)
+    lengths = clip_lengths(duration)
+    if len(lengths) == 1:
+        return {"audio_duration": duration, "shots": [{"start": 0.0, "end": duration, "duration": lengths[0]}]}
+
+    # Long clips first: the audio share is proportional, so the 5 s clip takes the tail.
+    # A cut may not leave the shots after it more audio than their clips cover.
+    pcm = decode(audio_path)
+    scale = duration / sum(lengths)
+    shots, start, target = [], 0.0, 0.0
+    for i, length in enumerate(lengths[:-1]):
+        target += length * scale
+        lo = max(start + 1.0, target - CUT_SEARCH, duration - sum(lengths[i + 1:]) - SLACK)
+        hi = min(start + length + SLACK, target + CUT_SEARCH)
+        end = _quietest(pcm, lo, hi) if lo < hi else target
+        shots.append({"start": round(start, 3), "end": round(end, 3), "duration": length})
+        start = end
+    shots.append({"start": round(start, 3), "end": duration, "duration": lengths[-1]})
+    return {"audio_duration": duration, "shots": shots}
+
+
+def split_audio(audio_path, plan: dict, outputs: list) -> list:
+    """Write each shot's slice of `audio_path` to `outputs` (sample-accurate re-encode)."""
+    for shot, out in zip(plan["shots"], outputs):
+        if os.path.exists(out):
+            continue
+        tmp = f"{out}.part.mp3"
+        run_ffmpeg(["-i", str(audio_path), "-ss", f"{shot['start']:.3f}", "-to", f"{shot['end']:.3f}",
+                    "-c:a", "libmp3lame", "-b:a", "128k", tmp])
+        os.replace(tmp, out)
+    return [str(out) for out in outputs]
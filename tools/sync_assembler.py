@@ -10,27 +10,42 @@ Each scene:
 
 Then:
   - Concatenates all scenes end-to-end.
-  - Mixes in royalty-free background music at 10% volume.
+  - Mixes in royalty-free background music at 10% volume (one streaming
+    NumPy mix of every scene's narration over the looped track — see
+    tools.audio_mixer).
   - Exports to output_path via MoviePy (H.264 / AAC).
+
+Engines (ASSEMBLY_ENGINE in .env, or engine= argument):
+  moviepy — default; composites every frame in Python.
+  ffmpeg  — compiles the same timeline into one ffmpeg filter_complex
+            (loop → scale → trim → xfade / acrossfade → amix), so decoding,
+            scaling and blending run natively with constant memory.
+
+Profiles (profile= argument, see tools.render_profiles):
+  final   — W x H at FPS, the published export
+  preview — the same cut, small and fast, for the 7_Final_Review step
 """
 
 import os
 import json
-import requests
 import numpy as np
 from pathlib import Path
-from moviepy import (
-    VideoFileClip, ImageClip, AudioFileClip,
-    CompositeAudioClip, AudioArrayClip,
-    concatenate_videoclips, concatenate_audioclips,
-)
+from moviepy import concatenate_videoclips
 from moviepy import vfx
 from dotenv import load_dotenv
 
+from tools import reader_pool, render_profiles
+from tools.audio_mixer import Mix, silence
+from tools.downloads import DOWNLOADS
+from tools.ffmpeg_utils import run_ffmpeg, probe_duration
+
 load_dotenv()
 
 W, H = 1920, 1080
 FPS  = 30
+FADE = 0.4  # seconds of crossfade between scenes
+
+ASSEMBLY_ENGINE = os.getenv("ASSEMBLY_ENGINE", "moviepy")
 
 MUSIC_TRACKS = [
     "https://files.freemusicarchive.org/storage-freemusicarchive-org/music/no_curator/Broke_For_Free/Directionless_EP/Broke_For_Free_-_01_-_Night_Owl.mp3",
@@ -42,54 +57,45 @@ MUSIC_TRACKS = [
 # Helpers
 # ---------------------------------------------------------------------------
 
-def silence(duration: float) -> AudioArrayClip:
-    samples = max(1, int(44100 * duration))
-    arr = np.zeros((samples, 2), dtype=np.float32)
-    return AudioArrayClip(arr, fps=44100)
-
-
 def _fetch_music(tmp_dir: Path) -> str | None:
-    dest = tmp_dir / "bg_music.mp3"
-    if dest.exists():
-        return str(dest)
     for url in MUSIC_TRACKS:
         try:
-            print("  Downloading background music...")
-            r = requests.get(url, timeout=30, stream=True)
-            if r.status_code == 200:
-                with open(dest, "wb") as f:
-                    for chunk in r.iter_content(65536):
-                        f.write(chunk)
-                return str(dest)
-        except Exception:
-            continue
+            return str(DOWNLOADS.fetch(url, tmp_dir / "bg_music.mp3"))
+        except Exception as e:
+            print(f"  Music download failed: {e}")
     return None
 
 
-def _add_music(video, music_path: str, volume: float = 0.10):
-    music = AudioFileClip(music_path)
-    loops = int((video.duration or 0) / (music.duration or 1)) + 2
-    looped = concatenate_audioclips([music] * loops).subclipped(0, video.duration or 1)
-    looped = looped.with_volume_scaled(volume)
-    if video.audio:
-        mixed = CompositeAudioClip([video.audio, looped])
-        return video.with_audio(mixed)
-    return video.with_audio(looped)
+def _soundtrack(scene_data: list[dict], music_path: str | None, volume: float) -> Mix:
+    """
+    Every scene's narration at the scene's start — scene k starts FADE
+    seconds before scene k-1 ends, so neighbours overlap as in the video —
+    over the looped music.
+    """
+    durations = [probe_duration(s["audio_path"]) for s in scene_data]
+    mix = Mix(sum(durations) - FADE * (len(durations) - 1))
+    start = 0.0
+    for scene, duration in zip(scene_data, durations):
+        mix.add(scene["audio_path"], start=start, end=start + duration)
+        start += duration - FADE
+    if music_path:
+        mix.bed(music_path, volume)
+    return mix
 
 
 # ---------------------------------------------------------------------------
 # Per-scene assembly — lipsync clip + freeze-frame fallback
 # ---------------------------------------------------------------------------
 
-def _build_scene_clip(lipsync_path: str, audio_path: str) -> object:
+def _build_scene_clip(lipsync_path: str, audio_path: str, profile: str = "final") -> object:
     """
     Load the lipsync video clip and sync to audio duration.
 
     If audio is longer than the video, loop the clip seamlessly
     rather than freezing — keeps the character animated throughout.
     """
-    video = VideoFileClip(lipsync_path).resized((W, H))
-    audio = AudioFileClip(audio_path) if os.path.exists(audio_path) else silence(video.duration)
+    video = reader_pool.video(lipsync_path).resized(render_profiles.frame_size(W, H, profile))
+    audio = reader_pool.audio(audio_path) if os.path.exists(audio_path) else silence(video.duration)
 
     vid_dur = video.duration or 0
     aud_dur = audio.duration or vid_dur
@@ -105,6 +111,81 @@ def _build_scene_clip(lipsync_path: str, audio_path: str) -> object:
     return clip.with_audio(audio)
 
 
+# ---------------------------------------------------------------------------
+# ffmpeg engine — the same timeline as one filter graph
+# ---------------------------------------------------------------------------
+
+def _build_filter_graph(durations: list[float], music_volume: float,
+                        with_music: bool, profile: str = "final") -> tuple[str, str, str]:
+    """
+    filter_complex for n scenes. Inputs are ordered video0, audio0, video1,
+    audio1, ..., [music]. Every video input is opened with -stream_loop -1,
+    so trimming to the scene's audio duration both cuts long clips and loops
+    short ones — the same as _build_scene_clip.
+
+    Scene k starts FADE seconds before scene k-1 ends, as with MoviePy's
+    padding=-FADE concatenation, so xfade's offset is the length of the
+    chain so far minus FADE. Returns (graph, video label, audio label).
+    """
+    n = len(durations)
+    w, h = render_profiles.frame_size(W, H, profile)
+    fps = render_profiles.get(profile)["fps"]
+    parts = []
+    for i, d in enumerate(durations):
+        parts.append(
+            f"[{2 * i}:v]scale={w}:{h},setsar=1,format=yuv420p,"
+            f"trim=duration={d:.3f},setpts=PTS-STARTPTS,settb=AVTB,fps={fps}[v{i}]"
+        )
+        parts.append(
+            f"[{2 * i + 1}:a]aresample=44100,aformat=sample_fmts=fltp:channel_layouts=stereo,"
+            f"atrim=duration={d:.3f},asetpts=PTS-STARTPTS[a{i}]"
+        )
+
+    v, a, length = "v0", "a0", durations[0]
+    for i in range(1, n):
+        offset = length - FADE
+        parts.append(f"[{v}][v{i}]xfade=transition=fade:duration={FADE}:offset={offset:.3f}[vx{i}]")
+        parts.append(f"[{a}][a{i}]acrossfade=d={FADE}:c1=tri:c2=tri[ax{i}]")
+        v, a, length = f"vx{i}", f"ax{i}", length + durations[i] - FADE
+
+    if with_music:
+        parts.append(f"[{2 * n}:a]volume={music_volume}[music]")
+        parts.append(f"[{a}][music]amix=inputs=2:duration=first:dropout_transition=0:normalize=0[aout]")
+        a = "aout"
+
+    return ";".join(parts), f"[{v}]", f"[{a}]"
+
+
+def _assemble_ffmpeg(scene_data: list[dict], output_path: str, tmp: Path, music_volume: float,
+                     profile: str = "final") -> str:
+    durations = [probe_duration(s["audio_path"]) for s in scene_data]
+    total = sum(durations) - FADE * (len(durations) - 1)
+
+    args = []
+    for s in scene_data:
+        args += ["-stream_loop", "-1", "-i", str(s["lipsync_path"]), "-i", str(s["audio_path"])]
+
+    music_path = _fetch_music(tmp)
+    if music_path:
+        print("  Mixing in background music...")
+        args += ["-stream_loop", "-1", "-i", music_path]
+    else:
+        print("  (No music — download failed, continuing without)")
+
+    graph, vout, aout = _build_filter_graph(durations, music_volume, bool(music_path), profile)
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    print(f"  Rendering {len(scene_data)} scenes with ffmpeg to {output_path}  ({total:.1f}s)...")
+    run_ffmpeg(args + [
+        "-filter_complex", graph, "-map", vout, "-map", aout,
+        *render_profiles.ffmpeg_video_args(profile), "-pix_fmt", "yuv420p",
+        "-r", str(render_profiles.get(profile)["fps"]),
+        "-c:a", "aac", "-ar", "44100",
+        "-t", f"{total:.3f}", "-movflags", "+faststart", str(output_path),
+    ])
+    print(f"  Done: {output_path}")
+    return output_path
+
+
 # ---------------------------------------------------------------------------
 # Main assembler
 # ---------------------------------------------------------------------------
@@ -114,6 +195,8 @@ def assemble_finance_video(
     output_path: str,
     tmp_dir: str = ".tmp/finance_assembly",
     music_volume: float = 0.10,
+    engine: str = None,
+    profile: str = "final",
 ) -> str:
     """
     Assemble the full Finance video from scene_data.
@@ -124,6 +207,8 @@ def assemble_finance_video(
         output_path:  Destination MP4 path.
         tmp_dir:      Scratch directory for music download.
         music_volume: Background music level (0.0–1.0). Default 10%.
+        engine:       "moviepy" or "ffmpeg" (default: ASSEMBLY_ENGINE).
+        profile:      "final" or "preview" (see tools.render_profiles).
 
     Returns:
         output_path on success.
@@ -144,48 +229,74 @@ def assemble_finance_video(
     if missing:
         raise FileNotFoundError("Missing assets:\n" + "\n".join(missing))
 
-    # Build each scene with crossfade transitions
-    FADE = 0.4  # seconds of crossfade between scenes
-    scene_clips = []
-    for i, scene in enumerate(scene_data):
-        print(f"  Building scene {i + 1}/{len(scene_data)}...")
-        clip = _build_scene_clip(scene["lipsync_path"], scene["audio_path"])
-        if i > 0:
-            clip = clip.with_effects([vfx.CrossFadeIn(FADE)])
-        scene_clips.append(clip)
+    engine = engine or ASSEMBLY_ENGINE
+    if engine == "ffmpeg":
+        return _assemble_ffmpeg(scene_data, output_path, tmp, music_volume, profile)
+    if engine != "moviepy":
+        raise ValueError(f"Unknown assembly engine: {engine}")
+
+    with reader_pool.session() as readers:
+        # Build each scene with crossfade transitions
+        scene_clips = []
+        for i, scene in enumerate(scene_data):
+            print(f"  Building scene {i + 1}/{len(scene_data)}...")
+            clip = _build_scene_clip(scene["lipsync_path"], scene["audio_path"], profile)
+            if i > 0:
+                clip = clip.with_effects([vfx.CrossFadeIn(FADE)])
+            scene_clips.append(clip)
+
+        # Concatenate with overlap so crossfades blend smoothly
+        print("  Concatenating scenes...")
+        final = concatenate_videoclips(scene_clips, padding=-FADE, method="compose")
+
+        # Narration + background music, mixed and encoded once
+        music_path = _fetch_music(tmp)
+        if music_path:
+            print("  Mixing in background music...")
+        else:
+            print("  (No music — download failed, continuing without)")
+        audio = _soundtrack(scene_data, music_path, music_volume).write(tmp / "soundtrack.m4a")
+
+        # Export
+        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+        print(f"  Rendering to {output_path}  ({final.duration:.1f}s)...")
+        final.write_videofile(
+            output_path,
+            fps=render_profiles.get(profile)["fps"],
+            threads=4,
+            audio=audio,
+            logger=None,
+            **{**render_profiles.encode_params(profile), "audio_codec": "copy"},
+        )
+    decoders = readers.stats()
+    print(f"  Decoders: peak {decoders['peak']} live (cap {decoders['max_open']}), "
+          f"{decoders['opens']} opens for {decoders['readers']} readers")
+    print(f"  Done: {output_path}")
+    return output_path
 
-    # Concatenate with overlap so crossfades blend smoothly
-    print("  Concatenating scenes...")
-    final = concatenate_videoclips(scene_clips, padding=-FADE, method="compose")
 
-    # Background music
-    music_path = _fetch_music(tmp)
-    if music_path:
-        print("  Mixing in background music...")
-        final = _add_music(final, music_path, volume=music_volume)
-    else:
-        print("  (No music — download failed, continuing without)")
+def render_frame(scene_data: list[dict], t: float, profile: str = "preview") -> np.ndarray:
+    """
+    Single frame of the assembled video at time t (seconds), for review
+    thumbnails. Crossfades are ignored: the frame comes from the scene
+    that starts last before t.
+    """
+    start = 0.0
+    for i, scene in enumerate(scene_data):
+        duration = probe_duration(scene["audio_path"])
+        if t < start + duration - FADE or i == len(scene_data) - 1:
+            break
+        start += duration - FADE
 
-    # Export
-    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
-    print(f"  Rendering to {output_path}  ({final.duration:.1f}s)...")
-    final.write_videofile(
-        output_path,
-        fps=FPS,
-        codec="libx264",
-        audio_codec="aac",
-        threads=4,
-        preset="fast",
-        logger=None,
-    )
-    print(f"  Done: {output_path}")
-    return output_path
+    with reader_pool.session():
+        clip = _build_scene_clip(scene["lipsync_path"], scene["audio_path"], profile)
+        local = min(max(t - start, 0.0), (clip.duration or 0) - 1e-3)
+        return np.array(clip.get_frame(max(local, 0.0)), dtype=np.uint8)
 
 
 if __name__ == "__main__":
-    import sys, sqlite3, os
-
-    DB_FILE = os.getenv("DB_FILE", "youtube.db")
+    import sys
+    from tools import db
 
     if len(sys.argv) < 3:
         print("Usage: python sync_assembler.py <record_id> <output.mp4>")
@@ -194,10 +305,7 @@ if __name__ == "__main__":
     record_id   = sys.argv[1]
     output_path = sys.argv[2]
 
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
-    row = conn.execute("SELECT scene_data FROM Videos WHERE record_id = ?", (record_id,)).fetchone()
-    conn.close()
+    row = db.query_one("SELECT scene_data FROM Videos WHERE record_id = ?", (record_id,))
 
     if not row or not row["scene_data"]:
         print("No scene_data found. Run automated_asset_generator.py first.")
@@ -0,0 +1,100 @@
+"""
+tts_cache.py
+------------
+Persistent edge-tts phrase cache shared by every workout build.
+
+Workout cues ("Starting Squats", "Rest. Next up, Lunges", ...) repeat
+across builds, so each (text, voice, rate) is synthesised once into a
+shared store outside the per-record .tmp/workout_<id> directory.
+Misses are prefetched concurrently in a single event loop before any
+segment is built.
+
+Config (.env):
+  TTS_CACHE_DIR      — default .tmp/cache/tts
+  TTS_CACHE_MAX_MB   — size bound before LRU eviction (default 512)
+  TTS_CONCURRENCY    — parallel edge-tts requests during prefetch (default 8)
+"""
+
+import os
+import asyncio
+from pathlib import Path
+
+from tools.disk_cache import DiskCache
+
+DEFAULT_VOICE = "en-US-GuyNeural"
+DEFAULT_RATE  = "+0%"
+
+
+def tts_available() -> bool:
+    try:
+        import edge_tts  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class PhraseCache:
+    """Maps (text, voice, rate) → cached MP3, synthesising misses with edge-tts."""
+
+    def __init__(self, root, max_bytes: int, concurrency: int = 8):
+        self.store = DiskCache(root, max_bytes)
+        self.concurrency = concurrency
+
+    @staticmethod
+    def key(text: str, voice: str, rate: str) -> str:
+        return DiskCache.key("tts", text, voice, rate)
+
+    def lookup(self, text: str, voice: str = DEFAULT_VOICE, rate: str = DEFAULT_RATE) -> Path | None:
+        """Cached MP3 for the phrase, or None. Counts towards hit/miss stats."""
+        return self.store.get(self.key(text, voice, rate), ".mp3")
+
+    async def _synthesise(self, text: str, voice: str, rate: str, sem: asyncio.Semaphore) -> Path:
+        import edge_tts
+
+        key = self.key(text, voice, rate)
+        async with sem:
+            tmp = self.store.reserve(key, ".mp3")
+            try:
+                await edge_tts.Communicate(text, voice, rate=rate).save(str(tmp))
+            except BaseException:
+                tmp.unlink(missing_ok=True)
+                raise
+        return self.store.put(key, tmp, ".mp3")
+
+    def prefetch(self, phrases, voice: str = DEFAULT_VOICE, rate: str = DEFAULT_RATE) -> dict[str, Path]:
+        """
+        Make sure every phrase is cached. Misses are synthesised concurrently
+        in one event loop. Returns {text: path} (empty if edge-tts is missing).
+        """
+        if not tts_available():
+            return {}
+
+        found, missing = {}, []
+        for text in dict.fromkeys(phrases):
+            path = self.lookup(text, voice, rate)
+            if path is None:
+                missing.append(text)
+            else:
+                found[text] = path
+
+        if missing:
+            async def run():
+                sem = asyncio.Semaphore(self.concurrency)
+                return await asyncio.gather(*(self._synthesise(t, voice, rate, sem) for t in missing))
+
+            found.update(zip(missing, asyncio.run(run())))
+        return found
+
+    def get(self, text: str, voice: str = DEFAULT_VOICE, rate: str = DEFAULT_RATE) -> Path | None:
+        """Cached MP3 for one phrase, synthesising it on a miss."""
+        return self.prefetch([text], voice, rate).get(text)
+
+    def stats(self) -> dict:
+        return self.store.stats()
+
+
+TTS_CACHE = PhraseCache(
+    os.getenv("TTS_CACHE_DIR", ".tmp/cache/tts"),
+    max_bytes=int(os.getenv("TTS_CACHE_MAX_MB", "512")) * 1024 * 1024,
+    concurrency=int(os.getenv("TTS_CONCURRENCY", "8")),
+)